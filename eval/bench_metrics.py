@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+bench_metrics.py — Microbenchmarks for the evaluation metric functions.
+
+Scoring runs on every sample of every variant (and over whole saved runs in
+rescore.py), so a slow metric shows up as a slow eval. This times each
+metric function on generated inputs of three sizes:
+
+  tweet   ~30 words
+  email   ~150 words
+  doc     ~1,500 words (a few pages)
+
+Inputs are built deterministically (--seed) from the builtin and style
+sample sentences: the "output" and "reference" are the source with ~10% /
+~5% of words substituted, dropped or inserted, like a real rewrite. For
+each (function, size) it reports ops/sec (best of --repeat timing rounds of
+at least --min-time seconds) and peak memory allocated by one call
+(tracemalloc, measured separately so it doesn't skew the timing).
+
+--save-baseline writes the numbers to JSON; --baseline compares against a
+saved file and flags cases more than --threshold slower. No model server
+is needed.
+
+Usage:
+    python bench_metrics.py
+    python bench_metrics.py --save-baseline bench_baseline.json
+    python bench_metrics.py --baseline bench_baseline.json --fail-on-regression
+    python bench_metrics.py --filter gleu --sizes tweet email
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import timeit
+import tracemalloc
+
+import eval_prompts
+import eval_styles
+
+SIZES = {"tweet": 30, "email": 150, "doc": 1500}
+THRESHOLD = 0.2
+
+
+# ─── Inputs ──────────────────────────────────────────────────────────────────
+
+def _sentence_pool():
+    from builtin_samples import BUILTIN_SAMPLES
+    from style_samples import CASUAL_SAMPLES, CONCISE_SAMPLES, PROFESSIONAL_SAMPLES
+
+    pool = []
+    for sample in BUILTIN_SAMPLES + CONCISE_SAMPLES + CASUAL_SAMPLES + PROFESSIONAL_SAMPLES:
+        pool.append(sample["source"])
+        pool.extend(sample.get("references", []))
+    return pool
+
+
+def _perturb(words, rate, rng, vocabulary):
+    """Substitute, drop or insert roughly `rate` of the words."""
+    out = []
+    for word in words:
+        roll = rng.random()
+        if roll < rate / 3:
+            out.append(rng.choice(vocabulary))
+        elif roll < 2 * rate / 3:
+            continue
+        elif roll < rate:
+            out.extend([word, rng.choice(vocabulary)])
+        else:
+            out.append(word)
+    return out
+
+
+def make_inputs(words, seed=0):
+    """Generated {source, output, references, preserve} of about `words` words."""
+    rng = random.Random(seed)
+    pool = _sentence_pool()
+    vocabulary = sorted({w for s in pool for w in s.split()})
+
+    source_words = []
+    while len(source_words) < words:
+        source_words.extend(rng.choice(pool).split())
+    source_words = source_words[:words]
+
+    preserve = rng.sample(source_words, min(5, len(source_words))) + ["zeitgeist"]
+    return {
+        "source": " ".join(source_words),
+        "output": " ".join(_perturb(source_words, 0.10, rng, vocabulary)),
+        "references": [" ".join(_perturb(source_words, 0.05, rng, vocabulary)) for _ in range(2)],
+        "preserve": preserve,
+    }
+
+
+def cases(inputs):
+    """(name, zero-argument callable) for every benchmarked function."""
+    src, out, refs = inputs["source"], inputs["output"], inputs["references"]
+    src_tokens, out_tokens = src.split(), out.split()
+    return [
+        ("compute_gleu", lambda: eval_prompts.compute_gleu(src, out, refs)),
+        ("compute_gleu[styles]", lambda: eval_styles.compute_gleu(src, out, refs)),
+        ("word_edit_distance", lambda: eval_prompts.word_edit_distance(src_tokens, out_tokens)),
+        ("compute_overcorrection", lambda: eval_prompts.compute_overcorrection(src, out, refs)),
+        ("informality_score", lambda: eval_styles.informality_score(out)),
+        ("formality_score", lambda: eval_styles.formality_score(out)),
+        ("meaning_preserved", lambda: eval_styles.meaning_preserved(out, inputs["preserve"])),
+    ]
+
+
+# ─── Measuring ───────────────────────────────────────────────────────────────
+
+def time_case(fn, min_time=0.2, repeat=3):
+    """Best ops/sec over `repeat` rounds of at least `min_time` seconds each."""
+    fn()  # warm up caches / lazy imports
+    timer = timeit.Timer(fn)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9)))
+    best = min([elapsed] + timer.repeat(repeat=repeat - 1, number=number)) if repeat > 1 else elapsed
+    return number / best
+
+
+def peak_memory(fn):
+    """Peak bytes allocated during one call."""
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def run_benchmarks(sizes=None, name_filter=None, min_time=0.2, repeat=3, seed=0):
+    """Returns {"<function>/<size>": {"ops_per_sec", "peak_bytes", "words"}}."""
+    results = {}
+    for size in sizes or list(SIZES):
+        inputs = make_inputs(SIZES[size], seed)
+        for name, fn in cases(inputs):
+            if name_filter and name_filter not in name:
+                continue
+            key = f"{name}/{size}"
+            print(f"  {key:36s}", end=" ", flush=True)
+            ops = time_case(fn, min_time, repeat)
+            peak = peak_memory(fn)
+            results[key] = {"ops_per_sec": ops, "peak_bytes": peak, "words": SIZES[size]}
+            print(f"{ops:12,.1f} ops/s  {_fmt_bytes(peak):>10s}")
+    return results
+
+
+# ─── Reporting ───────────────────────────────────────────────────────────────
+
+def _fmt_bytes(n):
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.0f}{unit}" if unit == "B" else f"{n:.1f}{unit}"
+        n /= 1024
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """Rows of (key, base ops, new ops, ratio, base peak, new peak, regressed)."""
+    rows = []
+    for key, new in results.items():
+        old = baseline.get(key)
+        if old is None:
+            continue
+        ratio = new["ops_per_sec"] / old["ops_per_sec"] if old["ops_per_sec"] else float("inf")
+        rows.append((key, old["ops_per_sec"], new["ops_per_sec"], ratio,
+                     old.get("peak_bytes"), new["peak_bytes"], ratio < 1 - threshold))
+    return rows
+
+
+def print_comparison(rows, threshold=THRESHOLD):
+    try:
+        from tabulate import tabulate
+    except ImportError:
+        tabulate = None
+
+    headers = ["Case", "Baseline ops/s", "Current ops/s", "Speed", "Baseline peak", "Current peak", ""]
+    table = [[
+        key, f"{old:,.1f}", f"{new:,.1f}", f"{ratio:.2f}x",
+        _fmt_bytes(old_peak) if old_peak is not None else "—", _fmt_bytes(new_peak),
+        "REGRESSION" if regressed else "",
+    ] for key, old, new, ratio, old_peak, new_peak, regressed in rows]
+
+    print(f"\n{'='*70}")
+    print(f"  VS BASELINE (regression = more than {threshold:.0%} slower)")
+    print(f"{'='*70}")
+    if tabulate:
+        print(tabulate(table, headers=headers, tablefmt="grid"))
+    else:
+        for row in [headers] + table:
+            print("  ".join(str(c) for c in row))
+
+
+# ─── Main ─────────────────────────────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks for ProseKit metric functions")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=None,
+                        help="Input sizes to run (default: all)")
+    parser.add_argument("--filter", type=str, default=None,
+                        help="Only functions whose name contains this")
+    parser.add_argument("--min-time", type=float, default=0.2,
+                        help="Minimum seconds per timing round")
+    parser.add_argument("--repeat", type=int, default=3, help="Timing rounds (best is kept)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for generated inputs")
+    parser.add_argument("--save-baseline", type=str, default=None, help="Write results to this JSON file")
+    parser.add_argument("--baseline", type=str, default=None, help="Compare against this JSON file")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="Slowdown fraction counted as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true",
+                        help="Exit 1 if any case regressed against --baseline")
+    args = parser.parse_args()
+
+    print(f"Benchmarking metric functions (Python {platform.python_version()}, {platform.machine()})")
+    results = run_benchmarks(args.sizes, args.filter, args.min_time, args.repeat, args.seed)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump({
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "seed": args.seed,
+                "results": results,
+            }, f, indent=2)
+        print(f"\nBaseline saved to: {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows = compare(results, baseline["results"], args.threshold)
+        print_comparison(rows, args.threshold)
+        if args.fail_on_regression and any(row[-1] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,8 @@
 builtin_samples.py — Hand-curated grammar error test cases.
 
 Used as a fallback when JFLEG can't be downloaded, or for quick smoke tests.
-Each sample has: source (with errors), and 1-2 reference corrections.
+Each sample has: source (with errors), category (error type), and 1-2
+reference corrections.
 
 These cover common error types ProseKit will encounter in the wild:
 - Homophones (their/they're/there, your/you're, its/it's)
@@ -19,24 +20,28 @@ BUILTIN_SAMPLES = [
     # ─── Homophones ────────────────────────────────────────────────
     {
         "source": "Their going to the park with there friends.",
+        "category": "homophones",
         "references": [
             "They're going to the park with their friends.",
         ],
     },
     {
         "source": "Your the best person I no.",
+        "category": "homophones",
         "references": [
             "You're the best person I know.",
         ],
     },
     {
         "source": "Its been a long day and the dog lost it's bone.",
+        "category": "homophones",
         "references": [
             "It's been a long day and the dog lost its bone.",
         ],
     },
     {
         "source": "Who's book is this? I think its your's.",
+        "category": "homophones",
         "references": [
             "Whose book is this? I think it's yours.",
         ],
@@ -45,6 +50,7 @@ BUILTIN_SAMPLES = [
     # ─── Subject-Verb Agreement ────────────────────────────────────
     {
         "source": "The team are going to the finals and they is very excited.",
+        "category": "subject_verb_agreement",
         "references": [
             "The team is going to the finals and they are very excited.",
             "The team are going to the finals and they are very excited.",
@@ -52,12 +58,14 @@ BUILTIN_SAMPLES = [
     },
     {
         "source": "Each of the students have their own laptop.",
+        "category": "subject_verb_agreement",
         "references": [
             "Each of the students has their own laptop.",
         ],
     },
     {
         "source": "There is many reasons why this wont work.",
+        "category": "subject_verb_agreement",
         "references": [
             "There are many reasons why this won't work.",
         ],
@@ -66,18 +74,21 @@ BUILTIN_SAMPLES = [
     # ─── Tense Errors ─────────────────────────────────────────────
     {
         "source": "I goes to the store yesterday and buyed some milk.",
+        "category": "tense",
         "references": [
             "I went to the store yesterday and bought some milk.",
         ],
     },
     {
         "source": "She was walking home when she sees a cat and picked it up.",
+        "category": "tense",
         "references": [
             "She was walking home when she saw a cat and picked it up.",
         ],
     },
     {
         "source": "He has went to the gym every day last week.",
+        "category": "tense",
         "references": [
             "He went to the gym every day last week.",
             "He has gone to the gym every day last week.",
@@ -87,18 +98,21 @@ BUILTIN_SAMPLES = [
     # ─── Spelling Errors ──────────────────────────────────────────
     {
         "source": "I recieved the accomodation details for the confrence.",
+        "category": "spelling",
         "references": [
             "I received the accommodation details for the conference.",
         ],
     },
     {
         "source": "The goverment made an annoucement about the enviroment.",
+        "category": "spelling",
         "references": [
             "The government made an announcement about the environment.",
         ],
     },
     {
         "source": "She definately didnt know about the occurence.",
+        "category": "spelling",
         "references": [
             "She definitely didn't know about the occurrence.",
         ],
@@ -107,6 +121,7 @@ BUILTIN_SAMPLES = [
     # ─── Missing/Extra Articles ────────────────────────────────────
     {
         "source": "I need go to store to buy a bread.",
+        "category": "articles",
         "references": [
             "I need to go to the store to buy bread.",
             "I need to go to the store to buy some bread.",
@@ -114,6 +129,7 @@ BUILTIN_SAMPLES = [
     },
     {
         "source": "She is best student in the class.",
+        "category": "articles",
         "references": [
             "She is the best student in the class.",
         ],
@@ -122,6 +138,7 @@ BUILTIN_SAMPLES = [
     # ─── Punctuation ──────────────────────────────────────────────
     {
         "source": "Lets eat grandma before she gets cold",
+        "category": "punctuation",
         "references": [
             "Let's eat, grandma, before she gets cold.",
             "Let's eat, Grandma, before she gets cold.",
@@ -129,12 +146,14 @@ BUILTIN_SAMPLES = [
     },
     {
         "source": "I like cooking my family and my pets",
+        "category": "punctuation",
         "references": [
             "I like cooking, my family, and my pets.",
         ],
     },
     {
         "source": "however I think that were going to be late dont you agree",
+        "category": "punctuation",
         "references": [
             "However, I think that we're going to be late. Don't you agree?",
             "However, I think that we're going to be late, don't you agree?",
@@ -144,18 +163,21 @@ BUILTIN_SAMPLES = [
     # ─── Already Correct (should be returned unchanged) ───────────
     {
         "source": "The weather is beautiful today.",
+        "category": "already_correct",
         "references": [
             "The weather is beautiful today.",
         ],
     },
     {
         "source": "I'm going to finish this project by Friday.",
+        "category": "already_correct",
         "references": [
             "I'm going to finish this project by Friday.",
         ],
     },
     {
         "source": "She quickly ran across the street to catch the bus.",
+        "category": "already_correct",
         "references": [
             "She quickly ran across the street to catch the bus.",
         ],
@@ -164,6 +186,7 @@ BUILTIN_SAMPLES = [
     # ─── Real-World Chat Messages (ProseKit's primary use case) ───
     {
         "source": "hey can u send me the file i need it asap thx",
+        "category": "chat",
         "references": [
             "Hey, can you send me the file? I need it ASAP. Thanks.",
             "Hey, can you send me the file? I need it ASAP, thanks.",
@@ -171,6 +194,7 @@ BUILTIN_SAMPLES = [
     },
     {
         "source": "im gonna be late to the meeting sry something came up",
+        "category": "chat",
         "references": [
             "I'm going to be late to the meeting, sorry, something came up.",
             "I'm gonna be late to the meeting, sorry, something came up.",
@@ -178,6 +202,7 @@ BUILTIN_SAMPLES = [
     },
     {
         "source": "lmk when your free to talk about the project",
+        "category": "chat",
         "references": [
             "Let me know when you're free to talk about the project.",
             "LMK when you're free to talk about the project.",
@@ -185,6 +210,7 @@ BUILTIN_SAMPLES = [
     },
     {
         "source": "did you seen the email from the client? its importent",
+        "category": "chat",
         "references": [
             "Did you see the email from the client? It's important.",
         ],
@@ -193,18 +219,21 @@ BUILTIN_SAMPLES = [
     # ─── Mixed Errors (multiple types) ────────────────────────────
     {
         "source": "Me and him goes to the libary every tuesdays to studie for are exam.",
+        "category": "mixed",
         "references": [
             "He and I go to the library every Tuesday to study for our exam.",
         ],
     },
     {
         "source": "The companys profits has droped significently since they're CEO leaved.",
+        "category": "mixed",
         "references": [
             "The company's profits have dropped significantly since their CEO left.",
         ],
     },
     {
         "source": "I should of went to the docter but I didnt had no time.",
+        "category": "mixed",
         "references": [
             "I should have gone to the doctor, but I didn't have time.",
             "I should have gone to the doctor but I didn't have any time.",
@@ -212,6 +241,7 @@ BUILTIN_SAMPLES = [
     },
     {
         "source": "Noone could of predicted that the wether would be so bad on they're wedding day.",
+        "category": "mixed",
         "references": [
             "No one could have predicted that the weather would be so bad on their wedding day.",
         ],
@@ -220,6 +250,7 @@ BUILTIN_SAMPLES = [
     # ─── Technical Writing ────────────────────────────────────────
     {
         "source": "The API endpoint returns a JSON object which contain the users data.",
+        "category": "technical",
         "references": [
             "The API endpoint returns a JSON object which contains the user's data.",
             "The API endpoint returns a JSON object that contains the user's data.",
@@ -227,6 +258,7 @@ BUILTIN_SAMPLES = [
     },
     {
         "source": "Please insure that all tests passes before merging the pull request.",
+        "category": "technical",
         "references": [
             "Please ensure that all tests pass before merging the pull request.",
         ],
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+chunked_rewrite.py — Paragraph-chunked parallel rewriting, benchmarked against single-shot.
+
+A long input sent as one prompt has to be prefilled and decoded in full
+before anything comes back, and anything past max_tokens is lost. This is a
+reference pipeline for long inputs, built on the harnesses' prompt variants
+and clean_response():
+
+  1. split_chunks() cuts the text at line breaks (blank-line paragraph
+     breaks included). Each non-empty line becomes a chunk; its indentation,
+     list marker ("- ", "* ", "•", "1.", "a)") and surrounding whitespace
+     are kept aside, and only the prose is sent to the model. Letter
+     markers are lower-case only, so initials and "I." starting a line of
+     prose ("J. K. Rowling wrote it.") stay in the text. Lines with no
+     letters (rules, "---") are kept as they are.
+  2. Chunks are rewritten concurrently (--workers requests in flight).
+  3. join_chunks() puts each rewrite back between the original separators,
+     so blank lines, indentation and list markers come back exactly
+     (rule 5 of the production prompt: "Preserve the original
+     paragraph/line break structure"). A rewrite that spans several lines,
+     or repeats its list marker, is folded back into one line. A chunk whose
+     request fails keeps its original text.
+
+The benchmark builds long documents from the style samples — prose
+paragraphs alternating with bulleted and numbered lists — and rewrites
+each one single-shot (one request, max_tokens=512) and chunked. Per mode
+and size it reports end-to-end latency for both, the speedup, how often
+single-shot output was truncated, and how often each kept the document's
+line structure (blank lines and list markers line by line). Chunking only
+pays off in latency if the server serves several requests at once;
+against a one-slot server, chunks just queue.
+
+Usage:
+    python chunked_rewrite.py --modes casual professional --sizes 250 1000
+    python chunked_rewrite.py --workers 8 --output chunked.json
+    python chunked_rewrite.py --stub --stub-speed 0.05 --stub-slots 4
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from eval_prompts import clean_response
+from load_test import MODE_VARIANTS, build_workload, find_variant
+from swama_client import DEFAULT_MODEL, complete
+
+MAX_TOKENS = 512
+WORKERS = 4
+SIZES = (250, 1000, 2500)
+STYLE_MODES = ("concise", "casual", "professional")
+
+_LINE_RE = re.compile(r"^(\s*(?:(?:[-*+•]|\d+[.)]|[a-z][.)])\s+)?)(.*?)(\s*)$", re.DOTALL)
+_MARKER_RE = re.compile(r"^\s*(?:[-*+•]|\d+[.)]|[a-z][.)])\s+")
+_ALPHA_RE = re.compile(r"[^\W\d_]")
+
+
+# ─── Splitting and Reassembly ────────────────────────────────────────────────
+
+def split_chunks(text):
+    """
+    Split text into pieces that join back to it exactly: separator strings
+    (line breaks, blank lines, lines without letters) and chunk dicts
+    {"lead", "body", "trail"} where only "body" is to be rewritten.
+    """
+    pieces = []
+    for part in re.split(r"(\n)", text):
+        if part == "\n" or not _ALPHA_RE.search(part):
+            if part:
+                pieces.append(part)
+            continue
+        lead, body, trail = _LINE_RE.match(part).groups()
+        pieces.append({"lead": lead, "body": body, "trail": trail})
+    return pieces
+
+
+def join_chunks(pieces, outputs=None):
+    """
+    Reassemble split_chunks() pieces, substituting outputs (one per chunk, in
+    order; None keeps the original body).
+    """
+    outputs = iter(outputs or [])
+    parts = []
+    for piece in pieces:
+        if isinstance(piece, str):
+            parts.append(piece)
+            continue
+        output = next(outputs, None)
+        parts.append(piece["lead"] + (piece["body"] if output is None else output) + piece["trail"])
+    return "".join(parts)
+
+
+def fit_to_line(output, had_marker):
+    """Fold a chunk's rewrite back onto one line, dropping a repeated list marker."""
+    output = " ".join(line.strip() for line in output.splitlines() if line.strip())
+    if had_marker:
+        output = _MARKER_RE.sub("", output, count=1)
+    return output
+
+
+def structure(text):
+    """Line skeleton: "" for blank lines, the list marker for list items, "p" for prose."""
+    skeleton = []
+    for line in text.split("\n"):
+        if not line.strip():
+            skeleton.append("")
+            continue
+        marker = _MARKER_RE.match(line)
+        skeleton.append(marker.group(0).strip() if marker else "p")
+    return skeleton
+
+
+def structure_preserved(source, output):
+    return structure(source.strip()) == structure(output.strip())
+
+
+# ─── Rewriting ───────────────────────────────────────────────────────────────
+
+def rewrite_single(text, variant, base_url, model=DEFAULT_MODEL, max_tokens=MAX_TOKENS):
+    """The whole text in one request, as the harnesses send it."""
+    start = time.perf_counter()
+    result = complete(text, variant["system_prompt"], variant["temperature"], base_url,
+                      model=model, max_tokens=max_tokens, stream=False, timeout=600)
+    return {
+        "text": clean_response(result["text"]),
+        "latency": time.perf_counter() - start,
+        "requests": 1,
+        "errors": 0,
+        "truncated": result["finish_reason"] == "length",
+        "completion_tokens": result["completion_tokens"],
+    }
+
+
+def rewrite_chunked(text, variant, base_url, model=DEFAULT_MODEL, workers=WORKERS,
+                    max_tokens=MAX_TOKENS):
+    """
+    Rewrite each chunk concurrently and reassemble. Returns the same shape as
+    rewrite_single(), plus the number of chunks.
+    """
+    pieces = split_chunks(text)
+    chunks = [piece for piece in pieces if isinstance(piece, dict)]
+
+    def rewrite_chunk(chunk):
+        try:
+            result = complete(chunk["body"], variant["system_prompt"], variant["temperature"], base_url,
+                              model=model, max_tokens=max_tokens, stream=False)
+        except Exception as e:
+            return {"output": None, "error": str(e)}
+        output = fit_to_line(clean_response(result["text"]), bool(chunk["lead"].strip()))
+        return {"output": output or None, "result": result}
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        rewritten = list(pool.map(rewrite_chunk, chunks))
+    latency = time.perf_counter() - start
+
+    ok = [r["result"] for r in rewritten if "result" in r]
+    return {
+        "text": join_chunks(pieces, [r["output"] for r in rewritten]),
+        "latency": latency,
+        "requests": len(chunks),
+        "errors": len(chunks) - len(ok),
+        "truncated": any(r["finish_reason"] == "length" for r in ok),
+        "completion_tokens": sum(r["completion_tokens"] or 0 for r in ok),
+    }
+
+
+# ─── Benchmark ───────────────────────────────────────────────────────────────
+
+def build_structured_document(sources, words, rng):
+    """
+    About `words` words of samples, cycling through a prose paragraph, another
+    prose paragraph and a list (alternately bulleted and numbered).
+    """
+    pool = []
+
+    def take():
+        if not pool:
+            pool.extend(sources)
+            rng.shuffle(pool)
+        return pool.pop()
+
+    blocks = []
+    count = 0
+    while count < words:
+        items = [take() for _ in range(3)]
+        count += sum(len(item.split()) for item in items)
+        if len(blocks) % 3 == 2:
+            numbered = len(blocks) % 2 == 0
+            blocks.append("\n".join(
+                f"{n}. {item}" if numbered else f"- {item}" for n, item in enumerate(items, 1)
+            ))
+        else:
+            blocks.append(" ".join(items))
+    return "\n\n".join(blocks)
+
+
+def run_benchmark(modes, sizes, docs, variants, base_url, model=DEFAULT_MODEL,
+                  workers=WORKERS, seed=0):
+    sources = {}
+    for item in build_workload(modes):
+        sources.setdefault(item["mode"], []).append(item["source"])
+
+    records = []
+    for mode in modes:
+        variant = variants[mode]
+        for size in sizes:
+            for doc in range(docs):
+                rng = random.Random(f"{seed}:{mode}:{size}:{doc}")
+                text = build_structured_document(sources[mode], size, rng)
+                words = len(text.split())
+                print(f"  {mode:13s} {words:>6,d} words (doc {doc}) ...", end=" ", flush=True)
+                record = {"mode": mode, "size": size, "doc": doc, "words": words,
+                          "variant": variant["name"]}
+                for name, fn in (("single", lambda: rewrite_single(text, variant, base_url, model)),
+                                 ("chunked", lambda: rewrite_chunked(text, variant, base_url, model, workers))):
+                    try:
+                        result = fn()
+                    except Exception as e:
+                        record[name] = {"error": str(e)}
+                        continue
+                    result["structure_preserved"] = structure_preserved(text, result["text"])
+                    result["output_words"] = len(result.pop("text").split())
+                    record[name] = result
+                records.append(record)
+                single, chunked = record["single"], record["chunked"]
+                print(" / ".join(
+                    f"{name} " + (f"{r['latency']:.2f}s" if "latency" in r else "ERROR")
+                    for name, r in (("single", single), ("chunked", chunked))
+                ))
+    return records
+
+
+def _mean(values):
+    values = [v for v in values if v is not None]
+    return sum(values) / len(values) if values else None
+
+
+def summary_rows(records):
+    groups = {}
+    for r in records:
+        groups.setdefault((r["mode"], r["size"]), []).append(r)
+    rows = []
+    for (mode, size), group in groups.items():
+        single = [r["single"] for r in group if "latency" in r["single"]]
+        chunked = [r["chunked"] for r in group if "latency" in r["chunked"]]
+        single_latency = _mean([s["latency"] for s in single])
+        chunked_latency = _mean([c["latency"] for c in chunked])
+        rows.append({
+            "mode": mode,
+            "size": size,
+            "docs": len(group),
+            "words": _mean([r["words"] for r in group]),
+            "chunks": _mean([c["requests"] for c in chunked]),
+            "single_latency": single_latency,
+            "chunked_latency": chunked_latency,
+            "speedup": single_latency / chunked_latency if single_latency and chunked_latency else None,
+            "single_truncated": _mean([1.0 if s["truncated"] else 0.0 for s in single]),
+            "single_structure": _mean([1.0 if s["structure_preserved"] else 0.0 for s in single]),
+            "chunked_structure": _mean([1.0 if c["structure_preserved"] else 0.0 for c in chunked]),
+            "chunk_errors": sum(c["errors"] for c in chunked),
+        })
+    return rows
+
+
+def print_report(rows, workers):
+    try:
+        from tabulate import tabulate
+    except ImportError:
+        tabulate = None
+
+    def fmt(value, spec, suffix=""):
+        return f"{value:{spec}}{suffix}" if value is not None else "—"
+
+    headers = ["Mode", "Size", "Words", "Chunks", "Single", "Chunked", "Speedup",
+               "Single trunc", "Structure (single/chunked)", "Chunk errors"]
+    table = [[
+        r["mode"], r["size"], fmt(r["words"], ",.0f"), fmt(r["chunks"], ".0f"),
+        fmt(r["single_latency"], ".2f", "s"), fmt(r["chunked_latency"], ".2f", "s"),
+        fmt(r["speedup"], ".2f", "x"), fmt(r["single_truncated"], ".0%"),
+        f"{fmt(r['single_structure'], '.0%')} / {fmt(r['chunked_structure'], '.0%')}",
+        r["chunk_errors"],
+    ] for r in rows]
+
+    print(f"\n{'='*70}")
+    print(f"  SINGLE-SHOT VS CHUNKED ({workers} workers)")
+    print(f"{'='*70}")
+    if tabulate:
+        print(tabulate(table, headers=headers, tablefmt="grid"))
+    else:
+        for row in [headers] + table:
+            print("  ".join(str(c) for c in row))
+
+
+# ─── Main ─────────────────────────────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunked parallel rewriting vs single-shot on long inputs")
+    parser.add_argument("--url", type=str, default="http://localhost:8080", help="Swama server URL")
+    parser.add_argument("--model", type=str, default=DEFAULT_MODEL, help="Model ID to request")
+    parser.add_argument("--modes", nargs="+", choices=list(MODE_VARIANTS), default=list(STYLE_MODES),
+                        help="Modes to benchmark (default: the style modes)")
+    parser.add_argument("--variant", type=str, action="append", default=[],
+                        help="Variant for a mode as mode=name (default: each mode's lead variant)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="Document sizes in words")
+    parser.add_argument("--docs", type=int, default=2, help="Documents per mode and size")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Chunk requests in flight")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for document assembly")
+    parser.add_argument("--output", type=str, default=None, help="Save per-document results (JSON)")
+    parser.add_argument("--stub", action="store_true", help="Start an in-process Swama stub on --url's port")
+    parser.add_argument("--stub-speed", type=float, default=1.0, help="Stub delay multiplier (with --stub)")
+    parser.add_argument("--stub-slots", type=int, default=1, help="Stub concurrent slots (with --stub)")
+    args = parser.parse_args()
+
+    names = {}
+    for spec in args.variant:
+        mode, _, name = spec.partition("=")
+        if mode not in MODE_VARIANTS or not name:
+            print(f"ERROR: --variant must be mode=name with mode one of {', '.join(MODE_VARIANTS)}")
+            sys.exit(1)
+        names[mode] = name
+    try:
+        variants = {mode: find_variant(mode, names.get(mode)) for mode in args.modes}
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+
+    stub = None
+    if args.stub:
+        from urllib.parse import urlparse
+        import swama_stub
+        port = urlparse(args.url).port or 8080
+        stub = swama_stub.serve(port, speed=args.stub_speed, slots=args.stub_slots)
+        print(f"Started Swama stub on port {port} (speed ×{args.stub_speed}, {args.stub_slots} slot(s))")
+
+    records = run_benchmark(args.modes, sorted(args.sizes), args.docs, variants, args.url,
+                            args.model, args.workers, args.seed)
+    rows = summary_rows(records)
+    print_report(rows, args.workers)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "server_url": args.url,
+                "model": args.model,
+                "workers": args.workers,
+                "variants": {m: v["name"] for m, v in variants.items()},
+                "summary": rows,
+                "documents": records,
+            }, f, indent=2)
+        print(f"\nResults saved to: {args.output}")
+
+    if stub:
+        stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+concurrency_sweep.py — Find how many concurrent rewrites a machine sustains.
+
+Runs the same fixed sample set at increasing concurrency (1, 2, 4, 8, ...):
+at each level, that many workers pull samples off a shared queue, each
+sending its next request as soon as the previous one returns (closed loop).
+Samples use the harnesses' prompt variants — each mode's lead variant by
+default, or a specific one per mode — so the numbers map to production
+modes. For each level:
+
+  - throughput: samples/sec and generated tokens/sec
+  - latency p50/p95/p99
+
+and then the knee of the curve: the lowest concurrency that reaches 90% of
+peak throughput (--knee-fraction). Past the knee, extra concurrency buys
+little throughput and mostly adds queueing latency. Levels whose p95 is more
+than 2× the single-request p95 are flagged as saturated.
+
+Usage:
+    # Grammar samples, concurrency 1..16:
+    python concurrency_sweep.py --modes grammar --max-concurrency 16
+
+    # All modes, explicit levels, 48 samples per level:
+    python concurrency_sweep.py --levels 1 2 3 4 6 8 --samples 48
+
+    # Offline against an in-process stub with 2 serving slots:
+    python concurrency_sweep.py --stub --stub-speed 0.05 --stub-slots 2
+"""
+
+import argparse
+import json
+import queue
+import sys
+import threading
+import time
+
+from load_test import MODE_VARIANTS, build_workload, send
+from run_store import percentile
+from swama_client import DEFAULT_MODEL
+
+KNEE_FRACTION = 0.9
+SATURATION_FACTOR = 2.0
+
+
+# ─── Running ─────────────────────────────────────────────────────────────────
+
+def run_level(items, concurrency, base_url, model=DEFAULT_MODEL):
+    """Process every item with `concurrency` closed-loop workers. Returns a result dict."""
+    work = queue.Queue()
+    for item in items:
+        work.put(item)
+    latencies = []
+    tokens = [0]
+    errors = [0]
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            try:
+                item = work.get_nowait()
+            except queue.Empty:
+                return
+            result = send(item, base_url, model)
+            with lock:
+                if result.get("error"):
+                    errors[0] += 1
+                else:
+                    latencies.append(result["latency"])
+                    tokens[0] += result.get("completion_tokens") or 0
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "samples": len(items),
+        "errors": errors[0],
+        "wall": wall,
+        "samples_per_sec": len(latencies) / wall if wall else 0.0,
+        "tokens_per_sec": tokens[0] / wall if wall else 0.0,
+        "p50": percentile(latencies, 0.5),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+    }
+
+
+def find_knee(levels, fraction=KNEE_FRACTION):
+    """Lowest concurrency whose throughput reaches `fraction` of the peak (None if no data)."""
+    if not levels:
+        return None
+    peak = max(level["samples_per_sec"] for level in levels)
+    for level in levels:
+        if level["samples_per_sec"] >= fraction * peak:
+            return level["concurrency"]
+    return None
+
+
+def sweep(items, levels, base_url, model=DEFAULT_MODEL, stop_p95=None):
+    """Run each concurrency level in turn; stop early once p95 exceeds stop_p95."""
+    results = []
+    for concurrency in levels:
+        print(f"  concurrency {concurrency:3d} ...", end=" ", flush=True)
+        result = run_level(items, concurrency, base_url, model)
+        results.append(result)
+        p95 = result["p95"]
+        print(f"{result['samples_per_sec']:.2f} samples/s, p95 "
+              + (f"{p95:.2f}s" if p95 is not None else "—"))
+        if stop_p95 is not None and p95 is not None and p95 > stop_p95:
+            print(f"  p95 above {stop_p95}s — stopping sweep")
+            break
+    return results
+
+
+# ─── Reporting ───────────────────────────────────────────────────────────────
+
+def print_sweep(results, knee, fraction=KNEE_FRACTION):
+    try:
+        from tabulate import tabulate
+    except ImportError:
+        tabulate = None
+
+    base_p95 = results[0]["p95"] if results else None
+    peak = max((r["samples_per_sec"] for r in results), default=0.0)
+    headers = ["Concurrency", "Samples/s", "Tokens/s", "% peak", "P50", "P95", "P99", "Errors", ""]
+    rows = []
+    for r in results:
+        notes = []
+        if r["concurrency"] == knee:
+            notes.append("← knee")
+        if base_p95 and r["p95"] is not None and r["p95"] > SATURATION_FACTOR * base_p95:
+            notes.append("saturated")
+        rows.append([
+            r["concurrency"],
+            f"{r['samples_per_sec']:.2f}",
+            f"{r['tokens_per_sec']:.1f}",
+            f"{r['samples_per_sec'] / peak:.0%}" if peak else "—",
+            *(f"{r[k]:.3f}s" if r[k] is not None else "—" for k in ("p50", "p95", "p99")),
+            r["errors"],
+            " ".join(notes),
+        ])
+
+    print(f"\n{'='*70}")
+    print("  CONCURRENCY SWEEP")
+    print(f"{'='*70}")
+    if tabulate:
+        print(tabulate(rows, headers=headers, tablefmt="grid"))
+    else:
+        for row in [headers] + rows:
+            print("  ".join(str(c) for c in row))
+
+    if knee is not None:
+        print(f"\n  Knee: concurrency {knee} reaches {fraction:.0%} of peak throughput ({peak:.2f} samples/s).")
+        print("  Beyond it, more concurrency mostly adds queueing latency.")
+
+
+# ─── Main ─────────────────────────────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput/latency at increasing concurrency")
+    parser.add_argument("--url", type=str, default="http://localhost:8080", help="Swama server URL")
+    parser.add_argument("--model", type=str, default=DEFAULT_MODEL, help="Model ID to request")
+    parser.add_argument("--levels", type=int, nargs="+", default=None,
+                        help="Concurrency levels (default: powers of two up to --max-concurrency)")
+    parser.add_argument("--max-concurrency", type=int, default=16)
+    parser.add_argument("--samples", type=int, default=32,
+                        help="Requests per level (the fixed sample set, cycled if needed)")
+    parser.add_argument("--modes", nargs="+", choices=list(MODE_VARIANTS), default=None,
+                        help="Modes to draw samples from (default: all)")
+    parser.add_argument("--variant", type=str, action="append", default=[],
+                        help="Variant for a mode as mode=name (default: each mode's lead variant)")
+    parser.add_argument("--knee-fraction", type=float, default=KNEE_FRACTION,
+                        help="Knee = lowest level reaching this fraction of peak throughput")
+    parser.add_argument("--stop-p95", type=float, default=None,
+                        help="Stop the sweep once p95 latency exceeds this many seconds")
+    parser.add_argument("--output", type=str, default=None, help="Save results (JSON)")
+    parser.add_argument("--stub", action="store_true", help="Start an in-process Swama stub on --url's port")
+    parser.add_argument("--stub-speed", type=float, default=1.0, help="Stub delay multiplier (with --stub)")
+    parser.add_argument("--stub-slots", type=int, default=1, help="Stub concurrent slots (with --stub)")
+    args = parser.parse_args()
+
+    variant_names = {}
+    for spec in args.variant:
+        mode, _, name = spec.partition("=")
+        if mode not in MODE_VARIANTS or not name:
+            print(f"ERROR: --variant must be mode=name with mode one of {', '.join(MODE_VARIANTS)}")
+            sys.exit(1)
+        variant_names[mode] = name
+
+    try:
+        workload = build_workload(args.modes, variant_names)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+
+    # Interleave modes so every level sees the same mix, then cycle to --samples
+    by_mode = {}
+    for item in workload:
+        by_mode.setdefault(item["mode"], []).append(item)
+    interleaved = [group[i] for i in range(max(len(g) for g in by_mode.values()))
+                   for group in by_mode.values() if i < len(group)]
+    items = [interleaved[i % len(interleaved)] for i in range(args.samples)]
+
+    levels = args.levels
+    if not levels:
+        levels = []
+        level = 1
+        while level <= args.max_concurrency:
+            levels.append(level)
+            level *= 2
+
+    stub = None
+    if args.stub:
+        from urllib.parse import urlparse
+        import swama_stub
+        port = urlparse(args.url).port or 8080
+        stub = swama_stub.serve(port, speed=args.stub_speed, slots=args.stub_slots)
+        print(f"Started Swama stub on port {port} (speed ×{args.stub_speed}, {args.stub_slots} slot(s))")
+
+    variants = sorted({f"{i['mode']}={i['variant']['name']}" for i in items})
+    print(f"Sweeping concurrency {levels} over {len(items)} samples ({', '.join(variants)})")
+    results = sweep(items, levels, args.url, args.model, args.stop_p95)
+    knee = find_knee(results, args.knee_fraction)
+    print_sweep(results, knee, args.knee_fraction)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "server_url": args.url,
+                "model": args.model,
+                "variants": variants,
+                "knee": knee,
+                "levels": results,
+            }, f, indent=2)
+        print(f"\nResults saved to: {args.output}")
+
+    if stub:
+        stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""
+diff_results.py — Compare two evaluation runs and flag regressions.
+
+Joins two results files (legacy .json or .jsonl, in any combination) by
+(mode, variant, sample ID), computes per-sample deltas for GLEU,
+overcorrection, meaning preservation and latency, tests each variant's
+deltas with a Wilcoxon signed-rank test, and lists the samples that got
+worse the most.
+
+The baseline run is streamed into compact per-column arrays; the candidate
+run is streamed against it, so only one run's numbers (plus the baseline
+outputs for the worst-example listing) are held in memory. This handles
+100k-row runs comfortably.
+
+Usage:
+    # Compare two runs:
+    python diff_results.py results_jfleg.json results_jfleg_v2.json
+
+    # Compare one variant against a renamed one (prompt edited in prompts.py):
+    python diff_results.py old.jsonl new.jsonl --variant v2_strict_minimal --as v9_new_prompt
+
+    # Show more worst examples and fail (exit 1) on any significant regression (for CI):
+    python diff_results.py old.jsonl new.jsonl --worst 20 --fail-on-regression
+"""
+
+import argparse
+import heapq
+import math
+import sys
+from array import array
+
+from results_io import iter_details
+from sample_registry import sample_id
+
+# (detail key, direction): +1 = higher is better, -1 = lower is better
+METRICS = [
+    ("gleu", 1),
+    ("overcorrection", -1),
+    ("meaning_preserved", 1),
+    ("latency", -1),
+]
+
+
+# ─── Statistics ──────────────────────────────────────────────────────────────
+
+def wilcoxon_signed_rank(deltas):
+    """
+    Two-sided Wilcoxon signed-rank test with the normal approximation
+    (tie-corrected). Zero deltas are dropped.
+
+    Returns (z, p_value); p_value is 1.0 when there's nothing to test.
+    """
+    nonzero = [d for d in deltas if d != 0]
+    n = len(nonzero)
+    if n == 0:
+        return 0.0, 1.0
+
+    order = sorted(range(n), key=lambda i: abs(nonzero[i]))
+    ranks = [0.0] * n
+    tie_term = 0.0
+    i = 0
+    while i < n:
+        j = i
+        while j + 1 < n and abs(nonzero[order[j + 1]]) == abs(nonzero[order[i]]):
+            j += 1
+        avg_rank = (i + j) / 2 + 1
+        for k in range(i, j + 1):
+            ranks[order[k]] = avg_rank
+        t = j - i + 1
+        tie_term += t ** 3 - t
+        i = j + 1
+
+    w_plus = sum(r for r, d in zip(ranks, nonzero) if d > 0)
+    mean = n * (n + 1) / 4
+    var = n * (n + 1) * (2 * n + 1) / 24 - tie_term / 48
+    if var <= 0:
+        return 0.0, 1.0
+    z = (w_plus - mean) / math.sqrt(var)
+    return z, math.erfc(abs(z) / math.sqrt(2))
+
+
+def mean(values):
+    return sum(values) / len(values) if values else 0.0
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+# ─── Loading ─────────────────────────────────────────────────────────────────
+
+def _key(record, rename=None):
+    variant = record["variant"]
+    if rename:
+        variant = rename.get(variant, variant)
+    sid = record.get("sample_id") or sample_id(record["source"])
+    return (record.get("mode"), variant, sid)
+
+
+def load_baseline(path, variants=None, rename=None):
+    """
+    Stream the baseline run into column arrays.
+
+    Returns (row_of, columns, outputs): key → row number, metric → array('d')
+    (NaN where missing), and the baseline outputs by row.
+    """
+    row_of = {}
+    columns = {name: array("d") for name, _ in METRICS}
+    outputs = []
+    for record in iter_details(path):
+        if variants and record["variant"] not in variants:
+            continue
+        if record.get("error"):
+            continue
+        key = _key(record, rename)
+        if key in row_of:
+            continue
+        row_of[key] = len(outputs)
+        outputs.append(record.get("output"))
+        for name, _ in METRICS:
+            value = record.get(name)
+            columns[name].append(float("nan") if value is None else float(value))
+    return row_of, columns, outputs
+
+
+# ─── Diffing ─────────────────────────────────────────────────────────────────
+
+def diff_runs(path_a, path_b, variants_a=None, variant_b=None, rename=None, worst=10):
+    """
+    Join run B against run A and compute per-variant delta statistics.
+
+    Returns (summary, worst_examples):
+      summary: {(mode, variant): {metric: {...stats...}, "paired": n}}
+      worst_examples: {(mode, variant): [(gleu_delta, sid, source, out_a, out_b), ...]}
+    """
+    row_of, base_cols, base_outputs = load_baseline(path_a, variants_a, rename)
+
+    # Deltas accumulate per (mode, variant) in column arrays
+    deltas = {}
+    latencies = {}
+    heaps = {}
+    paired = {}
+
+    for record in iter_details(path_b):
+        if variant_b and record["variant"] != variant_b:
+            continue
+        if record.get("error"):
+            continue
+        key = _key(record)
+        row = row_of.get(key)
+        if row is None:
+            continue
+
+        group = key[:2]
+        if group not in deltas:
+            deltas[group] = {name: array("d") for name, _ in METRICS}
+            latencies[group] = (array("d"), array("d"))
+            heaps[group] = []
+            paired[group] = 0
+        paired[group] += 1
+
+        for name, _ in METRICS:
+            base = base_cols[name][row]
+            value = record.get(name)
+            if value is None or math.isnan(base):
+                continue
+            deltas[group][name].append(float(value) - base)
+
+        if record.get("latency") is not None and not math.isnan(base_cols["latency"][row]):
+            latencies[group][0].append(base_cols["latency"][row])
+            latencies[group][1].append(record["latency"])
+
+        gleu = record.get("gleu")
+        if worst > 0 and gleu is not None and not math.isnan(base_cols["gleu"][row]):
+            d = gleu - base_cols["gleu"][row]
+            item = (-d, key[2], record.get("source", ""), base_outputs[row], record.get("output"))
+            # Keep the `worst` most negative GLEU deltas (min-heap on -delta)
+            if len(heaps[group]) < worst:
+                heapq.heappush(heaps[group], item)
+            elif item > heaps[group][0]:
+                heapq.heapreplace(heaps[group], item)
+
+    summary = {}
+    for group, cols in deltas.items():
+        stats = {"paired": paired[group]}
+        for name, direction in METRICS:
+            values = cols[name]
+            if not values:
+                continue
+            z, p = wilcoxon_signed_rank(values)
+            m = mean(values)
+            stats[name] = {
+                "n": len(values),
+                "mean_delta": m,
+                "worse": sum(1 for d in values if d * direction < 0),
+                "better": sum(1 for d in values if d * direction > 0),
+                "p_value": p,
+            }
+        lat_a, lat_b = latencies[group]
+        if lat_a:
+            stats["p95_latency"] = (percentile(lat_a, 0.95), percentile(lat_b, 0.95))
+        summary[group] = stats
+
+    worst_examples = {
+        group: [(-item[0],) + item[1:] for item in sorted(heap, reverse=True)]
+        for group, heap in heaps.items()
+    }
+    return summary, worst_examples
+
+
+# ─── Reporting ───────────────────────────────────────────────────────────────
+
+def print_summary(summary, alpha):
+    try:
+        from tabulate import tabulate
+    except ImportError:
+        tabulate = None
+
+    headers = ["Variant", "Mode", "Paired", "ΔGLEU", "p", "ΔOvercorr", "p",
+               "ΔLatency", "p", "P95 A→B", "Verdict"]
+    rows = []
+    for (mode, variant), stats in sorted(summary.items(), key=lambda kv: (kv[0][0] or "", kv[0][1])):
+        def cell(name, spec):
+            s = stats.get(name)
+            if not s:
+                return "—", "—"
+            return format(s["mean_delta"], spec), f"{s['p_value']:.3f}"
+
+        gleu, gleu_p = cell("gleu", "+.4f")
+        over, over_p = cell("overcorrection", "+.4f")
+        lat, lat_p = cell("latency", "+.3f")
+        p95 = stats.get("p95_latency")
+        regressed = [
+            name for name, _ in METRICS
+            if stats.get(name) and stats[name]["mean_delta"] * dict(METRICS)[name] < 0
+            and stats[name]["p_value"] < alpha
+        ]
+        rows.append([
+            variant, mode, stats["paired"], gleu, gleu_p, over, over_p, lat, lat_p,
+            f"{p95[0]:.2f}s→{p95[1]:.2f}s" if p95 else "—",
+            ("REGRESSED: " + ", ".join(regressed)) if regressed else "ok",
+        ])
+
+    print(f"\n{'='*70}")
+    print(f"  RUN DIFF (Wilcoxon signed-rank, α={alpha})")
+    print(f"{'='*70}")
+    if tabulate:
+        print(tabulate(rows, headers=headers, tablefmt="grid"))
+    else:
+        for row in rows:
+            print("  ".join(str(c) for c in row))
+
+
+def print_worst(worst_examples, limit):
+    print(f"\n{'='*70}")
+    print("  WORST GLEU REGRESSIONS")
+    print(f"{'='*70}")
+    for (mode, variant), items in sorted(worst_examples.items(), key=lambda kv: (kv[0][0] or "", kv[0][1])):
+        items = [it for it in items if it[0] < 0][:limit]
+        if not items:
+            continue
+        print(f"\n  {variant} ({mode}):")
+        for delta, sid, source, out_a, out_b in items:
+            print(f"\n    [{sid}] ΔGLEU {delta:+.3f}")
+            print(f"    Source: {source}")
+            print(f"    A:      {out_a}")
+            print(f"    B:      {out_b}")
+
+
+# ─── Main ─────────────────────────────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description="Diff two ProseKit evaluation runs")
+    parser.add_argument("baseline", help="Baseline results file (A)")
+    parser.add_argument("candidate", help="Candidate results file (B)")
+    parser.add_argument("--variant", type=str, default=None,
+                        help="Only compare this variant (as named in the baseline)")
+    parser.add_argument("--as", dest="as_variant", type=str, default=None,
+                        help="Candidate variant name to compare --variant against")
+    parser.add_argument("--worst", type=int, default=5,
+                        help="Worst examples to list per variant (default: 5)")
+    parser.add_argument("--alpha", type=float, default=0.05,
+                        help="Significance level (default: 0.05)")
+    parser.add_argument("--fail-on-regression", action="store_true",
+                        help="Exit with status 1 if any variant significantly regressed")
+    args = parser.parse_args()
+
+    if args.as_variant and not args.variant:
+        print("ERROR: --as requires --variant")
+        sys.exit(1)
+
+    variants_a = {args.variant} if args.variant else None
+    variant_b = args.as_variant or args.variant
+    rename = {args.variant: args.as_variant} if args.as_variant else None
+
+    summary, worst_examples = diff_runs(
+        args.baseline, args.candidate, variants_a, variant_b, rename, args.worst
+    )
+    if not summary:
+        print("No overlapping (mode, variant, sample) rows between the two runs.")
+        sys.exit(1)
+
+    print_summary(summary, args.alpha)
+    print_worst(worst_examples, args.worst)
+
+    regressed = any(
+        s["p_value"] < args.alpha and s["mean_delta"] * direction < 0
+        for stats in summary.values()
+        for name, direction in METRICS
+        for s in [stats.get(name)] if s
+    )
+    if args.fail_on_regression and regressed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+dynamic_fewshot.py — Few-shot examples picked per input by n-gram similarity, vs the static few-shot prompts.
+
+The few-shot variants (v3_few_shot, concise_v5_few_shot, casual_v5_few_shot,
+prof_v5_few_shot) send every example with every request, whatever the
+input. This builds a TF-IDF index over word unigrams and bigrams of a pool
+of example pairs per mode — the static prompt's own examples plus the
+builtin (Grammar) or style samples with their first reference — and puts
+only the --k nearest examples to each input into the prompt. The
+instructions before and after the "Examples:" block are kept as they are.
+
+Each sample is left out of its own pool — as a pool sample and as a static
+example (matched by content ID) — so no dynamic prompt contains the sample
+being scored. An input that shares no n-gram with the pool gets the static
+prompt's first --k examples.
+
+Per mode the static and dynamic prompts each run over the samples (in
+their own pass, as the app would send them), streamed for TTFT. The report
+compares prompt tokens, TTFT, latency and quality — GLEU for Grammar, the
+composite score for the style modes. A static system prompt is the same
+for every request and can be served from the server's prefix cache; a
+dynamic one only shares the instructions before the examples, so the
+prompt-token saving can show up smaller in TTFT than in the token count.
+
+Usage:
+    python dynamic_fewshot.py --stub --stub-speed 0.05
+    python dynamic_fewshot.py --modes grammar casual --k 1
+    python dynamic_fewshot.py --samples 20 --output dynamic.jsonl
+"""
+
+import argparse
+import math
+import re
+import sys
+from collections import Counter
+
+from sample_registry import sample_id
+from swama_client import DEFAULT_MODEL
+from variant_eval import evaluate, load_samples
+
+STATIC_VARIANTS = {
+    "grammar": "v3_few_shot",
+    "concise": "concise_v5_few_shot",
+    "casual": "casual_v5_few_shot",
+    "professional": "prof_v5_few_shot",
+}
+
+_PROMPT_RE = re.compile(r"^(.*?\n)Examples:\n(.*?)\n\n(Now .*)$", re.DOTALL)
+_EXAMPLE_RE = re.compile(r"^Input: (.*)\nOutput: (.*)$")
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+
+# ─── Prompt Assembly ─────────────────────────────────────────────────────────
+
+def split_few_shot(system_prompt):
+    """
+    Split a few-shot prompt into {"head", "examples": [(input, output), ...],
+    "tail"}. Raises ValueError if it has no "Examples:" block.
+    """
+    match = _PROMPT_RE.match(system_prompt)
+    if not match:
+        raise ValueError("no 'Examples:' block followed by a 'Now ...' instruction")
+    head, block, tail = match.groups()
+    examples = []
+    for chunk in block.split("\n\n"):
+        example = _EXAMPLE_RE.match(chunk.strip())
+        if not example:
+            raise ValueError(f"not an Input/Output example: {chunk.strip()[:60]!r}")
+        examples.append(example.groups())
+    return {"head": head, "examples": examples, "tail": tail}
+
+
+def build_prompt(parts, examples):
+    """Reassemble a split_few_shot() prompt around the given (input, output) examples."""
+    block = "\n\n".join(f"Input: {source}\nOutput: {target}" for source, target in examples)
+    return f"{parts['head']}Examples:\n{block}\n\n{parts['tail']}"
+
+
+# ─── Similarity Index ────────────────────────────────────────────────────────
+
+def _features(text):
+    words = _WORD_RE.findall(text.lower())
+    return Counter(words + [f"{a} {b}" for a, b in zip(words, words[1:])])
+
+
+def _weighted(features, idf):
+    vector = {gram: count * idf[gram] for gram, count in features.items() if gram in idf}
+    norm = math.sqrt(sum(v * v for v in vector.values()))
+    return {gram: v / norm for gram, v in vector.items()} if norm else {}
+
+
+def build_index(pairs):
+    """
+    TF-IDF index over the inputs of pairs ({"input", "output", "sample_id"}).
+    Earlier pairs win ties, so put the static examples first.
+    """
+    docs = [_features(pair["input"]) for pair in pairs]
+    df = Counter(gram for doc in docs for gram in doc)
+    idf = {gram: math.log((1 + len(docs)) / (1 + count)) + 1 for gram, count in df.items()}
+    return {"pairs": pairs, "idf": idf, "vectors": [_weighted(doc, idf) for doc in docs]}
+
+
+def nearest(index, text, k=2, exclude=None):
+    """The k most similar pairs to text as [(similarity, pair), ...], skipping sample_id `exclude`."""
+    query = _weighted(_features(text), index["idf"])
+    scored = []
+    for position, (pair, vector) in enumerate(zip(index["pairs"], index["vectors"])):
+        if exclude and pair.get("sample_id") == exclude:
+            continue
+        similarity = sum(weight * vector.get(gram, 0.0) for gram, weight in query.items())
+        scored.append((-similarity, position))
+    scored.sort()
+    return [(-negative, index["pairs"][position]) for negative, position in scored[:k]]
+
+
+def example_pool(mode, static_examples, samples):
+    """
+    The static prompt's examples, then each sample with its first reference.
+    Every entry carries the content ID of its input, so a static example
+    that is also an eval sample is left out of that sample's prompt too.
+    """
+    pool = [{"input": source, "output": target, "sample_id": sample_id(source), "static": True}
+            for source, target in static_examples]
+    for sample in samples:
+        pool.append({"input": sample["source"], "output": sample["references"][0],
+                     "sample_id": sample_id(sample["source"]), "static": False})
+    return pool
+
+
+# ─── Evaluation ──────────────────────────────────────────────────────────────
+
+def run_mode(mode, static, samples, base_url, model=DEFAULT_MODEL, k=2, writer=None, pool_samples=None):
+    """
+    Static and dynamic few-shot over one mode's samples, with examples drawn
+    from pool_samples (default: the samples). Returns (static, dynamic) results.
+    """
+    parts = split_few_shot(static["system_prompt"])
+    index = build_index(example_pool(mode, parts["examples"], pool_samples or samples))
+    dynamic_name = f"{static['name']}_dynamic_k{k}"
+
+    def static_prompt(i, sample):
+        return static["system_prompt"], {}
+
+    def dynamic_prompt(i, sample):
+        picked = nearest(index, sample["source"], k, exclude=sample_id(sample["source"]))
+        examples = [(pair["input"], pair["output"]) for _, pair in picked]
+        return build_prompt(parts, examples), {
+            "examples": ["static" if pair["static"] else pair["sample_id"] for _, pair in picked],
+            "example_similarity": [round(similarity, 4) for similarity, _ in picked],
+        }
+
+    results = []
+    for name, prompt_for in ((static["name"], static_prompt), (dynamic_name, dynamic_prompt)):
+        on_result = None
+        if writer:
+            on_result = lambda d, name=name: writer.write_detail(name, mode, d)
+        result = evaluate(mode, name, static["temperature"], samples, prompt_for, base_url, model, on_result)
+        if writer:
+            writer.write_metrics(result["metrics"], mode)
+        results.append(result)
+    return tuple(results)
+
+
+# ─── Reporting ───────────────────────────────────────────────────────────────
+
+def _quality(mode, metrics):
+    return metrics["avg_gleu"] if mode == "grammar" else metrics.get("composite")
+
+
+def print_report(comparisons, k):
+    try:
+        from tabulate import tabulate
+    except ImportError:
+        tabulate = None
+
+    def fmt(value, spec, suffix=""):
+        return f"{value:{spec}}{suffix}" if value is not None else "—"
+
+    headers = ["Mode", "Variant", "Prompt tok", "Avg TTFT", "P95 TTFT", "Avg lat", "GLEU",
+               "Quality", "Δ quality", "Errors"]
+    table = []
+    for mode, static, dynamic in comparisons:
+        base = _quality(mode, static["metrics"])
+        for result in (static, dynamic):
+            m = result["metrics"]
+            quality = _quality(mode, m)
+            delta = quality - base if result is dynamic and quality is not None and base is not None else None
+            table.append([
+                mode, m["variant"], fmt(m["avg_prompt_tokens"], ".0f"), fmt(m["avg_ttft"], ".3f", "s"),
+                fmt(m["p95_ttft"], ".3f", "s"), fmt(m["avg_latency"], ".2f", "s"),
+                fmt(m["avg_gleu"], ".4f"), fmt(quality, ".4f"), fmt(delta, "+.4f"), m["errors"],
+            ])
+
+    print(f"\n{'='*70}")
+    print(f"  STATIC VS DYNAMIC FEW-SHOT (k={k})")
+    print(f"{'='*70}")
+    if tabulate:
+        print(tabulate(table, headers=headers, tablefmt="grid"))
+    else:
+        for row in [headers] + table:
+            print("  ".join(str(c) for c in row))
+    print("\n  Quality: GLEU for grammar, composite score for the style modes.")
+
+
+# ─── Main ─────────────────────────────────────────────────────────────────────
+
+def load_mode(mode):
+    """
+    (static variant, samples) for a mode. The static variant is looked up
+    among all of the prompt module's variants, retired ones (v3_few_shot)
+    included.
+    """
+    if mode == "grammar":
+        import prompts as module
+    else:
+        import style_prompts as module
+    static = next(v for v in vars(module).values()
+                  if isinstance(v, dict) and v.get("name") == STATIC_VARIANTS[mode])
+    return static, load_samples(mode)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dynamic few-shot example selection vs static few-shot prompts")
+    parser.add_argument("--url", type=str, default="http://localhost:8080", help="Swama server URL")
+    parser.add_argument("--model", type=str, default=DEFAULT_MODEL, help="Model ID to request")
+    parser.add_argument("--modes", nargs="+", choices=list(STATIC_VARIANTS), default=list(STATIC_VARIANTS),
+                        help="Modes to compare (default: all)")
+    parser.add_argument("--k", type=int, default=2, help="Examples per dynamic prompt (default: 2)")
+    parser.add_argument("--samples", type=int, default=None, help="Samples per mode (default: all)")
+    parser.add_argument("--output", type=str, default=None, help="Stream results to this .jsonl file")
+    parser.add_argument("--stub", action="store_true", help="Start an in-process Swama stub on --url's port")
+    parser.add_argument("--stub-speed", type=float, default=1.0, help="Stub delay multiplier (with --stub)")
+    args = parser.parse_args()
+
+    if args.k < 1:
+        print("ERROR: --k must be at least 1")
+        sys.exit(1)
+    if args.output and not args.output.endswith(".jsonl"):
+        print("ERROR: --output must be a .jsonl file")
+        sys.exit(1)
+
+    stub = None
+    if args.stub:
+        from urllib.parse import urlparse
+        import swama_stub
+        port = urlparse(args.url).port or 8080
+        stub = swama_stub.serve(port, speed=args.stub_speed)
+        print(f"Started Swama stub on port {port} (speed ×{args.stub_speed})")
+
+    loaded = {mode: load_mode(mode) for mode in args.modes}
+    writer = None
+    if args.output:
+        from results_io import ResultsWriter
+        writer = ResultsWriter(args.output, "dynamic_fewshot", model=args.model, server_url=args.url, k=args.k)
+
+    comparisons = []
+    for mode, (static, pool_samples) in loaded.items():
+        samples = pool_samples[:args.samples] if args.samples else pool_samples
+        if writer:
+            writer.write_samples(samples)
+        static_result, dynamic_result = run_mode(mode, static, samples, args.url, args.model, args.k,
+                                                 writer, pool_samples)
+        comparisons.append((mode, static_result, dynamic_result))
+
+    if writer:
+        writer.close()
+        print(f"\nResults streamed to: {args.output}")
+
+    print_report(comparisons, args.k)
+
+    if stub:
+        stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
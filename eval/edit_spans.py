@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+edit_spans.py — Grammar fixes as a list of edits instead of a full rewrite.
+
+In Grammar mode the model re-emits the whole text even when it fixes one
+word, so decode time grows with the input, not with the number of errors.
+The variants in GRAMMAR_EDIT_VARIANTS (prompts.py) ask for the fixes only,
+one per line:
+
+    has droped => has dropped
+    they're CEO leaved => their CEO left
+
+parse_edits() reads that format ("NONE" = no fixes) and apply_edits()
+applies it to the source: each span must occur in the source verbatim, on
+token boundaries and exactly once after the end of the previous edit
+(edits are in order and don't overlap).
+If the response can't be parsed or a span doesn't match, the sample falls
+back to a full rewrite with a regular grammar variant (--fallback), and the
+fallback's time and tokens are added to the sample's.
+
+The evaluation runs the edit variants and full-rewrite baselines on the same
+samples (JFLEG by default, or --builtin) and compares GLEU, exact match,
+decode tokens per sample, latency and the edit variants' fallback rate.
+
+Usage:
+    python edit_spans.py --samples 100
+    python edit_spans.py --builtin --baseline v8_minimal_diff
+    python edit_spans.py --samples 50 --fallback v2_strict_minimal --output edits.jsonl
+"""
+
+import argparse
+import re
+import sys
+
+from eval_prompts import (
+    MODEL,
+    aggregate_grammar_metrics,
+    call_swama,
+    call_swama_full,
+    clean_response,
+    evaluate_variant,
+    load_jfleg,
+    score_grammar_output,
+)
+from sample_registry import sample_id
+from swama_client import usage_fields
+
+ARROWS = ("=>", "→")
+_BULLET_RE = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+")
+_QUOTES = ('"', "'", "`")
+
+
+# ─── Parsing and Applying ────────────────────────────────────────────────────
+
+def _unquote(text):
+    text = text.strip()
+    if len(text) >= 2 and text[0] == text[-1] and text[0] in _QUOTES:
+        text = text[1:-1]
+    return text
+
+
+def parse_edits(text):
+    """
+    Parse "original => corrected" lines into [(original, corrected), ...].
+
+    "NONE" means no edits. Raises ValueError on any line that isn't an edit.
+    """
+    text = text.strip()
+    if text.rstrip(".").upper() == "NONE":
+        return []
+    if not text:
+        raise ValueError("empty response")
+
+    edits = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        line = _BULLET_RE.sub("", line, count=1)
+        for arrow in ARROWS:
+            if arrow in line:
+                old, _, new = line.partition(arrow)
+                break
+        else:
+            raise ValueError(f"not an edit: {line.strip()[:60]!r}")
+        old, new = _unquote(old), _unquote(new)
+        if not old:
+            raise ValueError(f"empty span: {line.strip()[:60]!r}")
+        if old != new:
+            edits.append((old, new))
+    return edits
+
+
+def _span_re(old):
+    """A span matched on token boundaries: "a" never matches inside "saw"."""
+    lead = r"(?<!\w)" if re.match(r"\w", old) else ""
+    trail = r"(?!\w)" if re.search(r"\w$", old) else ""
+    return re.compile(lead + re.escape(old) + trail)
+
+
+def apply_edits(source, edits):
+    """
+    Apply edits in order. Each span must appear in the source, on token
+    boundaries, exactly once after the previous edit's span; raises
+    ValueError otherwise (an ambiguous span could fix the wrong place).
+    """
+    parts = []
+    cursor = 0
+    for old, new in edits:
+        pattern = _span_re(old)
+        matches = list(pattern.finditer(source, cursor))
+        if not matches:
+            if pattern.search(source):
+                raise ValueError(f"edit out of order or overlapping: {old[:40]!r}")
+            raise ValueError(f"span not in text: {old[:40]!r}")
+        if len(matches) > 1:
+            raise ValueError(f"ambiguous span ({len(matches)} matches): {old[:40]!r}")
+        index = matches[0].start()
+        parts.append(source[cursor:index])
+        parts.append(new)
+        cursor = index + len(old)
+    parts.append(source[cursor:])
+    return "".join(parts)
+
+
+# ─── Rewriting ───────────────────────────────────────────────────────────────
+
+def _add_usage(total, response):
+    for key in ("prompt_tokens", "completion_tokens"):
+        if response.get(key) is not None:
+            total[key] = (total.get(key) or 0) + response[key]
+
+
+def rewrite_with_edits(source, variant, fallback, base_url, trace=None):
+    """
+    Ask for edits and apply them; on a parse/match failure, rewrite with the
+    fallback variant. Returns {"output", "edits", "fallback", "parse_error",
+    "latency", **usage} with latency and token counts summed over both calls.
+    """
+    response = call_swama_full(source, variant["system_prompt"], variant["temperature"],
+                               base_url, trace=trace)
+    usage = usage_fields(response)
+    latency = response["latency"]
+    try:
+        edits = parse_edits(clean_response(response["text"]))
+        return {"output": apply_edits(source, edits), "edits": len(edits), "fallback": False,
+                "latency": latency, **usage}
+    except ValueError as e:
+        parse_error = str(e)
+
+    response = call_swama_full(source, fallback["system_prompt"], fallback["temperature"],
+                               base_url, trace=trace)
+    _add_usage(usage, response)
+    usage.pop("ttft", None)
+    return {"output": clean_response(response["text"]), "edits": None, "fallback": True,
+            "parse_error": parse_error, "latency": latency + response["latency"], **usage}
+
+
+# ─── Evaluation ──────────────────────────────────────────────────────────────
+
+def evaluate_edit_variant(variant, samples, fallback, base_url, on_result=None):
+    """Like eval_prompts.evaluate_variant(), for an edit-format variant."""
+    name = variant["name"]
+    print(f"\n{'='*60}")
+    print(f"  Evaluating: {name} (edits, fallback {fallback['name']})")
+    print(f"  Samples: {len(samples)}")
+    print(f"{'='*60}")
+
+    details = []
+    for i, sample in enumerate(samples):
+        source = sample["source"]
+        sid = sample.get("id") or sample_id(source)
+        if (i + 1) % 10 == 0 or i == 0:
+            print(f"  [{i+1}/{len(samples)}] Processing...")
+        try:
+            result = rewrite_with_edits(source, variant, fallback, base_url,
+                                        trace={"variant": name, "sample": sid})
+        except Exception as e:
+            print(f"  ERROR on sample {i}: {e}")
+            detail = {"index": i, "sample_id": sid, "output": None, "error": str(e)}
+        else:
+            output = result.pop("output")
+            detail = {
+                "index": i,
+                "sample_id": sid,
+                "output": output,
+                **score_grammar_output(source, output, sample["references"]),
+                **result,
+            }
+        details.append(detail)
+        if on_result:
+            on_result(detail)
+
+    metrics = edit_metrics(name, variant["temperature"], details)
+    print(f"\n  Results for {name}:")
+    print(f"  ├── GLEU (avg):         {metrics['avg_gleu']:.4f}")
+    print(f"  ├── Exact match:        {metrics['exact_match_rate']:.1%}")
+    if metrics["avg_completion_tokens"] is not None:
+        print(f"  ├── Decode tokens:      {metrics['avg_completion_tokens']:.1f}")
+    print(f"  ├── Avg latency:        {metrics['avg_latency']:.2f}s")
+    print(f"  ├── Fallback rate:      {metrics['fallback_rate']:.1%}")
+    print(f"  └── Errors:             {metrics['errors']}")
+    return {"metrics": metrics, "details": details}
+
+
+def _avg_completion_tokens(details):
+    tokens = [d["completion_tokens"] for d in details
+              if not d.get("error") and d.get("completion_tokens") is not None]
+    return sum(tokens) / len(tokens) if tokens else None
+
+
+def edit_metrics(name, temperature, details):
+    """aggregate_grammar_metrics() plus decode tokens and the fallback rate."""
+    metrics = aggregate_grammar_metrics(name, temperature, details)
+    scored = [d for d in details if not d.get("error")]
+    metrics["format"] = "edits"
+    metrics["avg_completion_tokens"] = _avg_completion_tokens(details)
+    metrics["fallback_rate"] = sum(1 for d in scored if d["fallback"]) / max(len(scored), 1)
+    return metrics
+
+
+def print_comparison(all_results):
+    try:
+        from tabulate import tabulate
+    except ImportError:
+        tabulate = None
+
+    headers = ["Variant", "Format", "GLEU↑", "Exact%↑", "Decode tok↓", "Avg lat", "P95 lat", "Fallback%"]
+    rows = []
+    for result in sorted(all_results, key=lambda r: r["metrics"]["avg_gleu"], reverse=True):
+        m = result["metrics"]
+        tokens = m.get("avg_completion_tokens", _avg_completion_tokens(result["details"]))
+        rows.append([
+            m["variant"], m.get("format", "rewrite"), f"{m['avg_gleu']:.4f}",
+            f"{m['exact_match_rate']:.1%}", f"{tokens:.1f}" if tokens is not None else "—",
+            f"{m['avg_latency']:.2f}s", f"{m['p95_latency']:.2f}s",
+            f"{m['fallback_rate']:.1%}" if "fallback_rate" in m else "—",
+        ])
+
+    print(f"\n{'='*70}")
+    print("  EDIT SPANS VS FULL REWRITE")
+    print(f"{'='*70}")
+    if tabulate:
+        print(tabulate(rows, headers=headers, tablefmt="grid"))
+    else:
+        for row in [headers] + rows:
+            print("  ".join(str(c) for c in row))
+
+
+# ─── Main ─────────────────────────────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description="Edit-span Grammar output vs full rewrite")
+    parser.add_argument("--samples", type=int, default=50, help="Number of samples (default: 50)")
+    parser.add_argument("--builtin", action="store_true", help="Use built-in samples instead of JFLEG")
+    parser.add_argument("--url", type=str, default="http://localhost:8080", help="Swama API base URL")
+    parser.add_argument("--variant", type=str, default=None, help="Only this edit variant")
+    parser.add_argument("--baseline", type=str, action="append", default=None,
+                        help="Full-rewrite variant to compare against (repeatable; default: all)")
+    parser.add_argument("--no-baselines", action="store_true", help="Only run the edit variants")
+    parser.add_argument("--fallback", type=str, default=None,
+                        help="Full-rewrite variant used when edits can't be applied (default: the lead variant)")
+    parser.add_argument("--output", type=str, default=None, help="Stream results to this .jsonl file")
+    args = parser.parse_args()
+
+    from prompts import GRAMMAR_EDIT_VARIANTS, GRAMMAR_VARIANTS
+
+    by_name = {v["name"]: v for v in GRAMMAR_VARIANTS}
+    edit_variants = [v for v in GRAMMAR_EDIT_VARIANTS if args.variant in (None, v["name"])]
+    unknown = [n for n in (args.baseline or []) + [args.fallback] if n and n not in by_name]
+    if not edit_variants:
+        unknown.insert(0, args.variant)
+    if unknown:
+        print(f"ERROR: Unknown variant '{unknown[0]}'")
+        print(f"Edit variants: {', '.join(v['name'] for v in GRAMMAR_EDIT_VARIANTS)}")
+        print(f"Full-rewrite variants: {', '.join(by_name)}")
+        sys.exit(1)
+    fallback = by_name[args.fallback] if args.fallback else GRAMMAR_VARIANTS[0]
+    if args.no_baselines:
+        baselines = []
+    else:
+        baselines = [by_name[n] for n in args.baseline] if args.baseline else GRAMMAR_VARIANTS
+
+    print("Testing Swama connection...")
+    try:
+        _, latency = call_swama("Hello world", "Respond with exactly: Hello world", 0.0, args.url)
+        print(f"  ✓ Swama responding ({latency:.2f}s)")
+    except ConnectionError as e:
+        print(f"  ✗ {e}")
+        sys.exit(1)
+
+    if args.builtin:
+        from builtin_samples import BUILTIN_SAMPLES
+        samples = BUILTIN_SAMPLES[:args.samples] if args.samples else BUILTIN_SAMPLES
+        print(f"Using {len(samples)} built-in test samples")
+    else:
+        samples = load_jfleg(split="test", max_samples=args.samples)
+
+    writer = None
+    if args.output:
+        from results_io import ResultsWriter
+        writer = ResultsWriter(args.output, "edit_spans", num_samples=len(samples),
+                               model=MODEL, server_url=args.url, fallback=fallback["name"])
+        writer.write_samples(samples)
+
+    all_results = []
+    for variant in edit_variants + list(baselines):
+        on_result = None
+        if writer:
+            on_result = lambda d, name=variant["name"]: writer.write_detail(name, "grammar", d)
+        if variant.get("format") == "edits":
+            result = evaluate_edit_variant(variant, samples, fallback, args.url, on_result=on_result)
+        else:
+            result = evaluate_variant(variant, samples, args.url, on_result=on_result)
+        if writer:
+            writer.write_metrics(result["metrics"], "grammar")
+        all_results.append(result)
+
+    if writer:
+        writer.close()
+        print(f"\nResults streamed to: {args.output}")
+
+    print_comparison(all_results)
+
+
+if __name__ == "__main__":
+    main()
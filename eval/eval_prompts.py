@@ -28,6 +28,24 @@ Usage:
     # Save detailed results to JSON:
     python eval_prompts.py --output results.json
 
+    # Stream results as JSONL (one record per sample) plus a SQLite copy:
+    python eval_prompts.py --output results.jsonl --columnar results.db
+
+    # Record the run in the run-history database:
+    python eval_prompts.py --store runs.db
+
+    # Time per stage (HTTP, cleaning, scoring, printing) plus cProfile:
+    python eval_prompts.py --builtin --profile
+
+    # Request timeline (start, TTFT, end) as a Chrome trace for Perfetto:
+    python eval_prompts.py --builtin --trace run.trace.json
+
+    # Live Prometheus metrics for long soak runs:
+    python eval_prompts.py --samples 1000 --metrics-port 9109
+
+    # Memory held/peak per stage and top allocation sites (tracemalloc):
+    python eval_prompts.py --samples 1000 --memprofile
+
 Metrics:
     - GLEU: Standard GEC metric (geometric mean of n-gram precisions, averaged
             across source→output and reference→output directions)
@@ -47,6 +65,12 @@ from pathlib import Path
 
 import requests
 
+from precheck import needs_change
+from profiling import span
+from sample_registry import sample_id
+from swama_client import DEFAULT_LAYOUT, MESSAGE_LAYOUTS, complete, think_metrics, truncation_metrics, usage_fields
+from token_policy import FIXED_MAX_TOKENS, TOKEN_POLICIES, generation_limits
+
 # ─── GLEU Implementation ─────────────────────────────────────────────────────
 # GLEU (Ground-truth-based BLEU) is the standard metric for GEC evaluation.
 # It modifies BLEU to penalize both under-correction and over-correction.
@@ -205,40 +229,40 @@ def compute_overcorrection(source, output, references):
 
 # ─── Swama API Client ────────────────────────────────────────────────────────
 
-def call_swama(prompt, system_prompt, temperature=0.3, base_url="http://localhost:8080"):
-    """
-    Call Swama's OpenAI-compatible API.
+MODEL = "mlx-community/Qwen3-8B-4bit"
 
-    Returns (response_text, latency_seconds) or raises on error.
+def call_swama_full(prompt, system_prompt, temperature=0.3, base_url="http://localhost:8080", trace=None,
+                    think_budget=None, think_retries=1, layout=DEFAULT_LAYOUT,
+                    max_tokens=FIXED_MAX_TOKENS, stop=None):
     """
-    url = f"{base_url}/v1/chat/completions"
-
-    payload = {
-        "model": "mlx-community/Qwen3-8B-4bit",
-        "messages": [
-            {"role": "user", "content": f"{system_prompt}\n\n{prompt}"}
-        ],
-        "temperature": temperature,
-        "max_tokens": 512,
-    }
+    Call Swama's OpenAI-compatible API.
 
-    start = time.time()
+    trace: extra fields (variant, sample) for the request's trace event
+    when --trace is on.
 
+    Returns swama_client's result dict (text, latency, ttft, token counts,
+    finish_reason) or raises on error.
+    """
     try:
-        resp = requests.post(url, json=payload, timeout=60)
-        resp.raise_for_status()
+        return complete(prompt, system_prompt, temperature, base_url,
+                        model=MODEL, trace=trace,
+                        think_budget=think_budget, think_retries=think_retries,
+                        layout=layout, max_tokens=max_tokens, stop=stop)
     except requests.ConnectionError:
         raise ConnectionError(
             "Cannot connect to Swama at localhost:8080.\n"
             "Make sure Swama is running: swama run mlx-community/Qwen3-8B-4bit"
         )
 
-    elapsed = time.time() - start
 
-    data = resp.json()
-    text = data["choices"][0]["message"]["content"].strip()
+def call_swama(prompt, system_prompt, temperature=0.3, base_url="http://localhost:8080", trace=None):
+    """
+    Call Swama's OpenAI-compatible API.
 
-    return text, elapsed
+    Returns (response_text, latency_seconds) or raises on error.
+    """
+    result = call_swama_full(prompt, system_prompt, temperature, base_url, trace)
+    return result["text"], result["latency"]
 
 
 def clean_response(text):
@@ -247,8 +271,8 @@ def clean_response(text):
 
     text = text.strip()
 
-    # Strip <think>...</think> blocks
-    text = re.sub(r'<think>.*?</think>', '', text, flags=re.DOTALL).strip()
+    # Strip <think>...</think> blocks, and a <think> cut off by max_tokens
+    text = re.sub(r'<think>.*?(?:</think>|$)', '', text, flags=re.DOTALL).strip()
 
     # Strip wrapping quotes
     if (text.startswith('"') and text.endswith('"')) or \
@@ -298,12 +322,94 @@ def load_jfleg(split="test", max_samples=None):
     return samples
 
 
+# ─── Scoring ──────────────────────────────────────────────────────────────────
+# Kept separate from the evaluation loop so saved outputs can be re-scored
+# offline (see rescore.py) without contacting the server.
+
+def score_grammar_output(source, output, references):
+    """Per-sample grammar metrics for one cleaned model output."""
+    with span("compute_gleu"):
+        gleu = compute_gleu(source, output, references)
+
+    # Exact match (matches any reference)
+    with span("exact_match"):
+        output_normalized = output.strip().lower()
+        is_exact = any(
+            ref.strip().lower() == output_normalized
+            for ref in references
+        )
+
+    with span("compute_overcorrection"):
+        overcorr = compute_overcorrection(source, output, references)
+
+    return {
+        "gleu": gleu,
+        "exact_match": is_exact,
+        # Did the model change anything?
+        "changed": output.strip() != source.strip(),
+        "overcorrection": overcorr,
+    }
+
+
+def aggregate_grammar_metrics(name, temperature, details):
+    """Aggregate per-sample detail dicts (errored samples included) into variant metrics."""
+    scored = [d for d in details if not d.get("error")]
+    errors = len(details) - len(scored)
+    n_evaluated = len(scored)
+
+    gleu_scores = [d["gleu"] for d in scored]
+    overcorrection_scores = [d["overcorrection"] for d in scored]
+    latencies = [d["latency"] for d in scored if d.get("latency") is not None]
+    exact_matches = sum(1 for d in scored if d["exact_match"])
+    changes_made = sum(1 for d in scored if d["changed"])
+
+    metrics = {
+        "variant": name,
+        "temperature": temperature,
+        "total_samples": len(details),
+        "errors": errors,
+        "avg_gleu": sum(gleu_scores) / max(len(gleu_scores), 1),
+        "median_gleu": sorted(gleu_scores)[len(gleu_scores)//2] if gleu_scores else 0,
+        "exact_match_rate": exact_matches / max(n_evaluated, 1),
+        "change_rate": changes_made / max(n_evaluated, 1),
+        "avg_overcorrection": sum(overcorrection_scores) / max(len(overcorrection_scores), 1),
+        "avg_latency": sum(latencies) / max(len(latencies), 1),
+        "p95_latency": sorted(latencies)[int(len(latencies) * 0.95)] if latencies else 0,
+    }
+    skipped = [d for d in scored if d.get("skipped")]
+    if skipped:
+        metrics["skip_rate"] = len(skipped) / max(n_evaluated, 1)
+        # Same definition as precheck.py's report; runs saved before skips recorded it fall back to exact_match
+        false_skips = sum(1 for d in skipped if d.get("needs_change", not d["exact_match"]))
+        metrics["false_skip_rate"] = false_skips / len(skipped)
+    metrics.update(think_metrics(details))
+    metrics.update(truncation_metrics(details))
+    return metrics
+
+
 # ─── Evaluation Loop ──────────────────────────────────────────────────────────
 
-def evaluate_variant(variant, samples, base_url="http://localhost:8080"):
+def evaluate_variant(variant, samples, base_url="http://localhost:8080", on_result=None,
+                     think_budget=None, think_retries=1, precheck=None, layout=DEFAULT_LAYOUT,
+                     token_policy="fixed"):
     """
     Run a prompt variant against all samples and collect metrics.
 
+    If given, on_result(detail) is called with each per-sample detail dict as
+    soon as it is computed (used to stream results to disk).
+
+    think_budget/think_retries are passed to swama_client.complete(): abort and
+    re-issue generations still inside <think> after that many tokens. layout
+    is the message layout (see swama_client.build_messages()). token_policy
+    sets max_tokens and stop sequences (see token_policy.py); under
+    "adaptive", each detail records its max_tokens.
+
+    precheck (see precheck.py), if given, is called with each source first;
+    samples it predicts clean skip the model and are returned unchanged.
+
+    Details refer to their sample by index and sample_id; the source and
+    references stay in `samples`, shared by every variant.
+
     Returns dict with aggregate metrics and per-sample details.
     """
     name = variant["name"]
@@ -317,99 +423,96 @@ def evaluate_variant(variant, samples, base_url="http://localhost:8080"):
     print(f"{'='*60}")
 
     results = []
-    gleu_scores = []
-    exact_matches = 0
-    changes_made = 0
-    overcorrection_scores = []
-    latencies = []
-    errors = 0
 
     for i, sample in enumerate(samples):
         source = sample["source"]
         references = sample["references"]
+        sid = sample.get("id") or sample_id(source)
 
         # Progress indicator
         if (i + 1) % 10 == 0 or i == 0:
-            print(f"  [{i+1}/{len(samples)}] Processing...")
+            with span("print"):
+                print(f"  [{i+1}/{len(samples)}] Processing...")
+
+        if precheck:
+            start = time.perf_counter()
+            with span("precheck"):
+                clean, _ = precheck(source)
+            if clean:
+                results.append({
+                    "index": i,
+                    "sample_id": sid,
+                    "output": source,
+                    **score_grammar_output(source, source, references),
+                    "latency": time.perf_counter() - start,
+                    "skipped": True,
+                    "needs_change": needs_change(sample),
+                })
+                if on_result:
+                    on_result(results[-1])
+                continue
 
+        limits = generation_limits("grammar", source, token_policy)
         try:
-            raw_output, latency = call_swama(
-                source, system_prompt, temperature, base_url
-            )
-            output = clean_response(raw_output)
-            latencies.append(latency)
+            with span("http"):
+                response = call_swama_full(
+                    source, system_prompt, temperature, base_url,
+                    trace={"variant": name, "sample": sid},
+                    think_budget=think_budget, think_retries=think_retries,
+                    layout=layout, **limits,
+                )
+            raw_output, latency = response["text"], response["latency"]
+            with span("clean_response"):
+                output = clean_response(raw_output)
         except Exception as e:
             print(f"  ERROR on sample {i}: {e}")
-            errors += 1
             results.append({
                 "index": i,
-                "source": source,
+                "sample_id": sid,
                 "output": None,
-                "references": references,
                 "error": str(e),
             })
+            if on_result:
+                on_result(results[-1])
             continue
 
-        # Compute metrics
-        gleu = compute_gleu(source, output, references)
-        gleu_scores.append(gleu)
-
-        # Exact match (matches any reference)
-        output_normalized = output.strip().lower()
-        is_exact = any(
-            ref.strip().lower() == output_normalized
-            for ref in references
-        )
-        if is_exact:
-            exact_matches += 1
-
-        # Did the model change anything?
-        if output.strip() != source.strip():
-            changes_made += 1
-
-        # Overcorrection
-        overcorr = compute_overcorrection(source, output, references)
-        overcorrection_scores.append(overcorr)
-
         results.append({
             "index": i,
-            "source": source,
+            "sample_id": sid,
             "output": output,
-            "references": references,
-            "gleu": gleu,
-            "exact_match": is_exact,
-            "changed": output.strip() != source.strip(),
-            "overcorrection": overcorr,
+            **score_grammar_output(source, output, references),
             "latency": latency,
+            **usage_fields(response),
         })
+        if token_policy != "fixed":
+            results[-1]["max_tokens"] = limits["max_tokens"]
+        if on_result:
+            with span("write_results"):
+                on_result(results[-1])
 
-    # Aggregate metrics
-    n_evaluated = len(samples) - errors
-
-    metrics = {
-        "variant": name,
-        "temperature": temperature,
-        "total_samples": len(samples),
-        "errors": errors,
-        "avg_gleu": sum(gleu_scores) / max(len(gleu_scores), 1),
-        "median_gleu": sorted(gleu_scores)[len(gleu_scores)//2] if gleu_scores else 0,
-        "exact_match_rate": exact_matches / max(n_evaluated, 1),
-        "change_rate": changes_made / max(n_evaluated, 1),
-        "avg_overcorrection": sum(overcorrection_scores) / max(len(overcorrection_scores), 1),
-        "avg_latency": sum(latencies) / max(len(latencies), 1),
-        "p95_latency": sorted(latencies)[int(len(latencies) * 0.95)] if latencies else 0,
-    }
+    with span("aggregate"):
+        metrics = aggregate_grammar_metrics(name, temperature, results)
 
     # Print summary
-    print(f"\n  Results for {name}:")
-    print(f"  ├── GLEU (avg):         {metrics['avg_gleu']:.4f}")
-    print(f"  ├── GLEU (median):      {metrics['median_gleu']:.4f}")
-    print(f"  ├── Exact match:        {metrics['exact_match_rate']:.1%}")
-    print(f"  ├── Change rate:        {metrics['change_rate']:.1%}")
-    print(f"  ├── Overcorrection:     {metrics['avg_overcorrection']:.4f}")
-    print(f"  ├── Avg latency:        {metrics['avg_latency']:.2f}s")
-    print(f"  ├── P95 latency:        {metrics['p95_latency']:.2f}s")
-    print(f"  └── Errors:             {metrics['errors']}")
+    with span("print"):
+        print(f"\n  Results for {name}:")
+        print(f"  ├── GLEU (avg):         {metrics['avg_gleu']:.4f}")
+        print(f"  ├── GLEU (median):      {metrics['median_gleu']:.4f}")
+        print(f"  ├── Exact match:        {metrics['exact_match_rate']:.1%}")
+        print(f"  ├── Change rate:        {metrics['change_rate']:.1%}")
+        print(f"  ├── Overcorrection:     {metrics['avg_overcorrection']:.4f}")
+        print(f"  ├── Avg latency:        {metrics['avg_latency']:.2f}s")
+        print(f"  ├── P95 latency:        {metrics['p95_latency']:.2f}s")
+        if "skip_rate" in metrics:
+            print(f"  ├── Pre-check skips:    {metrics['skip_rate']:.1%} "
+                  f"({metrics['false_skip_rate']:.1%} of them needed a change)")
+        if metrics.get("think_leak_rate"):
+            print(f"  ├── Think leaks:        {metrics['think_leak_rate']:.1%} "
+                  f"({metrics['wasted_tokens']} tokens, {metrics['wasted_seconds']:.1f}s wasted)")
+        if metrics.get("truncated"):
+            print(f"  ├── Hit max_tokens:     {metrics['truncated_rate']:.1%} "
+                  f"({metrics['truncated']} outputs cut off; their scores are not a quality signal)")
+        print(f"  └── Errors:             {metrics['errors']}")
 
     return {"metrics": metrics, "details": results}
 
@@ -450,7 +553,7 @@ def print_comparison_table(all_results):
     print(f"  🏆 Best variant: {best[0]} (GLEU: {best[1]})")
 
 
-def print_sample_comparison(all_results, num_samples=5):
+def print_sample_comparison(all_results, samples, num_samples=5):
     """Show side-by-side outputs for a few interesting samples."""
     if not all_results:
         return
@@ -463,11 +566,12 @@ def print_sample_comparison(all_results, num_samples=5):
     first_details = all_results[0]["details"]
 
     shown = 0
-    for i, sample in enumerate(first_details):
+    for i, first in enumerate(first_details):
         if shown >= num_samples:
             break
-        if sample.get("error"):
+        if first.get("error"):
             continue
+        sample = samples[first["index"]]
 
         outputs = []
         for result in all_results:
@@ -509,7 +613,15 @@ def main():
     )
     parser.add_argument(
         "--output", type=str, default=None,
-        help="Save detailed results to JSON file"
+        help="Save detailed results (.jsonl streams one record per sample; .json writes one document)"
+    )
+    parser.add_argument(
+        "--columnar", type=str, default=None,
+        help="Also export results to SQLite (.db) or Parquet (.parquet); requires a .jsonl --output"
+    )
+    parser.add_argument(
+        "--store", type=str, default=None,
+        help="Record this run in a run-history SQLite database (see run_store.py)"
     )
     parser.add_argument(
         "--builtin", action="store_true",
@@ -519,8 +631,61 @@ def main():
         "--show-all", action="store_true",
         help="Print every sample's input/output (verbose)"
     )
+    parser.add_argument(
+        "--trace", type=str, default=None,
+        help="Stream requests and save a Chrome trace (open in Perfetto) to this path"
+    )
+    parser.add_argument(
+        "--metrics-port", type=int, default=None,
+        help="Serve live Prometheus metrics on this port (/metrics)"
+    )
+    parser.add_argument(
+        "--metrics-host", type=str, default="127.0.0.1",
+        help="Interface for --metrics-port (default: 127.0.0.1; 0.0.0.0 to scrape from another machine)"
+    )
+    parser.add_argument(
+        "--metrics-textfile", type=str, default=None,
+        help="Write live Prometheus metrics to this file (node_exporter textfile collector)"
+    )
+    parser.add_argument(
+        "--think-budget", type=int, default=None,
+        help="Abort and re-issue a generation still inside <think> after this many tokens"
+    )
+    parser.add_argument(
+        "--think-retries", type=int, default=1,
+        help="Re-issues allowed per sample after a --think-budget abort (default: 1)"
+    )
+    parser.add_argument(
+        "--layout", choices=MESSAGE_LAYOUTS, default=DEFAULT_LAYOUT,
+        help="Message layout: system prompt in the user message (default, as the app), "
+             "a separate system message, or the text first"
+    )
+    parser.add_argument(
+        "--token-policy", choices=TOKEN_POLICIES, default="fixed",
+        help="max_tokens/stop sequences: fixed 512 (default) or sized by input length (see token_policy.py)"
+    )
+    parser.add_argument(
+        "--precheck", action="store_true",
+        help="Skip the model for samples the local pre-check predicts need no change (see precheck.py)"
+    )
+    parser.add_argument(
+        "--dictionary", type=str, action="append", default=None,
+        help="Word list for --precheck (repeatable; default: /usr/share/dict/words if present)"
+    )
+    parser.add_argument(
+        "--profile", action="store_true",
+        help="Time each stage (HTTP, cleaning, scoring, printing) and run under cProfile"
+    )
+    parser.add_argument(
+        "--memprofile", action="store_true",
+        help="Report memory held/peak per stage and top allocation sites (tracemalloc)"
+    )
     args = parser.parse_args()
 
+    if args.memprofile:
+        import memprofile
+        memprofile.start()
+
     # Import prompt variants
     from prompts import GRAMMAR_VARIANTS
 
@@ -559,22 +724,105 @@ def main():
     else:
         samples = load_jfleg(split="test", max_samples=args.samples)
 
+    if args.memprofile:
+        memprofile.checkpoint("samples loaded")
+
+    # Stream results to JSONL as they are produced
+    writer = None
+    if args.output and args.output.endswith(".jsonl"):
+        from results_io import ResultsWriter
+        writer = ResultsWriter(args.output, "grammar", num_samples=len(samples),
+                               model=MODEL, server_url=args.url, layout=args.layout,
+                               token_policy=args.token_policy)
+        writer.write_samples(samples)
+    elif args.columnar:
+        print("ERROR: --columnar requires a .jsonl --output")
+        sys.exit(1)
+
+    if args.trace:
+        import trace_export
+        trace_export.start("eval_prompts")
+
+    profile_handle = None
+    if args.profile:
+        import profiling
+        profile_handle = profiling.start()
+
+    exporter = None
+    if args.metrics_port or args.metrics_textfile:
+        from metrics_exporter import MetricsExporter
+        exporter = MetricsExporter(port=args.metrics_port, textfile=args.metrics_textfile,
+                                   host=args.metrics_host)
+
+    # Per-sample hooks: stream to JSONL and/or update live metrics
+    hooks = []
+    if writer:
+        hooks.append(lambda d, name: writer.write_detail(name, "grammar", d))
+    if exporter:
+        hooks.append(lambda d, name: exporter.observe(name, "grammar", d))
+
+    precheck = None
+    if args.precheck:
+        from precheck import make_precheck
+        precheck = make_precheck(args.dictionary)
+
     # Run evaluation for each variant
     all_results = []
     for variant in variants:
-        result = evaluate_variant(variant, samples, args.url)
+        on_result = None
+        if hooks:
+            on_result = lambda d, name=variant["name"]: [hook(d, name) for hook in hooks]
+        if exporter:
+            exporter.begin_variant(variant["name"], "grammar", len(samples))
+        result = evaluate_variant(variant, samples, args.url, on_result=on_result,
+                                  think_budget=args.think_budget, think_retries=args.think_retries,
+                                  precheck=precheck, layout=args.layout,
+                                  token_policy=args.token_policy)
+        if writer:
+            writer.write_metrics(result["metrics"], "grammar")
         all_results.append(result)
+        if args.memprofile:
+            memprofile.checkpoint(f"variant {variant['name']}")
+
+    if profile_handle:
+        profiling.finish(profile_handle)
+
+    if exporter:
+        exporter.close()
+
+    if args.trace:
+        trace_export.save(args.trace)
+
+    if writer:
+        writer.close()
+        print(f"\nDetailed results streamed to: {args.output}")
+        if args.columnar:
+            from results_io import export_columnar
+            export_columnar(args.output, args.columnar)
 
     # Print comparison
     if len(all_results) > 1:
         print_comparison_table(all_results)
-        print_sample_comparison(all_results)
+        print_sample_comparison(all_results, samples)
+
+    # Record in run history
+    if args.store:
+        from run_store import record_run
+        record_run(
+            args.store, "grammar", MODEL, args.url,
+            [("grammar", r) for r in all_results],
+            {v["name"]: v["system_prompt"] for v in variants},
+            num_samples=len(samples),
+            samples=samples,
+        )
 
     # Save results
-    if args.output:
+    if args.output and not writer:
+        from results_io import sample_record
         output_data = {
             "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
             "num_samples": len(samples),
+            "samples": [sample_record(s) for s in samples],
             "results": [
                 {
                     "metrics": r["metrics"],
@@ -589,6 +837,9 @@ def main():
 
         print(f"\nDetailed results saved to: {args.output}")
 
+    if args.memprofile:
+        memprofile.checkpoint("results written")
+
     # Print verbose output if requested
     if args.show_all and all_results:
         print(f"\n{'='*70}")
@@ -598,12 +849,16 @@ def main():
             if detail.get("error"):
                 print(f"  [{detail['index']}] ERROR: {detail['error']}")
                 continue
+            sample = samples[detail["index"]]
             print(f"\n  [{detail['index']}]")
-            print(f"  Source: {detail['source']}")
+            print(f"  Source: {sample['source']}")
             print(f"  Output: {detail['output']}")
-            print(f"  Ref[0]: {detail['references'][0]}")
+            print(f"  Ref[0]: {sample['references'][0]}")
             print(f"  GLEU:   {detail['gleu']:.4f}  Changed: {detail['changed']}  Exact: {detail['exact_match']}")
 
+    if args.memprofile:
+        memprofile.finish()
+
     print("\nDone!")
 
 
@@ -16,9 +16,24 @@ Usage:
     # Save results:
     python eval_styles.py --output style_results.json --url http://localhost:28100
 
+    # Stream results as JSONL (one record per sample):
+    python eval_styles.py --output style_results.jsonl --url http://localhost:28100
+
     # Verbose output:
     python eval_styles.py --show-all --url http://localhost:28100
 
+    # Time per stage (HTTP, cleaning, scoring, printing) plus cProfile:
+    python eval_styles.py --profile --url http://localhost:28100
+
+    # Request timeline (start, TTFT, end) as a Chrome trace for Perfetto:
+    python eval_styles.py --trace styles.trace.json --url http://localhost:28100
+
+    # Live Prometheus metrics for long soak runs:
+    python eval_styles.py --metrics-textfile /var/lib/node_exporter/prosekit.prom --url http://localhost:28100
+
+    # Memory held/peak per stage and top allocation sites (tracemalloc):
+    python eval_styles.py --memprofile --url http://localhost:28100
+
 Metrics (per mode):
     Concise:
       - Compression: word count reduction ratio (higher = more trimming)
@@ -48,6 +63,11 @@ from collections import Counter
 
 import requests
 
+from profiling import span
+from sample_registry import sample_id
+from swama_client import DEFAULT_LAYOUT, MESSAGE_LAYOUTS, complete, think_metrics, truncation_metrics, usage_fields
+from token_policy import FIXED_MAX_TOKENS, TOKEN_POLICIES, generation_limits
+
 
 # ─── Shared Metrics ──────────────────────────────────────────────────────────
 
@@ -217,32 +237,29 @@ def formality_score(text):
 
 # ─── Swama API Client ────────────────────────────────────────────────────────
 
-def call_swama(prompt, system_prompt, temperature=0.7, base_url="http://localhost:28100"):
-    url = f"{base_url}/v1/chat/completions"
-    payload = {
-        "model": "mlx-community/Qwen3-8B-4bit",
-        "messages": [
-            {"role": "user", "content": f"{system_prompt}\n\n{prompt}"}
-        ],
-        "temperature": temperature,
-        "max_tokens": 512,
-    }
-    start = time.time()
+MODEL = "mlx-community/Qwen3-8B-4bit"
+
+def call_swama_full(prompt, system_prompt, temperature=0.7, base_url="http://localhost:28100", trace=None,
+                    think_budget=None, think_retries=1, layout=DEFAULT_LAYOUT,
+                    max_tokens=FIXED_MAX_TOKENS, stop=None):
+    """Like call_swama(), but returns swama_client's full result dict."""
     try:
-        resp = requests.post(url, json=payload, timeout=60)
-        resp.raise_for_status()
+        return complete(prompt, system_prompt, temperature, base_url,
+                        model=MODEL, trace=trace,
+                        think_budget=think_budget, think_retries=think_retries,
+                        layout=layout, max_tokens=max_tokens, stop=stop)
     except requests.ConnectionError:
         raise ConnectionError(
             "Cannot connect to Swama. Check it's running on the correct port."
         )
-    elapsed = time.time() - start
-    data = resp.json()
-    text = data["choices"][0]["message"]["content"].strip()
-    return text, elapsed
+
+def call_swama(prompt, system_prompt, temperature=0.7, base_url="http://localhost:28100", trace=None):
+    result = call_swama_full(prompt, system_prompt, temperature, base_url, trace)
+    return result["text"], result["latency"]
 
 def clean_response(text):
     text = text.strip()
-    text = re.sub(r'<think>.*?</think>', '', text, flags=re.DOTALL).strip()
+    text = re.sub(r'<think>.*?(?:</think>|$)', '', text, flags=re.DOTALL).strip()
     if (text.startswith('"') and text.endswith('"')) or \
        (text.startswith("'") and text.endswith("'")):
         text = text[1:-1].strip()
@@ -253,10 +270,129 @@ def clean_response(text):
     return text
 
 
+# ─── Scoring ─────────────────────────────────────────────────────────────────
+# Kept separate from the evaluation loop so saved outputs can be re-scored
+# offline (see rescore.py) without contacting the server.
+
+# Composite score weights per mode. The last component is no-bloat rate for
+# concise and already-styled stability for casual/professional.
+COMPOSITE_WEIGHTS = {
+    "concise": {"gleu": 0.3, "meaning": 0.3, "compression": 0.3, "no_bloat": 0.1},
+    "casual": {"gleu": 0.3, "meaning": 0.3, "informality": 0.3, "stability": 0.1},
+    "professional": {"gleu": 0.3, "meaning": 0.3, "formality": 0.3, "stability": 0.1},
+}
+
+
+def score_style_output(source, output, references, preserve, mode):
+    """Per-sample shared and mode-specific metrics for one cleaned model output."""
+    with span("compute_gleu"):
+        gleu = compute_gleu(source, output, references)
+    with span("meaning_preserved"):
+        meaning = meaning_preserved(output, preserve)
+
+    scores = {
+        "gleu": gleu,
+        "meaning_preserved": meaning,
+    }
+
+    with span(f"{mode}_metrics"):
+        scores.update(_mode_scores(source, output, references, mode))
+    return scores
+
+
+def _mode_scores(source, output, references, mode):
+    """Mode-specific metrics: compression/bloat, or informality/formality plus stability."""
+    scores = {}
+    if mode == "concise":
+        scores["compression_ratio"] = compression_ratio(source, output)
+        scores["bloated"] = is_bloated(source, output)
+
+    elif mode in ("casual", "professional"):
+        if mode == "casual":
+            scores["informality_score"] = informality_score(output)
+        else:
+            scores["formality_score"] = formality_score(output)
+
+        # Stability test: if references match source, output should too
+        if any(ref.strip().lower() == source.strip().lower() for ref in references):
+            scores["stability_test"] = True
+            scores["stability_pass"] = output.strip().lower() == source.strip().lower()
+
+    return scores
+
+
+def _avg(values):
+    return sum(values) / max(len(values), 1)
+
+
+def aggregate_style_metrics(name, mode, temperature, details, weights=None):
+    """
+    Aggregate per-sample detail dicts (errored samples included) into variant
+    metrics, including the weighted composite score.
+    """
+    w = weights or COMPOSITE_WEIGHTS[mode]
+    scored = [d for d in details if not d.get("error")]
+    n = len(scored)
+
+    metrics = {
+        "variant": name,
+        "mode": mode,
+        "temperature": temperature,
+        "total_samples": len(details),
+        "errors": len(details) - n,
+        "avg_gleu": _avg([d["gleu"] for d in scored]),
+        "avg_meaning": _avg([d["meaning_preserved"] for d in scored]),
+        "avg_latency": _avg([d["latency"] for d in scored if d.get("latency") is not None]),
+    }
+
+    if mode == "concise":
+        metrics["avg_compression"] = _avg([d["compression_ratio"] for d in scored])
+        metrics["bloat_rate"] = sum(1 for d in scored if d["bloated"]) / max(n, 1)
+        # Composite score for concise: reward compression + meaning + GLEU, penalize bloat
+        metrics["composite"] = (
+            metrics["avg_gleu"] * w["gleu"] +
+            metrics["avg_meaning"] * w["meaning"] +
+            (1.0 - metrics["avg_compression"]) * w["compression"] +  # lower ratio = more compression = better
+            (1.0 - metrics["bloat_rate"]) * w["no_bloat"]
+        )
+
+    elif mode in ("casual", "professional"):
+        style_key, metric_key, weight_key = (
+            ("informality_score", "avg_informality", "informality") if mode == "casual"
+            else ("formality_score", "avg_formality", "formality")
+        )
+        stability_tests = [d for d in scored if d.get("stability_test")]
+        stability_pass = sum(1 for d in stability_tests if d["stability_pass"])
+
+        metrics[metric_key] = _avg([d[style_key] for d in scored])
+        metrics["stability"] = stability_pass / len(stability_tests) if stability_tests else None
+        metrics["composite"] = (
+            metrics["avg_gleu"] * w["gleu"] +
+            metrics["avg_meaning"] * w["meaning"] +
+            metrics[metric_key] * w[weight_key] +
+            (metrics["stability"] or 0.5) * w["stability"]
+        )
+
+    metrics.update(think_metrics(details))
+    metrics.update(truncation_metrics(details))
+    return metrics
+
+
 # ─── Evaluation ──────────────────────────────────────────────────────────────
 
-def evaluate_style_variant(variant, samples, mode, base_url):
-    """Evaluate a prompt variant with mode-specific metrics."""
+def evaluate_style_variant(variant, samples, mode, base_url, on_result=None,
+                           think_budget=None, think_retries=1, layout=DEFAULT_LAYOUT,
+                           token_policy="fixed"):
+    """
+    Evaluate a prompt variant with mode-specific metrics.
+
+    If given, on_result(detail) is called with each per-sample detail dict as
+    soon as it is computed (used to stream results to disk). Details refer to
+    their sample by index and sample_id rather than repeating its text.
+    think_budget/think_retries and the message layout are passed through to
+    swama_client.complete(); token_policy sets max_tokens and stop sequences
+    (see token_policy.py).
+    """
     name = variant["name"]
     system_prompt = variant["system_prompt"]
     temperature = variant["temperature"]
@@ -266,161 +402,81 @@ def evaluate_style_variant(variant, samples, mode, base_url):
     print(f"{'='*60}")
 
     results = []
-    gleu_scores = []
-    meaning_scores = []
-    latencies = []
-    errors = 0
-
-    # Mode-specific accumulators
-    if mode == "concise":
-        compression_ratios = []
-        bloat_count = 0
-    elif mode == "casual":
-        informality_scores = []
-        stability_tests = 0
-        stability_pass = 0
-    elif mode == "professional":
-        formality_scores_list = []
-        stability_tests = 0
-        stability_pass = 0
 
     for i, sample in enumerate(samples):
         source = sample["source"]
         references = sample["references"]
         preserve = sample.get("preserve", [])
+        sid = sample.get("id") or sample_id(source)
 
         if (i + 1) % 5 == 0 or i == 0:
-            print(f"  [{i+1}/{len(samples)}] Processing...")
+            with span("print"):
+                print(f"  [{i+1}/{len(samples)}] Processing...")
 
+        limits = generation_limits(mode, source, token_policy)
         try:
-            raw_output, latency = call_swama(source, system_prompt, temperature, base_url)
-            output = clean_response(raw_output)
-            latencies.append(latency)
+            with span("http"):
+                response = call_swama_full(source, system_prompt, temperature, base_url,
+                                           trace={"variant": name, "sample": sid},
+                                           think_budget=think_budget, think_retries=think_retries,
+                                           layout=layout, **limits)
+            raw_output, latency = response["text"], response["latency"]
+            with span("clean_response"):
+                output = clean_response(raw_output)
         except Exception as e:
             print(f"  ERROR on sample {i}: {e}")
-            errors += 1
-            results.append({"index": i, "source": source, "output": None, "error": str(e)})
+            results.append({"index": i, "sample_id": sid, "output": None, "error": str(e)})
+            if on_result:
+                on_result(results[-1])
             continue
 
-        # Shared metrics
-        gleu = compute_gleu(source, output, references)
-        gleu_scores.append(gleu)
-
-        meaning = meaning_preserved(output, preserve)
-        meaning_scores.append(meaning)
-
         detail = {
             "index": i,
-            "source": source,
+            "sample_id": sid,
             "output": output,
-            "references": references,
-            "gleu": gleu,
-            "meaning_preserved": meaning,
             "latency": latency,
+            **usage_fields(response),
         }
-
-        # Mode-specific metrics
-        if mode == "concise":
-            cr = compression_ratio(source, output)
-            compression_ratios.append(cr)
-            bloated = is_bloated(source, output)
-            if bloated:
-                bloat_count += 1
-            detail["compression_ratio"] = cr
-            detail["bloated"] = bloated
-
-        elif mode == "casual":
-            inf_score = informality_score(output)
-            informality_scores.append(inf_score)
-            detail["informality_score"] = inf_score
-
-            # Stability test: if references match source, output should too
-            if any(ref.strip().lower() == source.strip().lower() for ref in references):
-                stability_tests += 1
-                if output.strip().lower() == source.strip().lower():
-                    stability_pass += 1
-                detail["stability_test"] = True
-                detail["stability_pass"] = output.strip().lower() == source.strip().lower()
-
-        elif mode == "professional":
-            form_score = formality_score(output)
-            formality_scores_list.append(form_score)
-            detail["formality_score"] = form_score
-
-            if any(ref.strip().lower() == source.strip().lower() for ref in references):
-                stability_tests += 1
-                if output.strip().lower() == source.strip().lower():
-                    stability_pass += 1
-                detail["stability_test"] = True
-                detail["stability_pass"] = output.strip().lower() == source.strip().lower()
+        if token_policy != "fixed":
+            detail["max_tokens"] = limits["max_tokens"]
+        detail.update(score_style_output(source, output, references, preserve, mode))
 
         results.append(detail)
+        if on_result:
+            with span("write_results"):
+                on_result(detail)
 
-    # Aggregate
-    n = len(samples) - errors
-
-    metrics = {
-        "variant": name,
-        "mode": mode,
-        "temperature": temperature,
-        "total_samples": len(samples),
-        "errors": errors,
-        "avg_gleu": sum(gleu_scores) / max(len(gleu_scores), 1),
-        "avg_meaning": sum(meaning_scores) / max(len(meaning_scores), 1),
-        "avg_latency": sum(latencies) / max(len(latencies), 1),
-    }
-
-    if mode == "concise":
-        metrics["avg_compression"] = sum(compression_ratios) / max(len(compression_ratios), 1)
-        metrics["bloat_rate"] = bloat_count / max(n, 1)
-        # Composite score for concise: reward compression + meaning + GLEU, penalize bloat
-        metrics["composite"] = (
-            metrics["avg_gleu"] * 0.3 +
-            metrics["avg_meaning"] * 0.3 +
-            (1.0 - metrics["avg_compression"]) * 0.3 +  # lower ratio = more compression = better
-            (1.0 - metrics["bloat_rate"]) * 0.1
-        )
-
-    elif mode == "casual":
-        metrics["avg_informality"] = sum(informality_scores) / max(len(informality_scores), 1)
-        metrics["stability"] = stability_pass / max(stability_tests, 1) if stability_tests > 0 else None
-        metrics["composite"] = (
-            metrics["avg_gleu"] * 0.3 +
-            metrics["avg_meaning"] * 0.3 +
-            metrics["avg_informality"] * 0.3 +
-            (metrics["stability"] or 0.5) * 0.1
-        )
-
-    elif mode == "professional":
-        metrics["avg_formality"] = sum(formality_scores_list) / max(len(formality_scores_list), 1)
-        metrics["stability"] = stability_pass / max(stability_tests, 1) if stability_tests > 0 else None
-        metrics["composite"] = (
-            metrics["avg_gleu"] * 0.3 +
-            metrics["avg_meaning"] * 0.3 +
-            metrics["avg_formality"] * 0.3 +
-            (metrics["stability"] or 0.5) * 0.1
-        )
+    with span("aggregate"):
+        metrics = aggregate_style_metrics(name, mode, temperature, results)
+    errors = metrics["errors"]
 
     # Print summary
-    print(f"\n  Results for {name}:")
-    print(f"  ├── GLEU:           {metrics['avg_gleu']:.4f}")
-    print(f"  ├── Meaning:        {metrics['avg_meaning']:.1%}")
-
-    if mode == "concise":
-        print(f"  ├── Compression:    {metrics['avg_compression']:.2f}x ({(1-metrics['avg_compression']):.0%} reduction)")
-        print(f"  ├── Bloat rate:     {metrics['bloat_rate']:.1%}")
-    elif mode == "casual":
-        print(f"  ├── Informality:    {metrics['avg_informality']:.4f}")
-        if metrics["stability"] is not None:
-            print(f"  ├── Stability:      {metrics['stability']:.1%}")
-    elif mode == "professional":
-        print(f"  ├── Formality:      {metrics['avg_formality']:.4f}")
-        if metrics["stability"] is not None:
-            print(f"  ├── Stability:      {metrics['stability']:.1%}")
+    with span("print"):
+        print(f"\n  Results for {name}:")
+        print(f"  ├── GLEU:           {metrics['avg_gleu']:.4f}")
+        print(f"  ├── Meaning:        {metrics['avg_meaning']:.1%}")
 
-    print(f"  ├── Composite:      {metrics['composite']:.4f}")
-    print(f"  ├── Avg latency:    {metrics['avg_latency']:.2f}s")
-    print(f"  └── Errors:         {errors}")
+        if mode == "concise":
+            print(f"  ├── Compression:    {metrics['avg_compression']:.2f}x ({(1-metrics['avg_compression']):.0%} reduction)")
+            print(f"  ├── Bloat rate:     {metrics['bloat_rate']:.1%}")
+        elif mode == "casual":
+            print(f"  ├── Informality:    {metrics['avg_informality']:.4f}")
+            if metrics["stability"] is not None:
+                print(f"  ├── Stability:      {metrics['stability']:.1%}")
+        elif mode == "professional":
+            print(f"  ├── Formality:      {metrics['avg_formality']:.4f}")
+            if metrics["stability"] is not None:
+                print(f"  ├── Stability:      {metrics['stability']:.1%}")
+
+        print(f"  ├── Composite:      {metrics['composite']:.4f}")
+        print(f"  ├── Avg latency:    {metrics['avg_latency']:.2f}s")
+        if metrics.get("think_leak_rate"):
+            print(f"  ├── Think leaks:    {metrics['think_leak_rate']:.1%} "
+                  f"({metrics['wasted_tokens']} tokens, {metrics['wasted_seconds']:.1f}s wasted)")
+        if metrics.get("truncated"):
+            print(f"  ├── Hit max_tokens: {metrics['truncated_rate']:.1%} "
+                  f"({metrics['truncated']} outputs cut off; their scores are not a quality signal)")
+        print(f"  └── Errors:         {errors}")
 
     return {"metrics": metrics, "details": results}
 
@@ -494,13 +550,46 @@ def main():
                         default="all", help="Which mode to evaluate")
     parser.add_argument("--url", type=str, default="http://localhost:28100",
                         help="Swama API base URL")
-    parser.add_argument("--output", type=str, default=None, help="Save results to JSON")
+    parser.add_argument("--output", type=str, default=None,
+                        help="Save results (.jsonl streams one record per sample; .json writes one document)")
+    parser.add_argument("--columnar", type=str, default=None,
+                        help="Also export results to SQLite (.db) or Parquet (.parquet); requires a .jsonl --output")
+    parser.add_argument("--store", type=str, default=None,
+                        help="Record this run in a run-history SQLite database (see run_store.py)")
     parser.add_argument("--show-all", action="store_true", help="Print all samples")
+    parser.add_argument("--trace", type=str, default=None,
+                        help="Stream requests and save a Chrome trace (open in Perfetto) to this path")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Serve live Prometheus metrics on this port (/metrics)")
+    parser.add_argument("--metrics-host", type=str, default="127.0.0.1",
+                        help="Interface for --metrics-port (default: 127.0.0.1; 0.0.0.0 to scrape from another machine)")
+    parser.add_argument("--metrics-textfile", type=str, default=None,
+                        help="Write live Prometheus metrics to this file (node_exporter textfile collector)")
+    parser.add_argument("--think-budget", type=int, default=None,
+                        help="Abort and re-issue a generation still inside <think> after this many tokens")
+    parser.add_argument("--think-retries", type=int, default=1,
+                        help="Re-issues allowed per sample after a --think-budget abort")
+    parser.add_argument("--layout", choices=MESSAGE_LAYOUTS, default=DEFAULT_LAYOUT,
+                        help="Message layout: system prompt in the user message (default, as the app), "
+                             "a separate system message, or the text first")
+    parser.add_argument("--token-policy", choices=TOKEN_POLICIES, default="fixed",
+                        help="max_tokens/stop sequences: fixed 512 (default) or sized by input length")
+    parser.add_argument("--profile", action="store_true",
+                        help="Time each stage (HTTP, cleaning, scoring, printing) and run under cProfile")
+    parser.add_argument("--memprofile", action="store_true",
+                        help="Report memory held/peak per stage and top allocation sites (tracemalloc)")
     args = parser.parse_args()
 
+    if args.memprofile:
+        import memprofile
+        memprofile.start()
+
     from style_prompts import CONCISE_VARIANTS, CASUAL_VARIANTS, PROFESSIONAL_VARIANTS
     from style_samples import CONCISE_SAMPLES, CASUAL_SAMPLES, PROFESSIONAL_SAMPLES
 
+    if args.memprofile:
+        memprofile.checkpoint("samples loaded")
+
     # Test connection
     print("Testing Swama connection...")
     try:
@@ -518,6 +607,39 @@ def main():
     if args.mode in ("all", "professional"):
         modes_to_run.append(("professional", PROFESSIONAL_VARIANTS, PROFESSIONAL_SAMPLES))
 
+    writer = None
+    if args.output and args.output.endswith(".jsonl"):
+        from results_io import ResultsWriter
+        writer = ResultsWriter(args.output, "style", model=MODEL, server_url=args.url,
+                               layout=args.layout, token_policy=args.token_policy)
+        for _, _, samples in modes_to_run:
+            writer.write_samples(samples)
+    elif args.columnar:
+        print("ERROR: --columnar requires a .jsonl --output")
+        sys.exit(1)
+
+    if args.trace:
+        import trace_export
+        trace_export.start("eval_styles")
+
+    profile_handle = None
+    if args.profile:
+        import profiling
+        profile_handle = profiling.start()
+
+    exporter = None
+    if args.metrics_port or args.metrics_textfile:
+        from metrics_exporter import MetricsExporter
+        exporter = MetricsExporter(port=args.metrics_port, textfile=args.metrics_textfile,
+                                   host=args.metrics_host)
+
+    # Per-sample hooks: stream to JSONL and/or update live metrics
+    hooks = []
+    if writer:
+        hooks.append(lambda d, name, mode: writer.write_detail(name, mode, d))
+    if exporter:
+        hooks.append(lambda d, name, mode: exporter.observe(name, mode, d))
+
     all_mode_results = {}
 
     for mode_name, variants, samples in modes_to_run:
@@ -528,8 +650,21 @@ def main():
 
         mode_results = []
         for variant in variants:
-            result = evaluate_style_variant(variant, samples, mode_name, args.url)
+            on_result = None
+            if hooks:
+                on_result = lambda d, name=variant["name"], m=mode_name: [hook(d, name, m) for hook in hooks]
+            if exporter:
+                exporter.begin_variant(variant["name"], mode_name, len(samples))
+            result = evaluate_style_variant(variant, samples, mode_name, args.url, on_result=on_result,
+                                            think_budget=args.think_budget,
+                                            think_retries=args.think_retries,
+                                            layout=args.layout,
+                                            token_policy=args.token_policy)
+            if writer:
+                writer.write_metrics(result["metrics"], mode_name)
             mode_results.append(result)
+            if args.memprofile:
+                memprofile.checkpoint(f"{mode_name} {variant['name']}")
 
         if len(mode_results) > 1:
             print_comparison(mode_results, mode_name)
@@ -543,16 +678,47 @@ def main():
             for d in best_result["details"]:
                 if d.get("error"):
                     continue
+                sample = samples[d["index"]]
                 print(f"\n  [{d['index']}]")
-                print(f"  Source: {d['source'][:100]}...")
+                print(f"  Source: {sample['source'][:100]}...")
                 print(f"  Output: {d['output'][:100]}...")
-                print(f"  Ref[0]: {d['references'][0][:100]}...")
+                print(f"  Ref[0]: {sample['references'][0][:100]}...")
                 print(f"  GLEU: {d['gleu']:.4f}  Meaning: {d['meaning_preserved']:.1%}")
 
+    if profile_handle:
+        profiling.finish(profile_handle)
+
+    if exporter:
+        exporter.close()
+
+    if args.trace:
+        trace_export.save(args.trace)
+
+    # Record in run history
+    if args.store:
+        from run_store import record_run
+        record_run(
+            args.store, "style", MODEL, args.url,
+            [(mode_name, r) for mode_name, results in all_mode_results.items() for r in results],
+            {v["name"]: v["system_prompt"] for _, variants, _ in modes_to_run for v in variants},
+            samples=[s for _, _, samples in modes_to_run for s in samples],
+        )
+
     # Save
-    if args.output:
+    if writer:
+        writer.close()
+        print(f"\nResults streamed to: {args.output}")
+        if args.columnar:
+            from results_io import export_columnar
+            export_columnar(args.output, args.columnar)
+    elif args.output:
+        from results_io import sample_record
         output_data = {
             "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "samples": list({
+                record["sample_id"]: record
+                for record in (sample_record(s) for _, _, samples in modes_to_run for s in samples)
+            }.values()),
             "modes": {},
         }
         for mode_name, results in all_mode_results.items():
@@ -564,6 +730,9 @@ def main():
             json.dump(output_data, f, indent=2)
         print(f"\nResults saved to: {args.output}")
 
+    if args.memprofile:
+        memprofile.checkpoint("results written")
+
     # Final summary
     print(f"\n{'='*70}")
     print("  WINNERS SUMMARY")
@@ -573,6 +742,9 @@ def main():
         m = best["metrics"]
         print(f"  {mode_name.upper():15s}  {m['variant']:30s}  composite={m['composite']:.4f}  GLEU={m['avg_gleu']:.4f}  meaning={m['avg_meaning']:.1%}")
 
+    if args.memprofile:
+        memprofile.finish()
+
     print("\nDone!")
 
 
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+latency_breakdown.py — Latency by input/output length, with prefill/decode rate fitting.
+
+p95_latency is a single number, but a sample's latency is mostly a function
+of how many tokens the model has to read (system prompt + source: prefill)
+and how many it has to write (decode). This report:
+
+  - buckets each variant's samples by prompt tokens and by output tokens and
+    shows mean, p50 and p95 latency for each bucket
+  - fits   latency ≈ overhead + prefill_rate × prompt_tokens + decode_rate × output_tokens
+    by least squares over all variants in the run (the rates belong to the
+    model and machine, and only differing system-prompt lengths let prefill
+    be told apart from decode), then splits each variant's mean latency into
+    overhead, prefill (and how much of it is the system prompt) and decode —
+    so a slow variant can be blamed on system-prompt length or on verbosity
+  - when TTFT was recorded (streamed/--trace runs), also fits TTFT against
+    prompt tokens directly as a cross-check on the prefill rate
+
+Token counts come from the server's usage data stored on each detail
+(prompt_tokens/completion_tokens). For older results files without them,
+counts are estimated from the text with estimate_tokens() and the variant's
+system prompt is looked up by name in prompts.py / style_prompts.py.
+
+Usage:
+    python latency_breakdown.py results_jfleg.json
+    python latency_breakdown.py style_results_v2.json --variant casual_v5_few_shot
+    python latency_breakdown.py run.jsonl --mode grammar --min-samples 3
+"""
+
+import argparse
+import re
+
+from results_io import load_results
+from run_store import known_prompts, percentile
+
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512)
+
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text):
+    """
+    Rough BPE-style token count: one token per word or punctuation mark, plus
+    one for every further 8 characters of a long word. Within ~15% of the
+    Qwen tokenizer on English prose — good enough for bucketing and fitting.
+    """
+    return sum(1 + (len(piece) - 1) // 8 for piece in _PIECE_RE.findall(text or ""))
+
+
+def bucket_label(tokens, bounds=TOKEN_BUCKETS):
+    lower = 0
+    for upper in bounds:
+        if tokens < upper:
+            return f"{lower}-{upper - 1}"
+        lower = upper
+    return f"{lower}+"
+
+
+# ─── Fitting ─────────────────────────────────────────────────────────────────
+
+def fit_linear(features, targets):
+    """
+    Ordinary least squares with an intercept.
+
+    features: list of equal-length feature lists; targets: list of floats.
+    Returns (coefficients, r_squared) with coefficients[0] the intercept, or
+    None if the system is singular (e.g. a feature that never varies).
+    """
+    n = len(targets)
+    k = len(features[0]) + 1 if features else 1
+    if n <= k:
+        return None
+
+    # Normal equations XᵀX β = Xᵀy, solved by Gaussian elimination
+    xtx = [[0.0] * k for _ in range(k)]
+    xty = [0.0] * k
+    for row, y in zip(features, targets):
+        x = [1.0] + list(row)
+        for i in range(k):
+            xty[i] += x[i] * y
+            for j in range(k):
+                xtx[i][j] += x[i] * x[j]
+
+    m = [xtx[i] + [xty[i]] for i in range(k)]
+    for col in range(k):
+        pivot = max(range(col, k), key=lambda r: abs(m[r][col]))
+        if abs(m[pivot][col]) < 1e-9:
+            return None
+        m[col], m[pivot] = m[pivot], m[col]
+        for r in range(k):
+            if r != col:
+                factor = m[r][col] / m[col][col]
+                for c in range(col, k + 1):
+                    m[r][c] -= factor * m[col][c]
+    beta = [m[i][k] / m[i][i] for i in range(k)]
+
+    mean_y = sum(targets) / n
+    ss_tot = sum((y - mean_y) ** 2 for y in targets)
+    ss_res = sum(
+        (y - beta[0] - sum(b * x for b, x in zip(beta[1:], row))) ** 2
+        for row, y in zip(features, targets)
+    )
+    r2 = 1 - ss_res / ss_tot if ss_tot else 1.0
+    return beta, r2
+
+
+# ─── Collection ──────────────────────────────────────────────────────────────
+
+def collect_points(data, variants=None, mode=None):
+    """
+    Turn a loaded results document into per-variant lists of
+    {"prompt_tokens", "output_tokens", "latency", "ttft", "estimated"} points.
+
+    Returns ({(variant, mode): [points]}, {variant: system_prompt_tokens}).
+    """
+    prompts = known_prompts()
+    points = {}
+    system_tokens = {}
+    for r in data["results"]:
+        metrics = r["metrics"]
+        name = metrics["variant"]
+        variant_mode = metrics.get("mode") or "grammar"
+        if variants and name not in variants:
+            continue
+        if mode and variant_mode != mode:
+            continue
+
+        system_prompt = prompts.get(name)
+        if system_prompt is not None:
+            system_tokens[name] = estimate_tokens(system_prompt)
+
+        for d in r["details"]:
+            if d.get("error") or d.get("latency") is None:
+                continue
+            estimated = False
+            prompt_tokens = d.get("prompt_tokens")
+            if prompt_tokens is None:
+                if system_prompt is None:
+                    continue
+                prompt_tokens = estimate_tokens(f"{system_prompt}\n\n{d['source']}")
+                estimated = True
+            output_tokens = d.get("completion_tokens")
+            if output_tokens is None:
+                output_tokens = estimate_tokens(d.get("output", ""))
+                estimated = True
+            points.setdefault((name, variant_mode), []).append({
+                "prompt_tokens": prompt_tokens,
+                "output_tokens": output_tokens,
+                "latency": d["latency"],
+                "ttft": d.get("ttft"),
+                "estimated": estimated,
+            })
+    return points, system_tokens
+
+
+def bucket_rows(points, key, min_samples=1):
+    """Latency stats per token bucket of `key` ("prompt_tokens" or "output_tokens")."""
+    buckets = {}
+    for p in points:
+        buckets.setdefault(bucket_label(p[key]), []).append(p)
+
+    def order(label):
+        return int(label.split("-")[0].rstrip("+"))
+
+    rows = []
+    for label in sorted(buckets, key=order):
+        group = buckets[label]
+        if len(group) < min_samples:
+            continue
+        latencies = [p["latency"] for p in group]
+        tokens = sum(p[key] for p in group)
+        rows.append([
+            label, len(group),
+            f"{sum(latencies) / len(latencies):.3f}s",
+            f"{percentile(latencies, 0.5):.3f}s",
+            f"{percentile(latencies, 0.95):.3f}s",
+            f"{sum(latencies) / max(tokens, 1) * 1000:.1f}",
+        ])
+    return rows
+
+
+def fit_rates(points):
+    """
+    Fit overhead (s), prefill rate and decode rate (s/token) over the points
+    of every variant in a run together.
+
+    Prefill/decode speed is a property of the model and machine, not of the
+    prompt, so the rates are shared. Pooling also makes the fit identifiable:
+    within one variant, prompt length only varies with source length, which
+    tracks output length almost exactly, while system prompts differ a lot
+    between variants. Falls back to a decode-only fit when prompt tokens
+    never vary. Returns a dict or None.
+    """
+    latencies = [p["latency"] for p in points]
+    fit = fit_linear([[p["prompt_tokens"], p["output_tokens"]] for p in points], latencies)
+    if fit is not None:
+        (overhead, prefill, decode), r2 = fit
+    else:
+        fit = fit_linear([[p["output_tokens"]] for p in points], latencies)
+        if fit is None:
+            return None
+        (overhead, decode), r2 = fit
+        prefill = None
+
+    rates = {
+        "n": len(points),
+        "overhead": overhead,
+        "prefill_per_token": prefill,
+        "decode_per_token": decode,
+        "r2": r2,
+        "ttft_prefill_per_token": None,
+    }
+    timed = [p for p in points if p["ttft"] is not None]
+    if timed:
+        ttft_fit = fit_linear([[p["prompt_tokens"]] for p in timed], [p["ttft"] for p in timed])
+        if ttft_fit:
+            rates["ttft_prefill_per_token"] = ttft_fit[0][1]
+    return rates
+
+
+def attribute(points, rates, system_tokens=None):
+    """Split one variant's mean latency into overhead / prefill / decode using the shared rates."""
+    n = len(points)
+    mean_latency = sum(p["latency"] for p in points) / n
+    mean_prompt = sum(p["prompt_tokens"] for p in points) / n
+    mean_output = sum(p["output_tokens"] for p in points) / n
+    prefill_rate = rates["prefill_per_token"] or 0.0
+    prefill = prefill_rate * mean_prompt
+    decode = rates["decode_per_token"] * mean_output
+    return {
+        "n": n,
+        "mean_latency": mean_latency,
+        "mean_prompt_tokens": mean_prompt,
+        "mean_output_tokens": mean_output,
+        "system_prompt_cost": prefill_rate * system_tokens if system_tokens else None,
+        "prefill": prefill,
+        "decode": decode,
+        "residual": mean_latency - rates["overhead"] - prefill - decode,
+        "estimated": any(p["estimated"] for p in points),
+    }
+
+
+# ─── Output ──────────────────────────────────────────────────────────────────
+
+def _print_table(rows, headers):
+    try:
+        from tabulate import tabulate
+    except ImportError:
+        print("  ".join(headers))
+        for row in rows:
+            print("  ".join(str(c) for c in row))
+        return
+    print(tabulate(rows, headers=headers, tablefmt="grid"))
+
+
+def print_report(points, system_tokens, min_samples=1):
+    for (name, mode), pts in sorted(points.items()):
+        print(f"\n{'='*70}")
+        print(f"  {name} ({mode}) — {len(pts)} samples")
+        print(f"{'='*70}")
+        print("\n  By prompt tokens (system prompt + source):")
+        _print_table(bucket_rows(pts, "prompt_tokens", min_samples),
+                     ["Tokens", "N", "Mean", "P50", "P95", "ms/token"])
+        print("\n  By output tokens:")
+        _print_table(bucket_rows(pts, "output_tokens", min_samples),
+                     ["Tokens", "N", "Mean", "P50", "P95", "ms/token"])
+
+    rates = fit_rates([p for pts in points.values() for p in pts])
+    print(f"\n{'='*70}")
+    print("  LATENCY MODEL: overhead + prefill × prompt_tokens + decode × output_tokens")
+    print(f"{'='*70}")
+    if rates is None:
+        print("  Not enough variation in token counts to fit a model.")
+        return None
+
+    prefill_rate = rates["prefill_per_token"]
+    print(f"  Fitted over {rates['n']} samples (R² = {rates['r2']:.2f}):")
+    print(f"    overhead: {rates['overhead'] * 1000:.0f}ms per request")
+    if prefill_rate is not None:
+        print(f"    prefill:  {prefill_rate * 1000:.2f}ms per prompt token")
+    else:
+        print("    prefill:  — (prompt tokens never vary; folded into overhead)")
+    print(f"    decode:   {rates['decode_per_token'] * 1000:.2f}ms per output token")
+    if rates["ttft_prefill_per_token"] is not None:
+        print(f"    prefill from TTFT alone: {rates['ttft_prefill_per_token'] * 1000:.2f}ms per prompt token")
+    if any(p["estimated"] for pts in points.values() for p in pts):
+        print("  (token counts partly estimated from text — no usage data in this file)")
+
+    rows = []
+    for (name, mode), pts in sorted(points.items()):
+        a = attribute(pts, rates, system_tokens.get(name))
+        rows.append([
+            name, mode, a["n"],
+            f"{a['mean_latency']:.3f}s",
+            f"{a['mean_prompt_tokens']:.0f}",
+            f"{a['mean_output_tokens']:.0f}",
+            f"{a['prefill'] * 1000:.0f}ms",
+            f"{a['system_prompt_cost'] * 1000:.0f}ms" if a["system_prompt_cost"] is not None else "—",
+            f"{a['decode'] * 1000:.0f}ms",
+            f"{a['residual'] * 1000:+.0f}ms",
+        ])
+    print()
+    _print_table(rows, ["Variant", "Mode", "N", "Mean", "Prompt tok", "Output tok",
+                        "Prefill", "of which system", "Decode", "Residual"])
+    print("\n  Prefill = fitted prefill rate × mean prompt tokens (system prompt + source);")
+    print("  a large 'of which system' means the prompt is expensive because of its length,")
+    print("  a large Decode means it is expensive because of verbose output.")
+    return rates
+
+
+# ─── Main ─────────────────────────────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency breakdown by prompt/output token counts")
+    parser.add_argument("input", help="Results file (.json or .jsonl)")
+    parser.add_argument("--variant", type=str, action="append", default=None,
+                        help="Only these variants (repeatable)")
+    parser.add_argument("--mode", type=str, default=None,
+                        help="Only this mode (grammar, concise, casual, professional)")
+    parser.add_argument("--min-samples", type=int, default=1,
+                        help="Hide buckets with fewer samples than this")
+    args = parser.parse_args()
+
+    data = load_results(args.input)
+    points, system_tokens = collect_points(data, args.variant, args.mode)
+    if not points:
+        print("No scored samples with latency found.")
+        return
+    print_report(points, system_tokens, args.min_samples)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+layout_bench.py — TTFT per message layout, with and without a reusable prompt prefix.
+
+The app sends the system prompt and the text as one user message
+(RewriteEngine.swift); iteration-0/test_llm_quality.py sent a separate
+system message until it took --layout too. A server that keeps the previous prompt's KV cache (MLX
+does) only has to prefill the tokens after the prefix two requests share,
+so how much of each request is a repeat of the last one decides TTFT. For
+each layout in swama_client.MESSAGE_LAYOUTS this runs the same set of
+requests — --samples inputs for each mode's variant — in two orders:
+
+    warm  grouped by variant: consecutive requests repeat the same system
+          prompt, as when the user stays in one mode
+    cold  round-robin over the variants: consecutive requests never share a
+          system prompt, as when every request switches mode
+
+Only the order differs, so cold − warm TTFT is what prefix reuse saves.
+The first request of each warm group follows a different prompt and is
+left out of the warm numbers. Rounds alternate which order goes first.
+The report gives warm and cold TTFT (mean and p50) per layout, the saving
+in ms and as a share of cold TTFT, and the saving per system prompt token.
+text_first puts the input ahead of the instructions and is the
+no-reuse control.
+
+Generation is capped at --max-tokens (default 8): TTFT only needs the
+first token, and the prefix match only covers the prompt anyway.
+
+Usage:
+    python layout_bench.py --samples 8 --rounds 2
+    python layout_bench.py --layouts concatenated system --modes grammar casual
+    python layout_bench.py --stub --stub-speed 0.1 --output layouts.json
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+
+from latency_breakdown import estimate_tokens
+from load_test import MODE_VARIANTS, build_workload, find_variant
+from run_store import percentile
+from swama_client import DEFAULT_LAYOUT, DEFAULT_MODEL, MESSAGE_LAYOUTS, complete
+
+MAX_TOKENS = 8
+
+
+# ─── Workload ────────────────────────────────────────────────────────────────
+
+def build_requests(modes, variants, samples, seed=0):
+    """{mode: [(variant, source), ...]} with `samples` inputs per mode."""
+    sources = {}
+    for item in build_workload(modes):
+        sources.setdefault(item["mode"], []).append(item["source"])
+    rng = random.Random(seed)
+    requests_by_mode = {}
+    for mode in modes:
+        picked = list(sources[mode])
+        rng.shuffle(picked)
+        requests_by_mode[mode] = [(variants[mode], source) for source in picked[:samples]]
+    return requests_by_mode
+
+
+def ordered(requests_by_mode, order):
+    """
+    The requests as [(mode, variant, source, first_of_group)], grouped by
+    mode ("warm") or round-robin over modes ("cold").
+    """
+    if order == "warm":
+        return [(mode, variant, source, i == 0)
+                for mode, group in requests_by_mode.items()
+                for i, (variant, source) in enumerate(group)]
+    longest = max(len(group) for group in requests_by_mode.values())
+    return [(mode, group[i][0], group[i][1], True)
+            for i in range(longest)
+            for mode, group in requests_by_mode.items() if i < len(group)]
+
+
+# ─── Benchmark ───────────────────────────────────────────────────────────────
+
+def run_order(requests, layout, base_url, model=DEFAULT_MODEL, max_tokens=MAX_TOKENS):
+    records = []
+    for mode, variant, source, first in requests:
+        record = {"mode": mode, "variant": variant["name"], "first": first,
+                  "system_tokens": estimate_tokens(variant["system_prompt"])}
+        try:
+            result = complete(source, variant["system_prompt"], variant["temperature"], base_url,
+                              model=model, max_tokens=max_tokens, stream=True, layout=layout)
+        except Exception as e:
+            record["error"] = str(e)
+        else:
+            record["ttft"] = result["ttft"]
+            record["prompt_tokens"] = result["prompt_tokens"]
+        records.append(record)
+    return records
+
+
+def run_benchmark(layouts, requests_by_mode, base_url, model=DEFAULT_MODEL, rounds=1,
+                  max_tokens=MAX_TOKENS):
+    records = []
+    for layout in layouts:
+        for round_index in range(rounds):
+            orders = ("warm", "cold") if round_index % 2 == 0 else ("cold", "warm")
+            for order in orders:
+                print(f"  {layout:13s} round {round_index + 1} {order} ...", end=" ", flush=True)
+                batch = run_order(ordered(requests_by_mode, order), layout, base_url, model, max_tokens)
+                for record in batch:
+                    record.update({"layout": layout, "order": order, "round": round_index})
+                records.extend(batch)
+                ttfts = [r["ttft"] for r in batch if r.get("ttft") is not None]
+                print(f"mean TTFT {sum(ttfts) / len(ttfts):.3f}s" if ttfts else "no TTFT")
+    return records
+
+
+def summary_rows(records, layouts):
+    rows = []
+    for layout in layouts:
+        mine = [r for r in records if r["layout"] == layout and r.get("ttft") is not None]
+        warm = [r for r in mine if r["order"] == "warm" and not r["first"]]
+        cold = [r for r in mine if r["order"] == "cold"]
+        warm_ttft = [r["ttft"] for r in warm]
+        cold_ttft = [r["ttft"] for r in cold]
+        warm_mean = sum(warm_ttft) / len(warm_ttft) if warm_ttft else None
+        cold_mean = sum(cold_ttft) / len(cold_ttft) if cold_ttft else None
+        saving = cold_mean - warm_mean if warm_mean is not None and cold_mean is not None else None
+        system_tokens = sum(r["system_tokens"] for r in cold) / len(cold) if cold else None
+        prompt_tokens = [r["prompt_tokens"] for r in mine if r.get("prompt_tokens") is not None]
+        rows.append({
+            "layout": layout,
+            "requests": len(warm) + len(cold),
+            "errors": sum(1 for r in records if r["layout"] == layout and r.get("error")),
+            "prompt_tokens": sum(prompt_tokens) / len(prompt_tokens) if prompt_tokens else None,
+            "warm_ttft": warm_mean,
+            "warm_p50": percentile(warm_ttft, 0.5),
+            "cold_ttft": cold_mean,
+            "cold_p50": percentile(cold_ttft, 0.5),
+            "saving": saving,
+            "saving_share": saving / cold_mean if saving is not None and cold_mean else None,
+            "saving_per_token": saving / system_tokens if saving is not None and system_tokens else None,
+        })
+    return rows
+
+
+def print_report(rows):
+    try:
+        from tabulate import tabulate
+    except ImportError:
+        tabulate = None
+
+    def fmt(value, spec, suffix="", scale=1):
+        return f"{value * scale:{spec}}{suffix}" if value is not None else "—"
+
+    headers = ["Layout", "Requests", "Prompt tok", "Warm TTFT (mean/p50)", "Cold TTFT (mean/p50)",
+               "Reuse saves", "% of cold", "ms / prompt tok", "Errors"]
+    table = [[
+        r["layout"] + (" (default)" if r["layout"] == DEFAULT_LAYOUT else ""),
+        r["requests"], fmt(r["prompt_tokens"], ".0f"),
+        f"{fmt(r['warm_ttft'], '.0f', 'ms', 1000)} / {fmt(r['warm_p50'], '.0f', 'ms', 1000)}",
+        f"{fmt(r['cold_ttft'], '.0f', 'ms', 1000)} / {fmt(r['cold_p50'], '.0f', 'ms', 1000)}",
+        fmt(r["saving"], ".0f", "ms", 1000), fmt(r["saving_share"], ".0%"),
+        fmt(r["saving_per_token"], ".2f", "", 1000), r["errors"],
+    ] for r in rows]
+
+    print(f"\n{'='*70}")
+    print("  TTFT BY MESSAGE LAYOUT: REPEATED VS SWITCHING PREFIXES")
+    print(f"{'='*70}")
+    if tabulate:
+        print(tabulate(table, headers=headers, tablefmt="grid"))
+    else:
+        for row in [headers] + table:
+            print("  ".join(str(c) for c in row))
+    print("\n  Warm: same system prompt as the previous request. Cold: a different one.")
+    print("  A saving near zero means the server isn't reusing the prefix for that layout.")
+
+
+# ─── Main ─────────────────────────────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description="TTFT per message layout with repeated vs switching prefixes")
+    parser.add_argument("--url", type=str, default="http://localhost:8080", help="Swama server URL")
+    parser.add_argument("--model", type=str, default=DEFAULT_MODEL, help="Model ID to request")
+    parser.add_argument("--layouts", nargs="+", choices=MESSAGE_LAYOUTS, default=list(MESSAGE_LAYOUTS),
+                        help="Layouts to compare (default: all)")
+    parser.add_argument("--modes", nargs="+", choices=list(MODE_VARIANTS), default=list(MODE_VARIANTS),
+                        help="Modes whose variants make up the request set (default: all)")
+    parser.add_argument("--variant", type=str, action="append", default=[],
+                        help="Variant for a mode as mode=name (default: each mode's lead variant)")
+    parser.add_argument("--samples", type=int, default=6, help="Inputs per mode")
+    parser.add_argument("--rounds", type=int, default=2, help="Warm/cold rounds per layout")
+    parser.add_argument("--max-tokens", type=int, default=MAX_TOKENS, help="Generation cap per request")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for picking inputs")
+    parser.add_argument("--output", type=str, default=None, help="Save per-request results (JSON)")
+    parser.add_argument("--stub", action="store_true",
+                        help="Start an in-process Swama stub (with its prefix cache) on --url's port")
+    parser.add_argument("--stub-speed", type=float, default=1.0, help="Stub delay multiplier (with --stub)")
+    args = parser.parse_args()
+
+    if len(args.modes) < 2:
+        print("ERROR: need at least two modes, so that cold requests can switch prompts")
+        sys.exit(1)
+    names = {}
+    for spec in args.variant:
+        mode, _, name = spec.partition("=")
+        if mode not in MODE_VARIANTS or not name:
+            print(f"ERROR: --variant must be mode=name with mode one of {', '.join(MODE_VARIANTS)}")
+            sys.exit(1)
+        names[mode] = name
+    try:
+        variants = {mode: find_variant(mode, names.get(mode)) for mode in args.modes}
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+
+    stub = None
+    if args.stub:
+        from urllib.parse import urlparse
+        import swama_stub
+        port = urlparse(args.url).port or 8080
+        stub = swama_stub.serve(port, speed=args.stub_speed, prefix_cache=True)
+        print(f"Started Swama stub on port {port} (speed ×{args.stub_speed}, prefix cache)")
+
+    requests_by_mode = build_requests(args.modes, variants, args.samples, args.seed)
+    records = run_benchmark(args.layouts, requests_by_mode, args.url, args.model, args.rounds, args.max_tokens)
+    rows = summary_rows(records, args.layouts)
+    print_report(rows)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "server_url": args.url,
+                "model": args.model,
+                "variants": {m: v["name"] for m, v in variants.items()},
+                "summary": rows,
+                "requests": records,
+            }, f, indent=2)
+        print(f"\nResults saved to: {args.output}")
+
+    if stub:
+        stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+load_test.py — Open-loop load test simulating real hotkey traffic.
+
+The harnesses send one request at a time, but users fire ⌘⇧G in bursts and
+several rewrites can be in flight at once. This replays the builtin and style
+samples (each with its mode's prompt variant) against a Swama-compatible
+endpoint with arrivals that don't wait for earlier requests to finish:
+
+  - Poisson arrivals at --rate requests/second (exponential gaps), or
+  - trace-driven arrivals from --arrivals: a text file with one arrival time
+    in seconds per line, or a Chrome trace saved with --trace by any of the
+    harnesses (request start times are replayed); --speedup compresses it
+
+Every request is streamed so its time to first token is known. Reported per
+mode and overall:
+
+  - end-to-end latency p50/p95/p99 (scheduled arrival → last token)
+  - TTFT p50/p95
+  - queueing delay: TTFT above the unloaded TTFT for that mode, measured by
+    a short sequential warm-up (--warmup requests per mode) before the test.
+    MLX serves one generation at a time, so this is the time spent waiting
+    behind other requests. Any client-side dispatch lag is included.
+  - SLO violations: requests slower than --slo seconds end to end (and
+    --ttft-slo if given), plus errors
+
+For offline testing, run against the stub (python swama_stub.py), or pass
+--stub to start one in-process.
+
+Usage:
+    # 0.5 req/s for 60s against a local Swama:
+    python load_test.py --rate 0.5 --duration 60
+
+    # Offline, against an in-process stub running 10× faster than real time:
+    python load_test.py --stub --stub-speed 0.1 --rate 5 --requests 200
+
+    # Replay the arrival pattern of a traced run at 2× speed, 3s SLO:
+    python load_test.py --arrivals run.trace.json --speedup 2 --slo 3
+
+    # Only grammar and concise samples; save per-request records:
+    python load_test.py --rate 1 --modes grammar concise --output load.json
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from eval_prompts import clean_response
+from prompts import GRAMMAR_VARIANTS
+from run_store import percentile
+from sample_registry import build_registry, select
+from style_prompts import CASUAL_VARIANTS, CONCISE_VARIANTS, PROFESSIONAL_VARIANTS
+from swama_client import DEFAULT_MODEL, complete
+from token_policy import TOKEN_POLICIES, generation_limits
+
+MODE_VARIANTS = {
+    "grammar": GRAMMAR_VARIANTS,
+    "concise": CONCISE_VARIANTS,
+    "casual": CASUAL_VARIANTS,
+    "professional": PROFESSIONAL_VARIANTS,
+}
+
+
+# ─── Workload ────────────────────────────────────────────────────────────────
+
+def find_variant(mode, name=None):
+    """A mode's variant by name, or its first (lead) variant."""
+    variants = MODE_VARIANTS[mode]
+    if name is None:
+        return variants[0]
+    for variant in variants:
+        if variant["name"] == name:
+            return variant
+    raise ValueError(f"Unknown {mode} variant: {name}")
+
+
+def build_workload(modes=None, variant_names=None):
+    """
+    One work item per (sample, mode) from the builtin and style corpora:
+    {"sample_id", "mode", "variant", "source"}. variant_names maps mode →
+    variant name (default: each mode's lead variant).
+    """
+    registry = build_registry(include_iteration0=False)
+    corpora = {"grammar": "builtin", "concise": "concise",
+               "casual": "casual", "professional": "professional"}
+    items = []
+    for mode in modes or list(MODE_VARIANTS):
+        variant = find_variant(mode, (variant_names or {}).get(mode))
+        for record in select(registry, mode=mode, corpus=corpora[mode]):
+            items.append({
+                "sample_id": record["id"],
+                "mode": mode,
+                "variant": variant,
+                "source": record["source"],
+            })
+    return items
+
+
+# ─── Arrivals ────────────────────────────────────────────────────────────────
+
+def poisson_arrivals(rate, count=None, duration=None, seed=None):
+    """Arrival offsets (seconds) of a Poisson process, until count or duration is reached."""
+    rng = random.Random(seed)
+    offsets = []
+    t = 0.0
+    while True:
+        t += rng.expovariate(rate)
+        if duration is not None and t > duration:
+            break
+        offsets.append(t)
+        if count is not None and len(offsets) >= count:
+            break
+    return offsets
+
+
+def load_arrivals(path, speedup=1.0):
+    """
+    Arrival offsets from a file: one time in seconds per line, or a Chrome
+    trace JSON (request slices' start times). Offsets start at 0.
+    """
+    with open(path) as f:
+        text = f.read()
+    if text.lstrip().startswith("{"):
+        events = json.loads(text).get("traceEvents", [])
+        times = [e["ts"] / 1_000_000 for e in events
+                 if e.get("ph") == "X" and e.get("cat") in ("request", "error")]
+    else:
+        times = [float(line.split(",")[0]) for line in text.splitlines()
+                 if line.strip() and not line.lstrip().startswith("#")]
+    if not times:
+        return []
+    times.sort()
+    return [(t - times[0]) / speedup for t in times]
+
+
+# ─── Running ─────────────────────────────────────────────────────────────────
+
+def send(item, base_url, model):
+    """
+    Send one streamed request, with the item's "limits" (max_tokens/stop, see
+    token_policy.py) if it has any. Returns the swama_client result dict, or
+    {"error": ...}.
+    """
+    variant = item["variant"]
+    try:
+        result = complete(item["source"], variant["system_prompt"], variant["temperature"],
+                          base_url, model=model, stream=True, **item.get("limits", {}))
+        result["text"] = clean_response(result["text"])
+        return result
+    except (requests.RequestException, ValueError) as e:
+        return {"error": str(e)}
+
+
+def measure_unloaded_ttft(items, base_url, model, per_mode=3):
+    """Median TTFT per mode from sequential requests with nothing else in flight."""
+    baseline = {}
+    for mode in sorted({item["mode"] for item in items}):
+        ttfts = []
+        for item in [i for i in items if i["mode"] == mode][:per_mode]:
+            result = send(item, base_url, model)
+            if result.get("ttft") is not None:
+                ttfts.append(result["ttft"])
+        baseline[mode] = percentile(ttfts, 0.5) if ttfts else 0.0
+    return baseline
+
+
+def run_load(items, offsets, base_url, model=DEFAULT_MODEL, max_in_flight=64, seed=None):
+    """
+    Fire one request per arrival offset (items drawn at random), without
+    waiting for earlier ones. Returns per-request records.
+    """
+    rng = random.Random(seed)
+    records = []
+    lock = threading.Lock()
+
+    def fire(item, scheduled):
+        dispatched = time.perf_counter()
+        result = send(item, base_url, model)
+        done = time.perf_counter()
+        record = {
+            "sample_id": item["sample_id"],
+            "mode": item["mode"],
+            "variant": item["variant"]["name"],
+            "offset": scheduled - t0,
+            "dispatch_lag": dispatched - scheduled,
+            "e2e": done - scheduled,
+            "error": result.get("error"),
+        }
+        if not record["error"]:
+            record["ttft"] = (result["ttft"] + record["dispatch_lag"]
+                              if result.get("ttft") is not None else None)
+            record["completion_tokens"] = result.get("completion_tokens")
+            record["finish_reason"] = result.get("finish_reason")
+        with lock:
+            records.append(record)
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        t0 = time.perf_counter()
+        for offset in offsets:
+            scheduled = t0 + offset
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(fire, rng.choice(items), scheduled)
+    return sorted(records, key=lambda r: r["offset"])
+
+
+# ─── Reporting ───────────────────────────────────────────────────────────────
+
+def summarize(records, baseline, slo, ttft_slo=None, wall=None):
+    """Per-mode and overall summary rows (dicts)."""
+    groups = {}
+    for r in sorted(records, key=lambda r: r["mode"]):
+        groups.setdefault(r["mode"], []).append(r)
+    groups["ALL"] = records
+
+    summary = []
+    for mode, group in groups.items():
+        ok = [r for r in group if not r["error"]]
+        e2e = [r["e2e"] for r in ok]
+        ttfts = [r["ttft"] for r in ok if r.get("ttft") is not None]
+        queue = [max(r["ttft"] - baseline.get(r["mode"], 0.0), 0.0)
+                 for r in ok if r.get("ttft") is not None]
+        violations = sum(
+            1 for r in group
+            if r["error"] or r["e2e"] > slo
+            or (ttft_slo is not None and (r.get("ttft") is None or r["ttft"] > ttft_slo))
+        )
+        span = wall or (max((r["offset"] + r["e2e"] for r in group), default=0.0))
+        summary.append({
+            "mode": mode,
+            "requests": len(group),
+            "errors": len(group) - len(ok),
+            "throughput": len(ok) / span if span else 0.0,
+            "e2e_p50": percentile(e2e, 0.5),
+            "e2e_p95": percentile(e2e, 0.95),
+            "e2e_p99": percentile(e2e, 0.99),
+            "ttft_p50": percentile(ttfts, 0.5),
+            "ttft_p95": percentile(ttfts, 0.95),
+            "queue_p50": percentile(queue, 0.5),
+            "queue_p95": percentile(queue, 0.95),
+            "queue_max": max(queue) if queue else None,
+            "slo_violation_rate": violations / len(group) if group else 0.0,
+        })
+    return summary
+
+
+def _fmt(value, spec=".3f", suffix="s"):
+    return "—" if value is None else f"{value:{spec}}{suffix}"
+
+
+def print_summary(summary, slo, ttft_slo=None):
+    try:
+        from tabulate import tabulate
+    except ImportError:
+        tabulate = None
+
+    headers = ["Mode", "Requests", "Errors", "Req/s", "E2E p50", "E2E p95", "E2E p99",
+               "TTFT p50", "TTFT p95", "Queue p50", "Queue p95", "Queue max", "SLO viol."]
+    rows = [[
+        s["mode"], s["requests"], s["errors"], f"{s['throughput']:.2f}",
+        _fmt(s["e2e_p50"]), _fmt(s["e2e_p95"]), _fmt(s["e2e_p99"]),
+        _fmt(s["ttft_p50"]), _fmt(s["ttft_p95"]),
+        _fmt(s["queue_p50"]), _fmt(s["queue_p95"]), _fmt(s["queue_max"]),
+        f"{s['slo_violation_rate']:.1%}",
+    ] for s in summary]
+
+    slo_text = f"E2E ≤ {slo}s" + (f", TTFT ≤ {ttft_slo}s" if ttft_slo is not None else "")
+    print(f"\n{'='*70}")
+    print(f"  LOAD TEST RESULTS (SLO: {slo_text})")
+    print(f"{'='*70}")
+    if tabulate:
+        print(tabulate(rows, headers=headers, tablefmt="grid"))
+    else:
+        for row in [headers] + rows:
+            print("  ".join(str(c) for c in row))
+
+
+# ─── Main ─────────────────────────────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop load test with Poisson or trace-driven arrivals")
+    parser.add_argument("--url", type=str, default="http://localhost:8080", help="Swama server URL")
+    parser.add_argument("--model", type=str, default=DEFAULT_MODEL, help="Model ID to request")
+    parser.add_argument("--rate", type=float, default=0.5, help="Poisson arrival rate (requests/second)")
+    parser.add_argument("--duration", type=float, default=None, help="Stop scheduling arrivals after this many seconds")
+    parser.add_argument("--requests", type=int, default=None, help="Number of arrivals (default 100 unless --duration)")
+    parser.add_argument("--arrivals", type=str, default=None,
+                        help="Replay arrival times from a file (seconds per line, or a --trace JSON)")
+    parser.add_argument("--speedup", type=float, default=1.0, help="Compress replayed arrivals by this factor")
+    parser.add_argument("--modes", nargs="+", choices=list(MODE_VARIANTS), default=None,
+                        help="Modes to draw samples from (default: all)")
+    parser.add_argument("--variant", type=str, action="append", default=[],
+                        help="Variant for a mode as mode=name (default: each mode's lead variant)")
+    parser.add_argument("--slo", type=float, default=2.0, help="End-to-end latency SLO in seconds")
+    parser.add_argument("--ttft-slo", type=float, default=None, help="Optional TTFT SLO in seconds")
+    parser.add_argument("--warmup", type=int, default=3,
+                        help="Sequential requests per mode to measure unloaded TTFT (0 = assume 0)")
+    parser.add_argument("--max-in-flight", type=int, default=64, help="Client-side concurrency cap")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for arrivals and sample choice")
+    parser.add_argument("--output", type=str, default=None, help="Save per-request records and summary (JSON)")
+    parser.add_argument("--token-policy", choices=TOKEN_POLICIES, default="fixed",
+                        help="max_tokens/stop sequences: fixed 512 (default) or sized by input length")
+    parser.add_argument("--stub", action="store_true", help="Start an in-process Swama stub on --url's port")
+    parser.add_argument("--stub-speed", type=float, default=1.0, help="Stub delay multiplier (with --stub)")
+    parser.add_argument("--stub-slots", type=int, default=1, help="Stub concurrent slots (with --stub)")
+    args = parser.parse_args()
+
+    variant_names = {}
+    for spec in args.variant:
+        mode, _, name = spec.partition("=")
+        if mode not in MODE_VARIANTS or not name:
+            print(f"ERROR: --variant must be mode=name with mode one of {', '.join(MODE_VARIANTS)}")
+            sys.exit(1)
+        variant_names[mode] = name
+
+    try:
+        items = build_workload(args.modes, variant_names)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+    for item in items:
+        item["limits"] = generation_limits(item["mode"], item["source"], args.token_policy)
+
+    if args.arrivals:
+        offsets = load_arrivals(args.arrivals, args.speedup)
+        if args.requests:
+            offsets = offsets[:args.requests]
+        source = f"trace {args.arrivals} (×{args.speedup})"
+    else:
+        count = args.requests or (None if args.duration else 100)
+        offsets = poisson_arrivals(args.rate, count, args.duration, args.seed)
+        source = f"Poisson λ={args.rate}/s"
+    if not offsets:
+        print("ERROR: no arrivals to replay")
+        sys.exit(1)
+
+    stub = None
+    if args.stub:
+        from urllib.parse import urlparse
+        import swama_stub
+        port = urlparse(args.url).port or 8080
+        stub = swama_stub.serve(port, speed=args.stub_speed, slots=args.stub_slots, seed=args.seed)
+        print(f"Started Swama stub on port {port} (speed ×{args.stub_speed}, {args.stub_slots} slot(s))")
+
+    modes = sorted({item["mode"] for item in items})
+    print(f"Workload: {len(items)} samples across {', '.join(modes)}")
+    print(f"Arrivals: {len(offsets)} over {offsets[-1]:.1f}s — {source}")
+
+    baseline = {}
+    if args.warmup:
+        print(f"Measuring unloaded TTFT ({args.warmup} sequential requests per mode)...")
+        baseline = measure_unloaded_ttft(items, args.url, args.model, args.warmup)
+        for mode in modes:
+            print(f"  {mode:14s} {baseline[mode] * 1000:.0f}ms")
+
+    print("Running load...")
+    start = time.perf_counter()
+    records = run_load(items, offsets, args.url, args.model, args.max_in_flight, args.seed)
+    wall = time.perf_counter() - start
+
+    summary = summarize(records, baseline, args.slo, args.ttft_slo, wall)
+    print_summary(summary, args.slo, args.ttft_slo)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "server_url": args.url,
+                "arrivals": source,
+                "slo": args.slo,
+                "ttft_slo": args.ttft_slo,
+                "unloaded_ttft": baseline,
+                "summary": summary,
+                "requests": records,
+            }, f, indent=2)
+        print(f"\nResults saved to: {args.output}")
+
+    if stub:
+        stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+long_doc_bench.py — How rewrite latency and truncation scale with document length.
+
+Every sample in the repo is a sentence to a paragraph, but ProseKit gets run
+on long emails and docs. This builds a benchmark corpus of longer inputs out
+of the existing samples — 50 to 5,000 words by default, paragraphs of a few
+samples separated by blank lines, shuffled deterministically (--seed) — and
+sends each document through the mode's prompt variant with the harnesses'
+max_tokens (512, as in call_swama). Per mode and document size it reports:
+
+  - latency (mean, max), TTFT and decode tokens/sec
+  - truncation: the share of documents whose output stopped at max_tokens
+    (finish_reason "length"), and output words / input words — a rewrite
+    that was cut off covers only the start of the document
+
+followed by, per mode, where output starts getting cut off (the smallest
+size with a truncated document and how many output words fit under the cap)
+and how latency scales with length: a least-squares fit of latency against
+input words over the documents that finished, i.e. seconds per extra 1,000
+words.
+
+Requests are streamed; run against the stub (--stub) to check the tooling.
+
+Usage:
+    python long_doc_bench.py --modes grammar concise
+    python long_doc_bench.py --sizes 100 1000 3000 --docs 3 --output long.json
+    python long_doc_bench.py --save-corpus long_corpus.jsonl --corpus-only
+    python long_doc_bench.py --stub --stub-speed 0.01
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+
+from eval_prompts import clean_response
+from latency_breakdown import fit_linear
+from load_test import MODE_VARIANTS, build_workload, find_variant
+from swama_client import DEFAULT_MODEL, complete
+
+SIZES = (50, 100, 250, 500, 1000, 2500, 5000)
+MAX_TOKENS = 512
+SAMPLES_PER_PARAGRAPH = 3
+
+
+# ─── Corpus ──────────────────────────────────────────────────────────────────
+
+def build_document(sources, words, rng):
+    """
+    A document of about `words` words: whole samples in random order (the pool
+    is reshuffled each time it runs out), SAMPLES_PER_PARAGRAPH per paragraph.
+    """
+    paragraphs = []
+    current = []
+    count = 0
+    pool = []
+    while count < words:
+        if not pool:
+            pool = list(sources)
+            rng.shuffle(pool)
+        source = pool.pop()
+        current.append(source)
+        count += len(source.split())
+        if len(current) == SAMPLES_PER_PARAGRAPH:
+            paragraphs.append(" ".join(current))
+            current = []
+    if current:
+        paragraphs.append(" ".join(current))
+    return "\n\n".join(paragraphs)
+
+
+def build_corpus(modes=None, sizes=SIZES, docs=2, seed=0):
+    """
+    Documents for every (mode, size): dicts with mode, size, doc (index),
+    words and text. Built from the builtin (grammar) and style samples.
+    """
+    sources = {}
+    for item in build_workload(modes):
+        sources.setdefault(item["mode"], []).append(item["source"])
+    corpus = []
+    for mode in modes or list(MODE_VARIANTS):
+        for size in sizes:
+            for doc in range(docs):
+                rng = random.Random(f"{seed}:{mode}:{size}:{doc}")
+                text = build_document(sources[mode], size, rng)
+                corpus.append({"mode": mode, "size": size, "doc": doc,
+                               "words": len(text.split()), "text": text})
+    return corpus
+
+
+# ─── Running ─────────────────────────────────────────────────────────────────
+
+def run_document(item, variant, base_url, model=DEFAULT_MODEL, max_tokens=MAX_TOKENS, timeout=600):
+    """Rewrite one document; returns a measurement dict (with "error" on failure)."""
+    record = {"mode": item["mode"], "size": item["size"], "doc": item["doc"],
+              "words": item["words"], "variant": variant["name"]}
+    try:
+        result = complete(item["text"], variant["system_prompt"], variant["temperature"], base_url,
+                          model=model, max_tokens=max_tokens, stream=True, timeout=timeout)
+    except Exception as e:
+        record["error"] = str(e)
+        return record
+
+    output = clean_response(result["text"])
+    decode_time = result["latency"] - (result["ttft"] or 0.0)
+    tokens = result["completion_tokens"] or 0
+    record.update({
+        "latency": result["latency"],
+        "ttft": result["ttft"],
+        "prompt_tokens": result["prompt_tokens"],
+        "completion_tokens": tokens,
+        "tokens_per_sec": tokens / decode_time if decode_time > 0 else None,
+        "finish_reason": result["finish_reason"],
+        "truncated": result["finish_reason"] == "length",
+        "output_words": len(output.split()),
+        "coverage": len(output.split()) / item["words"] if item["words"] else None,
+    })
+    return record
+
+
+def run_corpus(corpus, variants, base_url, model=DEFAULT_MODEL, max_tokens=MAX_TOKENS):
+    results = []
+    for item in corpus:
+        print(f"  {item['mode']:13s} {item['words']:>6,d} words (doc {item['doc']}) ...", end=" ", flush=True)
+        record = run_document(item, variants[item["mode"]], base_url, model, max_tokens)
+        results.append(record)
+        if record.get("error"):
+            print(f"ERROR: {record['error']}")
+        else:
+            print(f"{record['latency']:.2f}s, {record['completion_tokens']} tokens"
+                  + (" (truncated)" if record["truncated"] else ""))
+    return results
+
+
+# ─── Analysis ────────────────────────────────────────────────────────────────
+
+def _mean(values):
+    values = [v for v in values if v is not None]
+    return sum(values) / len(values) if values else None
+
+
+def size_rows(results):
+    """Aggregates per (mode, size), in run order."""
+    groups = {}
+    for r in results:
+        groups.setdefault((r["mode"], r["size"]), []).append(r)
+    rows = []
+    for (mode, size), records in groups.items():
+        ok = [r for r in records if not r.get("error")]
+        rows.append({
+            "mode": mode,
+            "size": size,
+            "docs": len(records),
+            "errors": len(records) - len(ok),
+            "words": _mean([r["words"] for r in records]),
+            "prompt_tokens": _mean([r["prompt_tokens"] for r in ok]),
+            "mean_latency": _mean([r["latency"] for r in ok]),
+            "max_latency": max((r["latency"] for r in ok), default=None),
+            "ttft": _mean([r["ttft"] for r in ok]),
+            "tokens_per_sec": _mean([r["tokens_per_sec"] for r in ok]),
+            "truncation_rate": sum(1 for r in ok if r["truncated"]) / len(ok) if ok else None,
+            "coverage": _mean([r["coverage"] for r in ok]),
+        })
+    return rows
+
+
+def mode_scaling(results, mode):
+    """
+    Cut-off and scaling for one mode: smallest truncated size, mean output
+    words of truncated documents, and the latency ~ words fit over finished ones.
+    """
+    ok = [r for r in results if r["mode"] == mode and not r.get("error")]
+    truncated = [r for r in ok if r["truncated"]]
+    finished = [r for r in ok if not r["truncated"]]
+    fit = fit_linear([[r["words"]] for r in finished], [r["latency"] for r in finished])
+    return {
+        "first_truncated_size": min((r["size"] for r in truncated), default=None),
+        "largest_finished_words": max((r["words"] for r in finished), default=None),
+        "cutoff_output_words": _mean([r["output_words"] for r in truncated]),
+        "seconds_per_1000_words": fit[0][1] * 1000 if fit else None,
+        "intercept": fit[0][0] if fit else None,
+        "r2": fit[1] if fit else None,
+    }
+
+
+# ─── Reporting ───────────────────────────────────────────────────────────────
+
+def print_report(results, max_tokens=MAX_TOKENS):
+    try:
+        from tabulate import tabulate
+    except ImportError:
+        tabulate = None
+
+    def fmt(value, spec, suffix=""):
+        return f"{value:{spec}}{suffix}" if value is not None else "—"
+
+    rows = size_rows(results)
+    headers = ["Mode", "Size", "Words", "Prompt tok", "Mean lat", "Max lat", "TTFT",
+               "Tok/s", "Truncated", "Out/in words", "Errors"]
+    table = [[
+        r["mode"], r["size"], fmt(r["words"], ",.0f"), fmt(r["prompt_tokens"], ",.0f"),
+        fmt(r["mean_latency"], ".2f", "s"), fmt(r["max_latency"], ".2f", "s"),
+        fmt(r["ttft"], ".2f", "s"), fmt(r["tokens_per_sec"], ".1f"),
+        fmt(r["truncation_rate"], ".0%"), fmt(r["coverage"], ".2f"), r["errors"],
+    ] for r in rows]
+
+    print(f"\n{'='*70}")
+    print(f"  LONG-DOCUMENT SCALING (max_tokens={max_tokens})")
+    print(f"{'='*70}")
+    if tabulate:
+        print(tabulate(table, headers=headers, tablefmt="grid"))
+    else:
+        for row in [headers] + table:
+            print("  ".join(str(c) for c in row))
+
+    for mode in dict.fromkeys(r["mode"] for r in rows):
+        s = mode_scaling(results, mode)
+        print(f"\n  {mode}:")
+        if s["first_truncated_size"] is None:
+            print(f"    no truncation up to {fmt(s['largest_finished_words'], ',.0f')} words")
+        else:
+            print(f"    output cut off from {s['first_truncated_size']:,}-word documents: "
+                  f"~{s['cutoff_output_words']:.0f} words fit in {max_tokens} tokens")
+        if s["seconds_per_1000_words"] is not None:
+            print(f"    latency ≈ {s['intercept']:.2f}s + {s['seconds_per_1000_words']:.2f}s per 1,000 words "
+                  f"(untruncated documents, R² {s['r2']:.2f})")
+
+
+# ─── Main ─────────────────────────────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description="Rewrite latency and truncation on long documents")
+    parser.add_argument("--url", type=str, default="http://localhost:8080", help="Swama server URL")
+    parser.add_argument("--model", type=str, default=DEFAULT_MODEL, help="Model ID to request")
+    parser.add_argument("--modes", nargs="+", choices=list(MODE_VARIANTS), default=None,
+                        help="Modes to benchmark (default: all)")
+    parser.add_argument("--variant", type=str, action="append", default=[],
+                        help="Variant for a mode as mode=name (default: each mode's lead variant)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES),
+                        help="Document sizes in words")
+    parser.add_argument("--docs", type=int, default=2, help="Documents per mode and size")
+    parser.add_argument("--max-tokens", type=int, default=MAX_TOKENS,
+                        help="max_tokens per request (default: 512, as in call_swama)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for document assembly")
+    parser.add_argument("--save-corpus", type=str, default=None, help="Write the generated documents (JSONL)")
+    parser.add_argument("--corpus-only", action="store_true", help="Only generate the corpus; send nothing")
+    parser.add_argument("--output", type=str, default=None, help="Save per-document results (JSON)")
+    parser.add_argument("--stub", action="store_true", help="Start an in-process Swama stub on --url's port")
+    parser.add_argument("--stub-speed", type=float, default=1.0, help="Stub delay multiplier (with --stub)")
+    args = parser.parse_args()
+
+    variants = {}
+    for mode in args.modes or list(MODE_VARIANTS):
+        variants[mode] = None
+    for spec in args.variant:
+        mode, _, name = spec.partition("=")
+        if mode not in MODE_VARIANTS or not name:
+            print(f"ERROR: --variant must be mode=name with mode one of {', '.join(MODE_VARIANTS)}")
+            sys.exit(1)
+        variants[mode] = name
+    try:
+        variants = {mode: find_variant(mode, name) for mode, name in variants.items()}
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+
+    corpus = build_corpus(list(variants), sorted(args.sizes), args.docs, args.seed)
+    if args.save_corpus:
+        with open(args.save_corpus, "w", encoding="utf-8") as f:
+            for item in corpus:
+                f.write(json.dumps(item) + "\n")
+        print(f"Corpus ({len(corpus)} documents) written to: {args.save_corpus}")
+    if args.corpus_only:
+        return
+
+    stub = None
+    if args.stub:
+        from urllib.parse import urlparse
+        import swama_stub
+        port = urlparse(args.url).port or 8080
+        stub = swama_stub.serve(port, speed=args.stub_speed)
+        print(f"Started Swama stub on port {port} (speed ×{args.stub_speed})")
+
+    names = ", ".join(f"{m}={v['name']}" for m, v in variants.items())
+    print(f"Rewriting {len(corpus)} documents ({names})")
+    results = run_corpus(corpus, variants, args.url, args.model, args.max_tokens)
+    print_report(results, args.max_tokens)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "server_url": args.url,
+                "model": args.model,
+                "max_tokens": args.max_tokens,
+                "variants": {m: v["name"] for m, v in variants.items()},
+                "sizes": size_rows(results),
+                "scaling": {m: mode_scaling(results, m) for m in variants},
+                "documents": results,
+            }, f, indent=2)
+        print(f"\nResults saved to: {args.output}")
+
+    if stub:
+        stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+memprofile.py — tracemalloc checkpoints for large evaluation runs.
+
+The harnesses' --memprofile flag starts tracemalloc before samples are
+loaded and takes a checkpoint at each stage boundary (samples loaded, each
+variant finished, results written):
+
+    import memprofile
+
+    memprofile.start()
+    samples = load_jfleg(...)
+    memprofile.checkpoint("samples loaded")
+    ...
+    memprofile.finish()
+
+At the end it prints, per stage, the traced memory still held, how much the
+stage added, the stage's own peak (tracemalloc's peak is reset at every
+checkpoint) and the process's peak RSS so far, followed by the allocation
+sites holding the most memory and the sites that grew most in the stage
+that grew most.
+
+Checkpoints are no-ops unless start() was called. Tracing slows Python code
+down noticeably, so use it to see where memory goes, not for timing.
+"""
+
+import sys
+import tracemalloc
+
+ENABLED = False
+
+_stages = []       # dicts: label, current, delta, peak, rss, top_growth
+_previous = None   # last snapshot, for per-stage growth
+
+
+def _filtered(snapshot):
+    return snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    ))
+
+
+def peak_rss():
+    """Peak resident set size of this process in bytes (None where unavailable)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kilobytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def format_bytes(n):
+    if n is None:
+        return "—"
+    sign = "-" if n < 0 else ""
+    n = abs(n)
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{sign}{n:.0f}{unit}" if unit == "B" else f"{sign}{n:.1f}{unit}"
+        n /= 1024
+
+
+def start(frames=1):
+    """Start tracing; the first checkpoint is taken immediately."""
+    global ENABLED, _previous
+    _stages.clear()
+    _previous = None
+    tracemalloc.start(frames)
+    ENABLED = True
+    checkpoint("start")
+
+
+def checkpoint(label, top=5):
+    """Record memory at a stage boundary (no-op unless start() was called)."""
+    global _previous
+    if not ENABLED:
+        return
+    current, peak = tracemalloc.get_traced_memory()
+    snapshot = _filtered(tracemalloc.take_snapshot())
+    growth = []
+    if _previous is not None:
+        growth = [stat for stat in snapshot.compare_to(_previous, "lineno")[:top]
+                  if stat.size_diff > 0]
+    previous_current = _stages[-1]["current"] if _stages else 0
+    _stages.append({
+        "label": label,
+        "current": current,
+        "delta": current - previous_current,
+        "peak": peak,
+        "rss": peak_rss(),
+        "top_growth": [(str(stat.traceback), stat.size_diff, stat.count_diff) for stat in growth],
+    })
+    _previous = snapshot
+    tracemalloc.reset_peak()
+
+
+def finish(top=10):
+    """Take a final checkpoint, stop tracing and print the report."""
+    global ENABLED, _previous
+    if not ENABLED:
+        return
+    checkpoint("end")
+    final = _previous
+    ENABLED = False
+    _previous = None
+    tracemalloc.stop()
+
+    print(f"\n{'='*70}")
+    print("  MEMORY BY STAGE (tracemalloc)")
+    print(f"{'='*70}")
+    print(f"  {'Stage':40s} {'Held':>10s} {'Δ':>10s} {'Stage peak':>11s} {'Peak RSS':>10s}")
+    for stage in _stages:
+        print(f"  {stage['label'][:40]:40s} {format_bytes(stage['current']):>10s} "
+              f"{format_bytes(stage['delta']):>10s} {format_bytes(stage['peak']):>11s} "
+              f"{format_bytes(stage['rss']):>10s}")
+    overall_peak = max(stage["peak"] for stage in _stages)
+    print(f"\n  Peak traced: {format_bytes(overall_peak)}   Peak RSS: {format_bytes(peak_rss())}")
+
+    print(f"\n  Top {top} allocation sites still held at the end:")
+    for stat in final.statistics("lineno")[:top]:
+        print(f"    {format_bytes(stat.size):>10s}  {stat.count:>9,d} blocks  {stat.traceback}")
+
+    grew = max(_stages, key=lambda s: s["delta"])
+    if grew["top_growth"]:
+        print(f"\n  Largest growth: '{grew['label']}' (+{format_bytes(grew['delta'])}):")
+        for site, size, count in grew["top_growth"]:
+            print(f"    +{format_bytes(size):>9s}  {count:>+9,d} blocks  {site}")
@@ -0,0 +1,202 @@
+"""
+metrics_exporter.py — Live Prometheus metrics for long-running eval and soak jobs.
+
+Updated incrementally from the harnesses' per-sample on_result hook, so
+progress can be watched while an overnight run is still going instead of
+waiting for the final JSON. Two ways to expose the metrics (either or both):
+
+  - an HTTP endpoint serving /metrics (--metrics-port 9109), for Prometheus
+    to scrape directly. It listens on 127.0.0.1 only; pass --metrics-host
+    0.0.0.0 (or an interface address) to scrape from another machine
+  - a textfile for node_exporter's textfile collector (--metrics-textfile
+    /var/lib/node_exporter/prosekit_eval.prom), rewritten atomically at most
+    once per second and at the end of the run
+
+Exposed series (labels: variant, mode):
+  prosekit_eval_requests_total              counter   samples attempted
+  prosekit_eval_errors_total                counter   samples that errored
+  prosekit_eval_request_latency_seconds     histogram per-request latency
+  prosekit_eval_completion_tokens_total     counter   generated tokens (when reported)
+  prosekit_eval_tokens_per_second           gauge     generated tokens / latency over the rolling window
+  prosekit_eval_rolling_gleu                gauge     mean GLEU over the last N scored samples
+  prosekit_eval_progress_ratio              gauge     samples done / samples planned
+
+No client library is needed; the text exposition format is written directly.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_HOST = "127.0.0.1"
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0, 30.0, 60.0)
+ROLLING_WINDOW = 50
+
+
+def _labels(variant, mode):
+    return f'variant="{variant}",mode="{mode}"'
+
+
+class MetricsExporter:
+    def __init__(self, port=None, textfile=None, window=ROLLING_WINDOW, host=DEFAULT_HOST):
+        self.textfile = textfile
+        self.window = window
+        self.lock = threading.Lock()
+        self.series = {}  # (variant, mode) → per-variant state
+        self.last_write = 0.0
+        self.server = None
+
+        if port:
+            exporter = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.rstrip("/") not in ("/metrics", ""):
+                        self.send_error(404)
+                        return
+                    body = exporter.render().encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, *args):
+                    pass
+
+            self.server = ThreadingHTTPServer((host, port), Handler)
+            thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+            thread.start()
+            print(f"  Metrics endpoint: http://{host}:{port}/metrics")
+
+    def _state(self, variant, mode):
+        key = (variant, mode)
+        if key not in self.series:
+            self.series[key] = {
+                "requests": 0,
+                "errors": 0,
+                "planned": 0,
+                "buckets": [0] * len(LATENCY_BUCKETS),
+                "latency_sum": 0.0,
+                "latency_count": 0,
+                "tokens": 0,
+                "gleu": deque(maxlen=self.window),
+                "throughput": deque(maxlen=self.window),  # (tokens, latency)
+            }
+        return self.series[key]
+
+    # ─── Updates ─────────────────────────────────────────────────────────
+
+    def begin_variant(self, variant, mode, planned):
+        """Declare how many samples a variant will run (for progress)."""
+        with self.lock:
+            self._state(variant, mode)["planned"] += planned
+        self._maybe_write()
+
+    def observe(self, variant, mode, detail):
+        """Update from one per-sample detail dict (the harness on_result hook)."""
+        with self.lock:
+            s = self._state(variant, mode)
+            s["requests"] += 1
+            if detail.get("error"):
+                s["errors"] += 1
+            else:
+                latency = detail.get("latency")
+                if latency is not None:
+                    s["latency_sum"] += latency
+                    s["latency_count"] += 1
+                    for i, upper in enumerate(LATENCY_BUCKETS):
+                        if latency <= upper:
+                            s["buckets"][i] += 1
+                tokens = detail.get("completion_tokens")
+                if tokens is not None:
+                    s["tokens"] += tokens
+                    if latency:
+                        s["throughput"].append((tokens, latency))
+                if detail.get("gleu") is not None:
+                    s["gleu"].append(detail["gleu"])
+        self._maybe_write()
+
+    # ─── Rendering ───────────────────────────────────────────────────────
+
+    def render(self):
+        """Render all series in the Prometheus text exposition format."""
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self.lock:
+            items = sorted(self.series.items())
+
+            family("prosekit_eval_requests_total", "counter", "Samples attempted.")
+            for (variant, mode), s in items:
+                lines.append(f"prosekit_eval_requests_total{{{_labels(variant, mode)}}} {s['requests']}")
+
+            family("prosekit_eval_errors_total", "counter", "Samples whose request failed.")
+            for (variant, mode), s in items:
+                lines.append(f"prosekit_eval_errors_total{{{_labels(variant, mode)}}} {s['errors']}")
+
+            family("prosekit_eval_request_latency_seconds", "histogram", "Per-request latency.")
+            for (variant, mode), s in items:
+                labels = _labels(variant, mode)
+                # observe() increments every bucket whose bound covers the
+                # latency, so the stored counts are already cumulative
+                for upper, count in zip(LATENCY_BUCKETS, s["buckets"]):
+                    lines.append(
+                        f'prosekit_eval_request_latency_seconds_bucket{{{labels},le="{upper}"}} {count}'
+                    )
+                lines.append(
+                    f'prosekit_eval_request_latency_seconds_bucket{{{labels},le="+Inf"}} {s["latency_count"]}'
+                )
+                lines.append(f"prosekit_eval_request_latency_seconds_sum{{{labels}}} {s['latency_sum']:.6f}")
+                lines.append(f"prosekit_eval_request_latency_seconds_count{{{labels}}} {s['latency_count']}")
+
+            family("prosekit_eval_completion_tokens_total", "counter", "Generated tokens (when reported).")
+            for (variant, mode), s in items:
+                lines.append(f"prosekit_eval_completion_tokens_total{{{_labels(variant, mode)}}} {s['tokens']}")
+
+            family("prosekit_eval_tokens_per_second", "gauge",
+                   f"Generated tokens per second over the last {self.window} requests.")
+            for (variant, mode), s in items:
+                tokens = sum(t for t, _ in s["throughput"])
+                seconds = sum(l for _, l in s["throughput"])
+                rate = tokens / seconds if seconds else 0.0
+                lines.append(f"prosekit_eval_tokens_per_second{{{_labels(variant, mode)}}} {rate:.4f}")
+
+            family("prosekit_eval_rolling_gleu", "gauge",
+                   f"Mean GLEU over the last {self.window} scored samples.")
+            for (variant, mode), s in items:
+                if s["gleu"]:
+                    mean = sum(s["gleu"]) / len(s["gleu"])
+                    lines.append(f"prosekit_eval_rolling_gleu{{{_labels(variant, mode)}}} {mean:.6f}")
+
+            family("prosekit_eval_progress_ratio", "gauge", "Samples done / samples planned.")
+            for (variant, mode), s in items:
+                if s["planned"]:
+                    ratio = s["requests"] / s["planned"]
+                    lines.append(f"prosekit_eval_progress_ratio{{{_labels(variant, mode)}}} {ratio:.4f}")
+
+        return "\n".join(lines) + "\n"
+
+    def _maybe_write(self, force=False):
+        if not self.textfile:
+            return
+        now = time.time()
+        if not force and now - self.last_write < 1.0:
+            return
+        self.last_write = now
+        tmp = f"{self.textfile}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(self.render())
+        os.replace(tmp, self.textfile)
+
+    def close(self):
+        """Write the final textfile and stop the HTTP endpoint."""
+        self._maybe_write(force=True)
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
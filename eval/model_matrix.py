@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+model_matrix.py — The same variants and samples across several local models, with the quality/latency Pareto frontier.
+
+Every harness requests mlx-community/Qwen3-8B-4bit. Which model to ship
+for 8 GB machines (4B vs 8B, 4-bit vs 8-bit) comes down to how much
+quality each one gives up for how much latency, so this runs one set of
+variants — --variant mode=name, repeatable; default each mode's lead
+variant — over the builtin (Grammar) and style samples once per model in
+--models, streamed, and reports per model and variant:
+
+  - quality: GLEU for Grammar, the composite score for the style modes
+  - mean and p95 latency, mean TTFT
+  - decode tokens/sec: completion tokens over the time after the first token
+
+and, per mode, the Pareto frontier of quality vs p95 latency: the (model,
+variant) pairs no other pair beats on both. A last frontier compares the
+models over everything they ran (mean of their mode scores vs p95 over
+all requests).
+
+A model spec is a model ID, or ID@URL when the models are served by
+separate servers (default: --url). Swama loads a model on its first
+request, so each model gets --warmup untimed requests before its run.
+--layout and --token-policy work as in the harnesses (the runs go
+through variant_eval.evaluate()).
+With --stub, a Swama stub is started on each distinct server port.
+
+Usage:
+    python model_matrix.py --models mlx-community/Qwen3-4B-4bit mlx-community/Qwen3-8B-4bit
+    python model_matrix.py --models mlx-community/Qwen3-4B-8bit mlx-community/Qwen3-8B-4bit \\
+        --variant grammar=v8_minimal_diff --variant casual=casual_v7_friend_preserve --samples 20
+    python model_matrix.py --models a@http://localhost:8081 b@http://localhost:8082 --stub --output matrix.json
+"""
+
+import argparse
+import json
+import sys
+import time
+
+from load_test import MODE_VARIANTS, find_variant
+from run_store import percentile
+from swama_client import DEFAULT_LAYOUT, DEFAULT_MODEL, MESSAGE_LAYOUTS, complete
+from token_policy import TOKEN_POLICIES
+from variant_eval import evaluate, load_samples
+
+
+# ─── Setup ───────────────────────────────────────────────────────────────────
+
+def parse_model(spec, default_url):
+    """(model ID, server URL) from "ID" or "ID@URL"."""
+    model, sep, url = spec.partition("@")
+    return model, (url if sep else default_url)
+
+
+def warm_up(model, base_url, variant, source, count, layout=DEFAULT_LAYOUT):
+    """Untimed requests so the server has the model loaded before timing."""
+    for _ in range(count):
+        try:
+            complete(source, variant["system_prompt"], variant["temperature"], base_url,
+                     model=model, max_tokens=8, layout=layout)
+        except Exception as e:
+            print(f"  warm-up failed: {e}")
+            return False
+    return True
+
+
+# ─── Matrix ──────────────────────────────────────────────────────────────────
+
+def summarize(model, mode, result):
+    """One matrix row from an evaluate() result."""
+    metrics = result["metrics"]
+    scored = [d for d in result["details"] if not d.get("error")]
+    latencies = [d["latency"] for d in scored]
+    ttfts = [d["ttft"] for d in scored if d.get("ttft") is not None]
+    decoded = [(d["completion_tokens"], d["latency"] - d["ttft"]) for d in scored
+               if d.get("completion_tokens") and d.get("ttft") is not None]
+    decode_time = sum(seconds for _, seconds in decoded)
+    return {
+        "model": model,
+        "mode": mode,
+        "variant": metrics["variant"],
+        "samples": len(scored),
+        "errors": metrics["errors"],
+        "quality": metrics.get("avg_gleu") if mode == "grammar" else metrics.get("composite"),
+        "avg_latency": sum(latencies) / len(latencies) if latencies else None,
+        "p95_latency": percentile(latencies, 0.95),
+        "avg_ttft": sum(ttfts) / len(ttfts) if ttfts else None,
+        "tokens_per_sec": sum(tokens for tokens, _ in decoded) / decode_time if decode_time > 0 else None,
+    }
+
+
+def run_matrix(models, variants, samples_by_mode, warmup=1, layout=DEFAULT_LAYOUT, token_policy="fixed"):
+    """
+    Every variant over its mode's samples once per (model, url) in models,
+    with the harnesses' layout and token_policy settings. Returns (rows,
+    details) with details keyed "model|mode|variant".
+    """
+    rows = []
+    details = {}
+    for model, base_url in models:
+        print(f"\n{'='*60}")
+        print(f"  Model: {model} ({base_url})")
+        print(f"{'='*60}")
+        first_mode, first_variants = next(iter(variants.items()))
+        if warmup and not warm_up(model, base_url, first_variants[0],
+                                  samples_by_mode[first_mode][0]["source"], warmup, layout):
+            continue
+        for mode, mode_variants in variants.items():
+            for variant in mode_variants:
+                result = evaluate(mode, variant["name"], variant["temperature"], samples_by_mode[mode],
+                                  lambda i, sample, variant=variant: (variant["system_prompt"], {}),
+                                  base_url, model, layout=layout, token_policy=token_policy)
+                rows.append(summarize(model, mode, result))
+                details[f"{model}|{mode}|{variant['name']}"] = result["details"]
+    return rows, details
+
+
+def model_rows(rows, details):
+    """Per-model rows over everything the model ran: mean of the mode scores, p95 over all requests."""
+    overall = []
+    for model in dict.fromkeys(r["model"] for r in rows):
+        mine = [r for r in rows if r["model"] == model and r["quality"] is not None]
+        if not mine:
+            continue
+        latencies = [d["latency"] for key, group in details.items() if key.split("|")[0] == model
+                     for d in group if not d.get("error")]
+        overall.append({
+            "model": model,
+            "mode": "all",
+            "variant": f"{len(mine)} variants",
+            "quality": sum(r["quality"] for r in mine) / len(mine),
+            "p95_latency": percentile(latencies, 0.95),
+        })
+    return overall
+
+
+def pareto_frontier(rows):
+    """
+    Rows not dominated on (quality ↑, p95 latency ↓): no other row is at
+    least as good on both and better on one. Sorted by p95 latency.
+    """
+    points = [r for r in rows if r["quality"] is not None and r["p95_latency"] is not None]
+    frontier = [r for r in points if not any(
+        o["quality"] >= r["quality"] and o["p95_latency"] <= r["p95_latency"]
+        and (o["quality"] > r["quality"] or o["p95_latency"] < r["p95_latency"])
+        for o in points)]
+    return sorted(frontier, key=lambda r: r["p95_latency"])
+
+
+# ─── Reporting ───────────────────────────────────────────────────────────────
+
+def print_report(rows, overall):
+    try:
+        from tabulate import tabulate
+    except ImportError:
+        tabulate = None
+
+    def fmt(value, spec, suffix="", scale=1):
+        return f"{value * scale:{spec}}{suffix}" if value is not None else "—"
+
+    def show(headers, table):
+        if tabulate:
+            print(tabulate(table, headers=headers, tablefmt="grid"))
+        else:
+            for row in [headers] + table:
+                print("  ".join(str(c) for c in row))
+
+    print(f"\n{'='*70}")
+    print("  MODEL MATRIX")
+    print(f"{'='*70}")
+    show(["Model", "Mode", "Variant", "Quality", "Avg latency", "P95 latency", "Avg TTFT", "Tok/s", "Errors"],
+         [[r["model"], r["mode"], r["variant"], fmt(r["quality"], ".4f"), fmt(r["avg_latency"], ".2f", "s"),
+           fmt(r["p95_latency"], ".2f", "s"), fmt(r["avg_ttft"], ".0f", "ms", 1000),
+           fmt(r["tokens_per_sec"], ".1f"), r["errors"]] for r in rows])
+    print("  Quality: GLEU for Grammar, composite for the style modes. Tok/s: decode only (after TTFT).")
+
+    groups = [(mode, [r for r in rows if r["mode"] == mode]) for mode in dict.fromkeys(r["mode"] for r in rows)]
+    if len({r["model"] for r in rows}) > 1:
+        groups.append(("all modes, per model", overall))
+    for label, group in groups:
+        frontier = pareto_frontier(group)
+        print(f"\n  Pareto frontier — {label} (quality vs p95 latency):")
+        show(["Model", "Variant", "Quality", "P95 latency"],
+             [[r["model"], r["variant"], fmt(r["quality"], ".4f"), fmt(r["p95_latency"], ".2f", "s")]
+              for r in frontier])
+        dominated = [r for r in group if r not in frontier]
+        if dominated:
+            print("  Dominated: " + ", ".join(f"{r['model']} / {r['variant']}" for r in dominated))
+
+
+# ─── Main ─────────────────────────────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description="Quality, latency and throughput of the same variants across models")
+    parser.add_argument("--models", nargs="+", default=[DEFAULT_MODEL],
+                        help="Model IDs, or ID@URL for models on separate servers")
+    parser.add_argument("--url", type=str, default="http://localhost:8080", help="Default Swama server URL")
+    parser.add_argument("--modes", nargs="+", choices=list(MODE_VARIANTS), default=list(MODE_VARIANTS),
+                        help="Modes to run (default: all)")
+    parser.add_argument("--variant", type=str, action="append", default=[],
+                        help="Variant to run as mode=name, repeatable; only those modes run "
+                             "(default: each mode's lead variant)")
+    parser.add_argument("--samples", type=int, default=None, help="Samples per mode (default: all)")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed requests per model before its run")
+    parser.add_argument("--layout", choices=MESSAGE_LAYOUTS, default=DEFAULT_LAYOUT,
+                        help="Message layout (default: concatenated, as the app sends it)")
+    parser.add_argument("--token-policy", choices=TOKEN_POLICIES, default="fixed",
+                        help="max_tokens/stop sequences: fixed 512 (default) or adaptive (see token_policy.py)")
+    parser.add_argument("--output", type=str, default=None, help="Save the matrix and per-sample details (JSON)")
+    parser.add_argument("--stub", action="store_true", help="Start an in-process Swama stub on each server's port")
+    parser.add_argument("--stub-speed", type=float, default=1.0, help="Stub delay multiplier (with --stub)")
+    args = parser.parse_args()
+
+    names = {}
+    for spec in args.variant:
+        mode, _, name = spec.partition("=")
+        if mode not in MODE_VARIANTS or not name:
+            print(f"ERROR: --variant must be mode=name with mode one of {', '.join(MODE_VARIANTS)}")
+            sys.exit(1)
+        names.setdefault(mode, []).append(name)
+    modes = [m for m in args.modes if m in names] if names else args.modes
+    try:
+        variants = {mode: [find_variant(mode, name) for name in names.get(mode, [None])] for mode in modes}
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+
+    models = [parse_model(spec, args.url) for spec in args.models]
+    stubs = []
+    if args.stub:
+        from urllib.parse import urlparse
+        import swama_stub
+        for port in dict.fromkeys(urlparse(url).port or 8080 for _, url in models):
+            stubs.append(swama_stub.serve(port, speed=args.stub_speed))
+            print(f"Started Swama stub on port {port} (speed ×{args.stub_speed})")
+
+    samples_by_mode = {}
+    for mode in modes:
+        samples = load_samples(mode)
+        samples_by_mode[mode] = samples[:args.samples] if args.samples else samples
+
+    rows, details = run_matrix(models, variants, samples_by_mode, args.warmup, args.layout, args.token_policy)
+    if not rows:
+        print("No model produced results.")
+        sys.exit(1)
+    overall = model_rows(rows, details)
+    print_report(rows, overall)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "models": [{"model": m, "server_url": url} for m, url in models],
+                "layout": args.layout,
+                "token_policy": args.token_policy,
+                "variants": {mode: [v["name"] for v in vs] for mode, vs in variants.items()},
+                "matrix": rows,
+                "per_model": overall,
+                "frontier": {mode: pareto_frontier([r for r in rows if r["mode"] == mode]) for mode in modes},
+                "details": details,
+            }, f, indent=2)
+        print(f"\nResults saved to: {args.output}")
+
+    for stub in stubs:
+        stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
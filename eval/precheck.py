@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+precheck.py — Skip the model for Grammar-mode text that is already clean.
+
+Already-correct text still pays a full model call, only to come back
+unchanged. This is a local pre-classifier that predicts "no change needed"
+in well under a millisecond:
+
+  - spell check against a word index: dictionary files (--dictionary; by
+    default /usr/share/dict/words where it exists, as on macOS) plus every
+    word of the style samples' references. Inflected forms are accepted if
+    their stem is known (-s, -es, -ed, -ing, -ly, -er, -est), except where
+    a one-syllable stem needed its consonant doubled ("droped"). Capitalized
+    words mid-sentence, acronyms (all-caps, up to 5 letters), and tokens
+    with digits, URLs, paths, @mentions or code punctuation are left alone;
+    text that is mostly upper-case is never predicted clean.
+  - chat shorthand and apostrophe-less contractions (u, thx, im, dont, ...)
+  - heuristics for errors a spell check can't see: lowercase sentence
+    starts and "i", missing final punctuation, inconsistent spacing around
+    punctuation, doubled words, a/an, "should of", have + simple past
+    ("has went"), did + past, double negatives, common homophone slips
+    ("your the", "their is", "its been", "more then", "they is"), and a few
+    frequent learner errors (missing "to" or article, "each ... have")
+
+Text is predicted clean only if nothing fires; anything uncertain goes to
+the model. The report runs the check over samples from saved runs (and/or
+BUILTIN_SAMPLES / JFLEG) and shows the skip rate, the false-skip rate
+(skipped samples whose source matches none of the references, i.e. that
+needed a change), how many truly clean samples were caught, the model
+latency the skips would have saved (from the runs' recorded latencies) and
+the GLEU change from returning those sources as-is. With no dictionary file
+the index is small and almost nothing is skipped — that's the safe failure.
+
+eval_prompts.py --precheck applies the same check live, skipping the model
+call for predicted-clean samples.
+
+Usage:
+    python precheck.py results_jfleg.json results_builtin.json
+    python precheck.py --builtin --dictionary /usr/share/dict/words --show-skipped
+    python precheck.py --jfleg 200
+"""
+
+import argparse
+import os
+import re
+import time
+from collections import Counter
+
+DEFAULT_DICTIONARY = "/usr/share/dict/words"
+ACRONYM_MAX_LEN = 5       # longer all-caps words are spell-checked
+
+CONTRACTIONS = {
+    "i'm", "i've", "i'll", "i'd", "you're", "you've", "you'll", "you'd", "he's", "he'll", "he'd",
+    "she's", "she'll", "she'd", "it's", "it'll", "it'd", "we're", "we've", "we'll", "we'd",
+    "they're", "they've", "they'll", "they'd", "that's", "that'll", "there's", "here's", "what's",
+    "who's", "where's", "when's", "how's", "let's", "don't", "doesn't", "didn't", "can't", "couldn't",
+    "won't", "wouldn't", "shouldn't", "isn't", "aren't", "wasn't", "weren't", "hasn't", "haven't",
+    "hadn't", "mustn't", "needn't", "shan't", "o'clock", "y'all", "ma'am",
+    "n't",  # tokenized text (JFLEG): "do n't"
+}
+
+SHORTHAND = {
+    "u", "ur", "r", "thx", "thnx", "pls", "plz", "sry", "k", "kk", "lmk", "idk", "tbh", "imo", "btw",
+    "gonna", "wanna", "gotta", "kinda", "sorta", "cuz", "coz", "ya", "yea", "im", "ive", "dont",
+    "didnt", "doesnt", "cant", "isnt", "arent", "wasnt", "werent", "couldnt", "wouldnt", "shouldnt",
+    "hasnt", "havent", "youre", "theyre", "thats", "whats", "noone", "alot",
+}
+
+ABBREVIATIONS = {"e.g.", "i.e.", "etc.", "vs.", "mr.", "mrs.", "ms.", "dr.", "no.", "approx."}
+
+# (reason, pattern): any match means the text needs the model
+PATTERNS = [(reason, re.compile(pattern)) for reason, pattern in (
+    ("lowercase i", r"(?<![\w'’.])i(?![\w'’.])"),
+    ("missing space after punctuation", r"[,;](?=[A-Za-z])|[a-z][.!?](?=[A-Z][a-z])"),
+    ("doubled word", r"(?i)\b([a-z]+)\s+\1\b"),
+    ("a/an", r"\b[Aa]\s+[aeioAEIO][a-z]|\b[Aa]n\s+[bcdfgjklmnpqrstvwxyz][a-z]"),
+    ("of for have", r"(?i)\b(should|could|would|must|might)\s+of\b"),
+    ("have + simple past", r"(?i)\b(have|has|had|having)\s+(went|came|ran|did|saw|ate|wrote|took|gave|"
+                           r"spoke|broke|drove|knew|began|sang|swam|drank|forgot|chose|threw|grew)\b"),
+    ("did + past", r"(?i)\b(did|didn't|does|doesn't|do|don't)\s+(\w+\s+)?(went|had|seen|saw|came|got|"
+                   r"took|made|was|were|knew|gave|bought|told|said|did|didn't)\b"),
+    ("double negative", r"(?i)n't\s+(\w+\s+){0,2}(no|nothing|nobody|none|never)\b"),
+    ("your/you're", r"(?i)\byour\s+(the|a|an|welcome|going|right|wrong|not|so|very|being|free)\b"),
+    ("their/there", r"(?i)\btheir\s+(is|are|was|were|will|going|gonna)\b|\bthere\s+(own)\b"),
+    ("its/it's", r"(?i)\bits\s+(been|a|an|the|not|going|gonna|important|ok|okay|time)\b|\bit's\s+own\b"),
+    ("then/than", r"(?i)\b(more|less|better|worse|rather|other|greater|fewer|larger|smaller|faster)\s+then\b"),
+    ("subject-verb", r"(?i)\b(i|he|she|it|they|we|you)\s+(is|are|was|were|has|have|don't|doesn't|goes|go)\b"),
+    ("each/every agreement", r"(?i)\b(each|every|everyone|everybody|nobody|someone|somebody|anyone|anybody|either|"
+                             r"neither)\b(\s+of\s+(the|these|those|our|my|your|their)\s+\w+)?\s+(have|are|were|don't)\b"),
+    ("whose/who's", r"(?i)\bwho's\s+[a-z]+\s+(is|are|was|were)\b|\b(your|their|our|her)'s\b"),
+    ("missing to", r"(?i)\b(need|needs|want|wants|going|ought)\s+(go|be|do|get|make|take|see|come|buy|find)\b"),
+    ("article", r"(?i)\ban?\s+(bread|advice|information|furniture|equipment|luggage|homework|news|"
+                r"feedback|knowledge|research|evidence)\b"),
+    ("article", r"(?i)\b(is|was|are|were|am)\s+(best|worst|most|[a-z]{3,}est)\s+[a-z]+\s+(in|of|on|at)\b"),
+    ("tense shift", r"(?i)\b(was|were)\s+\w+ing\b[^.!?]*\bwhen\s+(he|she|it|they|we|i|you)\s+[a-z]+s\b"),
+)]
+
+# Pronoun/verb pairs that agree; everything else "subject-verb" matches is flagged
+_AGREES = {
+    "i": {"was", "have", "don't", "go"},
+    "he": {"is", "was", "has", "doesn't", "goes"},
+    "she": {"is", "was", "has", "doesn't", "goes"},
+    "it": {"is", "was", "has", "doesn't", "goes"},
+    "they": {"are", "were", "have", "don't", "go"},
+    "we": {"are", "were", "have", "don't", "go"},
+    "you": {"are", "were", "have", "don't", "go"},
+}
+
+_SKIP_TOKEN_RE = re.compile(r"\S*(?:\d|[@/\\_=<>{}\[\]#`~|]|\w\.\w)\S*")
+_WORD_RE = re.compile(r"[A-Za-z]+(?:['’][A-Za-z]+)*")
+_VOWEL_GROUPS_RE = re.compile(r"[aeiouy]+")
+
+
+# ─── Word Index ──────────────────────────────────────────────────────────────
+
+def build_index():
+    """Word counts over the style samples' references (clean, edited prose)."""
+    from style_samples import CASUAL_SAMPLES, CONCISE_SAMPLES, PROFESSIONAL_SAMPLES
+
+    index = Counter()
+    for sample in CONCISE_SAMPLES + CASUAL_SAMPLES + PROFESSIONAL_SAMPLES:
+        for reference in sample["references"]:
+            index.update(word.lower().replace("’", "'") for word in _WORD_RE.findall(reference))
+    return index
+
+
+def load_vocabulary(dictionaries=None):
+    """
+    Known words: the style-reference index plus one word per line from each
+    dictionary file (default: /usr/share/dict/words, if present).
+    """
+    if dictionaries is None:
+        dictionaries = [DEFAULT_DICTIONARY] if os.path.exists(DEFAULT_DICTIONARY) else []
+    vocabulary = set(build_index())
+    for path in dictionaries:
+        with open(path, encoding="utf-8", errors="ignore") as f:
+            vocabulary.update(line.strip().lower() for line in f if line.strip())
+    return vocabulary
+
+
+def _needs_doubling(stem):
+    """One-syllable stems ending consonant-vowel-consonant double it: drop → dropped."""
+    return (len(_VOWEL_GROUPS_RE.findall(stem)) == 1 and len(stem) >= 3
+            and stem[-1] not in "aeiouwxy" and stem[-2] in "aeiou" and stem[-3] not in "aeiou")
+
+
+def _stems(word):
+    """Candidate stems of an inflected word (empty if it can't be inflected)."""
+    stems = []
+    for suffix in ("ing", "ed"):
+        if word.endswith(suffix) and len(word) > len(suffix) + 2:
+            base = word[:-len(suffix)]
+            if len(base) >= 2 and base[-1] == base[-2]:
+                stems.append(base[:-1])          # dropped → drop
+            elif not _needs_doubling(base):
+                stems.append(base)               # walked → walk
+            stems.append(base + "e")             # baked → bake
+            if suffix == "ed" and base.endswith("i"):
+                stems.append(base[:-1] + "y")    # tried → try
+    for suffix, replacement in (("ies", "y"), ("es", ""), ("s", ""), ("ly", ""), ("ily", "y"),
+                                ("er", ""), ("er", "e"), ("est", ""), ("iest", "y")):
+        if word.endswith(suffix) and len(word) > len(suffix) + 2:
+            stems.append(word[:-len(suffix)] + replacement)
+    return stems
+
+
+def known_word(word, vocabulary):
+    word = word.lower().replace("’", "'")
+    if word in vocabulary or word in CONTRACTIONS:
+        return True
+    if word.endswith("'s") and word[:-2] in vocabulary:
+        return True
+    return any(stem in vocabulary for stem in _stems(word))
+
+
+# ─── Classifier ──────────────────────────────────────────────────────────────
+
+def _sentence_start_problems(text):
+    problems = []
+    first = re.search(r"[A-Za-z]", text)
+    if first and first.group(0).islower():
+        problems.append("lowercase sentence start")
+    for match in re.finditer(r"(\S+)[.!?]\s+([a-z])", text):
+        if (match.group(1) + ".").lower() not in ABBREVIATIONS and \
+                (match.group(1).lower() + ".") not in ABBREVIATIONS:
+            problems.append("lowercase sentence start")
+            break
+    # Spaces before punctuation are fine if consistent (JFLEG is tokenized
+    # that way); a mix of spaced and unspaced marks is a spacing error
+    spaced = len(re.findall(r"\w\s+[,.;:!?](?![\w.])", text))
+    unspaced = len(re.findall(r"\w[,.;:!?](?=\s|$)", text))
+    if spaced and unspaced:
+        problems.append("space before punctuation")
+    stripped = text.rstrip()
+    if stripped and stripped[-1] not in ".!?\"'”’)…:":
+        problems.append("no final punctuation")
+    return problems
+
+
+def check(text, vocabulary):
+    """
+    Returns (clean, reasons): clean is True only if no check fired; reasons
+    lists what did ("unknown word: x", "doubled word", ...).
+    """
+    reasons = _sentence_start_problems(text)
+
+    for reason, pattern in PATTERNS:
+        for match in pattern.finditer(text):
+            if reason == "subject-verb":
+                pronoun, verb = match.group(1).lower(), match.group(2).lower()
+                if verb in _AGREES[pronoun]:
+                    continue
+            reasons.append(reason)
+            break
+
+    prose = _SKIP_TOKEN_RE.sub(" ", text)
+    words = re.findall(r"[A-Za-z]{2,}", prose)
+    if len(words) >= 3 and sum(1 for w in words if w.isupper()) * 2 > len(words):
+        reasons.append("mostly upper-case")         # casing the model would fix
+    sentence_start = True
+    for match in re.finditer(r"[A-Za-z]+(?:['’][A-Za-z]+)*|[.!?]", prose):
+        token = match.group(0)
+        if token in ".!?":
+            sentence_start = True
+            continue
+        at_start, sentence_start = sentence_start, False
+        lower = token.lower()
+        if lower in SHORTHAND:
+            reasons.append(f"shorthand: {token}")
+            continue
+        if token.isupper() and 1 < len(token) <= ACRONYM_MAX_LEN:
+            continue                                  # acronym
+        if token[0].isupper() and not at_start:
+            continue                                  # proper noun
+        if not known_word(token, vocabulary):
+            reasons.append(f"unknown word: {token}")
+    return not reasons, reasons
+
+
+def make_precheck(dictionaries=None):
+    """A text → (clean, reasons) callable with its vocabulary loaded once."""
+    vocabulary = load_vocabulary(dictionaries)
+    return lambda text: check(text, vocabulary)
+
+
+# ─── Evaluation ──────────────────────────────────────────────────────────────
+
+def _normalized(text):
+    return " ".join(text.split()).lower()
+
+
+def needs_change(sample):
+    """Ground truth: the source matches none of the references."""
+    source = _normalized(sample["source"])
+    return all(_normalized(ref) != source for ref in sample["references"])
+
+
+def evaluate(samples, precheck, latencies=None, gleus=None):
+    """
+    Run the precheck over samples. latencies/gleus map sample_id → the
+    model's mean latency / GLEU in a saved run (optional).
+    Returns a summary dict plus the per-sample rows.
+    """
+    from eval_prompts import compute_gleu
+    from sample_registry import sample_id
+
+    rows = []
+    check_time = 0.0
+    for sample in samples:
+        sid = sample.get("sample_id") or sample.get("id") or sample_id(sample["source"])
+        start = time.perf_counter()
+        clean, reasons = precheck(sample["source"])
+        check_time += time.perf_counter() - start
+        rows.append({
+            "sample_id": sid,
+            "source": sample["source"],
+            "skipped": clean,
+            "needs_change": needs_change(sample),
+            "reasons": reasons,
+            "latency": (latencies or {}).get(sid),
+            "model_gleu": (gleus or {}).get(sid),
+            "skip_gleu": compute_gleu(sample["source"], sample["source"], sample["references"]) if clean else None,
+        })
+
+    skipped = [r for r in rows if r["skipped"]]
+    clean_samples = [r for r in rows if not r["needs_change"]]
+    with_latency = [r for r in rows if r["latency"] is not None]
+    saved = sum(r["latency"] for r in skipped if r["latency"] is not None)
+    total = sum(r["latency"] for r in with_latency)
+    gleu_pairs = [(r["skip_gleu"], r["model_gleu"]) for r in skipped if r["model_gleu"] is not None]
+    return {
+        "samples": len(rows),
+        "skipped": len(skipped),
+        "skip_rate": len(skipped) / len(rows) if rows else 0.0,
+        "false_skips": sum(1 for r in skipped if r["needs_change"]),
+        "false_skip_rate": sum(1 for r in skipped if r["needs_change"]) / len(skipped) if skipped else 0.0,
+        "clean_samples": len(clean_samples),
+        "clean_caught": sum(1 for r in clean_samples if r["skipped"]),
+        "latency_saved": saved if with_latency else None,
+        "latency_saved_share": saved / total if total else None,
+        "gleu_change": (sum(s - m for s, m in gleu_pairs) / len(gleu_pairs)) if gleu_pairs else None,
+        "check_ms": check_time / len(rows) * 1000 if rows else 0.0,
+        "reasons": Counter(reason.split(":")[0] for r in rows for reason in r["reasons"]),
+        "rows": rows,
+    }
+
+
+def run_samples(path):
+    """(samples, sample_id → mean latency, sample_id → mean GLEU) from a saved run."""
+    from results_io import load_results
+
+    data = load_results(path)
+    latencies, gleus = {}, {}
+    for result in data["results"]:
+        for d in result["details"]:
+            if d.get("error"):
+                continue
+            if d.get("latency") is not None:
+                latencies.setdefault(d["sample_id"], []).append(d["latency"])
+            if d.get("gleu") is not None:
+                gleus.setdefault(d["sample_id"], []).append(d["gleu"])
+    mean = lambda values: {sid: sum(v) / len(v) for sid, v in values.items()}
+    return list(data["samples"].values()), mean(latencies), mean(gleus)
+
+
+# ─── Reporting ───────────────────────────────────────────────────────────────
+
+def print_report(summaries, show_skipped=False):
+    try:
+        from tabulate import tabulate
+    except ImportError:
+        tabulate = None
+
+    headers = ["Samples from", "N", "Skipped", "False skips", "Clean caught",
+               "Latency saved", "GLEU Δ (skipped)", "Check time"]
+    table = []
+    for label, s in summaries:
+        saved = "—"
+        if s["latency_saved"] is not None:
+            saved = f"{s['latency_saved']:.1f}s ({s['latency_saved_share']:.1%})"
+        table.append([
+            label, s["samples"], f"{s['skipped']} ({s['skip_rate']:.1%})",
+            f"{s['false_skips']} ({s['false_skip_rate']:.1%})",
+            f"{s['clean_caught']}/{s['clean_samples']}", saved,
+            f"{s['gleu_change']:+.4f}" if s["gleu_change"] is not None else "—",
+            f"{s['check_ms']:.3f}ms",
+        ])
+
+    print(f"\n{'='*70}")
+    print("  GRAMMAR PRE-CHECK (skip the model for clean text)")
+    print(f"{'='*70}")
+    if tabulate:
+        print(tabulate(table, headers=headers, tablefmt="grid"))
+    else:
+        for row in [headers] + table:
+            print("  ".join(str(c) for c in row))
+    print("  False skips: skipped samples whose source matches no reference. "
+          "Latency saved: the run's mean model latency for skipped samples.")
+
+    for label, s in summaries:
+        top = ", ".join(f"{reason} {count}" for reason, count in s["reasons"].most_common(6))
+        print(f"\n  {label} — most common reasons to call the model: {top or 'none'}")
+        if show_skipped:
+            for r in s["rows"]:
+                if r["skipped"]:
+                    flag = "FALSE SKIP " if r["needs_change"] else ""
+                    print(f"    {flag}{r['source'][:90]}")
+
+
+# ─── Main ─────────────────────────────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-check that skips the model for already-clean text")
+    parser.add_argument("inputs", nargs="*", help="Grammar results files: samples plus recorded latencies")
+    parser.add_argument("--builtin", action="store_true", help="Also check BUILTIN_SAMPLES")
+    parser.add_argument("--jfleg", type=int, default=None, help="Also check this many JFLEG test samples")
+    parser.add_argument("--dictionary", type=str, action="append", default=None,
+                        help=f"Word list, one word per line (repeatable; default: {DEFAULT_DICTIONARY} if present)")
+    parser.add_argument("--show-skipped", action="store_true", help="List the samples that would be skipped")
+    args = parser.parse_args()
+
+    precheck = make_precheck(args.dictionary)
+    summaries = []
+    for path in args.inputs:
+        samples, latencies, gleus = run_samples(path)
+        summaries.append((os.path.basename(path), evaluate(samples, precheck, latencies, gleus)))
+    if args.builtin:
+        from builtin_samples import BUILTIN_SAMPLES
+        summaries.append(("BUILTIN_SAMPLES", evaluate(BUILTIN_SAMPLES, precheck)))
+    if args.jfleg:
+        from eval_prompts import load_jfleg
+        summaries.append(("JFLEG test", evaluate(load_jfleg("test", args.jfleg), precheck)))
+    if not summaries:
+        parser.error("give results files, --builtin and/or --jfleg")
+
+    print_report(summaries, args.show_skipped)
+
+
+if __name__ == "__main__":
+    main()
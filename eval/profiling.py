@@ -0,0 +1,125 @@
+"""
+profiling.py — Lightweight per-stage timing for the evaluation loops.
+
+The harnesses wrap each stage of a sample (HTTP call, clean_response,
+compute_gleu, compute_overcorrection, printing, ...) in a named span:
+
+    from profiling import span
+
+    with span("http"):
+        raw_output, latency = call_swama(...)
+
+Spans are no-ops until enable() is called (the harnesses' --profile flag),
+so the cost with profiling off is one function call and a flag check per
+stage. With profiling on, each span adds two perf_counter() calls and a
+dict update. Spans should wrap leaf stages only — nested spans would be
+counted twice in the summary.
+
+--profile also runs the whole evaluation under cProfile and prints the
+functions with the highest cumulative time after the per-stage table.
+"""
+
+import cProfile
+import io
+import pstats
+import time
+
+ENABLED = False
+
+_totals = {}
+_counts = {}
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        _totals[self.name] = _totals.get(self.name, 0.0) + elapsed
+        _counts[self.name] = _counts.get(self.name, 0) + 1
+        return False
+
+
+def span(name):
+    """Context manager timing one stage under `name` (no-op when disabled)."""
+    if not ENABLED:
+        return _NULL_SPAN
+    return _Span(name)
+
+
+def enable():
+    global ENABLED
+    ENABLED = True
+
+
+def reset():
+    _totals.clear()
+    _counts.clear()
+
+
+def stage_totals():
+    """{stage: (calls, total_seconds)} for everything recorded so far."""
+    return {name: (_counts[name], _totals[name]) for name in _totals}
+
+
+# ─── Whole-run Profiling ─────────────────────────────────────────────────────
+
+def start():
+    """Enable spans and start cProfile. Returns a handle for finish()."""
+    reset()
+    enable()
+    profiler = cProfile.Profile()
+    wall_start = time.perf_counter()
+    profiler.enable()
+    return profiler, wall_start
+
+
+def finish(handle, top=15):
+    """Stop cProfile and print the per-stage table and top cumulative functions."""
+    profiler, wall_start = handle
+    profiler.disable()
+    wall = time.perf_counter() - wall_start
+
+    print_summary(wall)
+
+    buf = io.StringIO()
+    stats = pstats.Stats(profiler, stream=buf).sort_stats("cumulative")
+    stats.print_stats(top)
+    print(f"\n{'='*70}")
+    print(f"  cProfile — top {top} by cumulative time")
+    print(f"{'='*70}")
+    print(buf.getvalue())
+
+
+def print_summary(wall):
+    """Print time per stage, sorted by total time, with the unaccounted remainder."""
+    rows = sorted(stage_totals().items(), key=lambda kv: kv[1][1], reverse=True)
+    accounted = sum(total for _, (_, total) in rows)
+
+    print(f"\n{'='*70}")
+    print(f"  TIME PER STAGE (wall: {wall:.2f}s)")
+    print(f"{'='*70}")
+    print(f"  {'Stage':26s} {'Calls':>8s} {'Total':>10s} {'Mean':>10s} {'% wall':>8s}")
+    for name, (calls, total) in rows:
+        mean_ms = total / calls * 1000 if calls else 0.0
+        print(f"  {name:26s} {calls:8d} {total:9.3f}s {mean_ms:8.2f}ms {total / max(wall, 1e-9):8.1%}")
+    other = max(wall - accounted, 0.0)
+    print(f"  {'(other)':26s} {'':8s} {other:9.3f}s {'':10s} {other / max(wall, 1e-9):8.1%}")
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+prompt_budget.py — Prefill token budget of every prompt variant.
+
+Every request prefills the variant's system prompt before the input, so a
+long prompt costs latency on every hotkey press. For each variant in
+GRAMMAR_VARIANTS, CONCISE_VARIANTS, CASUAL_VARIANTS and PROFESSIONAL_VARIANTS
+this reports:
+
+  - system prompt tokens, and how many more than the mode's shortest variant
+  - shared prefix: the longest token prefix it has in common with any other
+    variant (a server prefix cache can reuse it when switching between them)
+    and the prefix common to the whole mode
+  - estimated prefill time, from rates fitted on saved runs (--results, via
+    latency_breakdown.fit_rates(), TTFT-based when the runs were streamed)
+    or given with --prefill-ms
+  - with --results: variants whose length isn't justified by their score —
+    within one results file (same samples), another variant of the mode
+    scores at least as well (minus --margin) with a shorter prompt. Scores
+    are GLEU for Grammar and the composite for the style modes.
+
+Tokens come from a local tokenizer file (--tokenizer: the model's
+tokenizer.json, or the directory holding it; needs the `tokenizers`
+package, never downloads anything). Without one, counts are estimated with
+latency_breakdown.estimate_tokens().
+
+Usage:
+    python prompt_budget.py --tokenizer ~/models/Qwen3-8B-4bit/tokenizer.json
+    python prompt_budget.py --results results_jfleg_v2.json style_results_v2.json
+    python prompt_budget.py --mode casual --prefill-ms 0.6
+"""
+
+import argparse
+import os
+import re
+import sys
+
+from latency_breakdown import collect_points, fit_rates
+from results_io import load_results
+
+MODES = ("grammar", "concise", "casual", "professional")
+
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+
+
+# ─── Tokenizing ──────────────────────────────────────────────────────────────
+
+def estimate_tokenize(text):
+    """Pseudo-tokens consistent with latency_breakdown.estimate_tokens()."""
+    return [piece[i:i + 8] for piece in _PIECE_RE.findall(text) for i in range(0, len(piece), 8)]
+
+
+def load_tokenizer(path):
+    """A text → token-ID list function from a local tokenizer.json (or its directory)."""
+    if os.path.isdir(path):
+        path = os.path.join(path, "tokenizer.json")
+    if not os.path.exists(path):
+        print(f"ERROR: tokenizer file not found: {path}")
+        sys.exit(1)
+    try:
+        from tokenizers import Tokenizer
+    except ImportError:
+        print("ERROR: 'tokenizers' package not installed.")
+        print("Run: pip install tokenizers")
+        sys.exit(1)
+    tokenizer = Tokenizer.from_file(path)
+    return lambda text: tokenizer.encode(text, add_special_tokens=False).ids
+
+
+def common_prefix(a, b):
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+
+# ─── Analysis ────────────────────────────────────────────────────────────────
+
+def load_variants(modes=MODES):
+    """[(mode, variant), ...] from the harnesses' variant lists."""
+    from prompts import GRAMMAR_VARIANTS
+    from style_prompts import CASUAL_VARIANTS, CONCISE_VARIANTS, PROFESSIONAL_VARIANTS
+
+    lists = {"grammar": GRAMMAR_VARIANTS, "concise": CONCISE_VARIANTS,
+             "casual": CASUAL_VARIANTS, "professional": PROFESSIONAL_VARIANTS}
+    return [(mode, variant) for mode in modes for variant in lists[mode]]
+
+
+def analyze(variants, tokenize):
+    """
+    Per-variant token rows: {"mode", "variant", "tokens", "extra", "shared",
+    "shared_with", "mode_prefix"}. The system prompt is tokenized with the
+    "\\n\\n" that separates it from the input.
+    """
+    ids = {variant["name"]: tokenize(variant["system_prompt"] + "\n\n") for _, variant in variants}
+    rows = []
+    for mode, variant in variants:
+        name = variant["name"]
+        same_mode = [v["name"] for m, v in variants if m == mode]
+        shortest = min(len(ids[n]) for n in same_mode)
+        mode_prefix = min(common_prefix(ids[name], ids[n]) for n in same_mode)
+        shared, shared_with = 0, None
+        for _, other in variants:
+            if other["name"] == name:
+                continue
+            length = common_prefix(ids[name], ids[other["name"]])
+            if length > shared:
+                shared, shared_with = length, other["name"]
+        rows.append({
+            "mode": mode,
+            "variant": name,
+            "tokens": len(ids[name]),
+            "extra": len(ids[name]) - shortest,
+            "shared": shared,
+            "shared_with": shared_with,
+            "mode_prefix": mode_prefix if len(same_mode) > 1 else None,
+        })
+    return rows
+
+
+def measured_prefill_rate(paths):
+    """Prefill seconds per token fitted over the given results files, or None."""
+    points = {}
+    for path in paths:
+        for key, group in collect_points(load_results(path))[0].items():
+            points.setdefault(key, []).extend(group)
+    pooled = [p for group in points.values() for p in group]
+    if not pooled:
+        return None
+    rates = fit_rates(pooled)
+    if not rates:
+        return None
+    rate = rates["ttft_prefill_per_token"] or rates["prefill_per_token"]
+    return rate if rate and rate > 0 else None
+
+
+def _score(metrics):
+    mode = metrics.get("mode") or "grammar"
+    return metrics.get("avg_gleu") if mode == "grammar" else metrics.get("composite")
+
+
+def unjustified(rows, paths, margin=0.0):
+    """
+    Variants dominated within a results file: another variant of the same
+    mode has a shorter prompt and a score no more than `margin` below.
+    """
+    tokens = {r["variant"]: r["tokens"] for r in rows}
+    flags = []
+    for path in paths:
+        scores = {}
+        for result in load_results(path)["results"]:
+            m = result["metrics"]
+            name = m["variant"]
+            if name in tokens and _score(m) is not None:
+                scores[name] = (m.get("mode") or "grammar", _score(m))
+        for name, (mode, score) in scores.items():
+            better = [(other, other_score) for other, (other_mode, other_score) in scores.items()
+                      if other_mode == mode and tokens[other] < tokens[name] and other_score >= score - margin]
+            if not better:
+                continue
+            other, other_score = max(better, key=lambda b: (b[1], -tokens[b[0]]))
+            flags.append({"file": os.path.basename(path), "mode": mode, "variant": name,
+                          "tokens": tokens[name], "score": score,
+                          "instead": other, "instead_tokens": tokens[other], "instead_score": other_score})
+    return flags
+
+
+# ─── Reporting ───────────────────────────────────────────────────────────────
+
+def print_report(rows, rate, flags, source):
+    try:
+        from tabulate import tabulate
+    except ImportError:
+        tabulate = None
+
+    headers = ["Mode", "Variant", "Tokens", "+ vs shortest", "Shared prefix", "Mode prefix", "Est. prefill"]
+    table = [[
+        r["mode"], r["variant"], r["tokens"], f"+{r['extra']}",
+        f"{r['shared']} ({r['shared_with']})" if r["shared_with"] else "0",
+        r["mode_prefix"] if r["mode_prefix"] is not None else "—",
+        f"{r['tokens'] * rate * 1000:.0f}ms" if rate else "—",
+    ] for r in rows]
+
+    print(f"\n{'='*70}")
+    print(f"  SYSTEM PROMPT TOKEN BUDGET ({source})")
+    print(f"{'='*70}")
+    if tabulate:
+        print(tabulate(table, headers=headers, tablefmt="grid"))
+    else:
+        for row in [headers] + table:
+            print("  ".join(str(c) for c in row))
+    if rate:
+        print(f"\n  Prefill rate: {rate * 1000:.2f} ms/token")
+
+    if flags is None:
+        return
+    print(f"\n  Length not justified by score:")
+    if not flags:
+        print("    none")
+    for f in flags:
+        print(f"    {f['variant']} ({f['mode']}, {f['file']}): {f['score']:.4f} at {f['tokens']} tokens — "
+              f"{f['instead']} scores {f['instead_score']:.4f} at {f['instead_tokens']} "
+              f"({f['tokens'] - f['instead_tokens']} fewer)")
+
+
+# ─── Main ─────────────────────────────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description="System prompt token counts, shared prefixes and prefill cost")
+    parser.add_argument("--tokenizer", type=str, default=None,
+                        help="Local tokenizer.json (or model directory); default: estimated counts")
+    parser.add_argument("--mode", choices=MODES, action="append", default=None, help="Only this mode (repeatable)")
+    parser.add_argument("--results", nargs="+", default=[],
+                        help="Results files for measured prefill rates and score checks")
+    parser.add_argument("--prefill-ms", type=float, default=None,
+                        help="Prefill cost in ms/token (overrides the rate fitted from --results)")
+    parser.add_argument("--margin", type=float, default=0.0,
+                        help="Score a shorter variant may lose and still make a longer one unjustified")
+    args = parser.parse_args()
+
+    if args.tokenizer:
+        tokenize = load_tokenizer(os.path.expanduser(args.tokenizer))
+        source = os.path.basename(os.path.normpath(args.tokenizer))
+    else:
+        tokenize = estimate_tokenize
+        source = "estimated tokens"
+
+    rows = analyze(load_variants(args.mode or MODES), tokenize)
+    if args.prefill_ms is not None:
+        rate = args.prefill_ms / 1000
+    else:
+        rate = measured_prefill_rate(args.results) if args.results else None
+        if args.results and rate is None:
+            print("No prefill rate could be fitted from the results files (use --prefill-ms).")
+    flags = unjustified(rows, args.results, args.margin) if args.results else None
+    print_report(rows, rate, flags, source)
+
+
+if __name__ == "__main__":
+    main()
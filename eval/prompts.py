@@ -163,6 +163,34 @@ Rules:
     "temperature": 0.2,
 }
 
+# ─── Edits: list fixes instead of re-emitting the text ───────────────────────
+# Output is parsed and applied by edit_spans.py, not used as the rewrite, so
+# these live in GRAMMAR_EDIT_VARIANTS rather than GRAMMAR_VARIANTS.
+
+GRAMMAR_EDITS_V1 = {
+    "name": "edits_v1_span_list",
+    "format": "edits",
+    "system_prompt": """You are a proofreader. Find the spelling, grammar, and punctuation errors in the text and list the fixes. Do NOT rewrite the whole text.
+
+Output one fix per line, in this form:
+original words => corrected words
+
+Rules:
+1. "original words" must be copied exactly from the text (same capitalization and punctuation) and be long enough to appear only once — usually 1 to 4 words.
+2. List fixes in the order they appear in the text. Fixes must not overlap.
+3. Fix only real errors. Do not change word choice, tone, or style.
+4. If there are no errors, output exactly: NONE
+5. No explanations, numbering, quotes, or markdown.
+
+Example text: She go to school every days, she like it.
+Example output:
+She go => She goes
+every days, she like => every day. She likes
+
+/no_think""",
+    "temperature": 0.1,
+}
+
 # ─── Collect all variants ─────────────────────────────────────────────────────
 
 GRAMMAR_VARIANTS = [
@@ -171,3 +199,7 @@ GRAMMAR_VARIANTS = [
     GRAMMAR_V7,
     GRAMMAR_V8,
 ]
+
+GRAMMAR_EDIT_VARIANTS = [
+    GRAMMAR_EDITS_V1,
+]
@@ -15,19 +15,24 @@ import sys
 import time
 import requests
 
-def call_swama(prompt, system_prompt, temperature=0.3, base_url="http://localhost:8080"):
+from token_policy import TOKEN_POLICIES, generation_limits
+
+def call_swama(prompt, system_prompt, temperature=0.3, base_url="http://localhost:8080", token_policy="fixed"):
     """Call Swama's OpenAI-compatible API."""
     import re
 
     url = f"{base_url}/v1/chat/completions"
+    limits = generation_limits("grammar", prompt, token_policy)
     payload = {
         "model": "mlx-community/Qwen3-8B-4bit",
         "messages": [
             {"role": "user", "content": f"{system_prompt}\n\n{prompt}"}
         ],
         "temperature": temperature,
-        "max_tokens": 512,
+        "max_tokens": limits["max_tokens"],
     }
+    if limits["stop"]:
+        payload["stop"] = limits["stop"]
 
     start = time.time()
     try:
@@ -60,6 +65,8 @@ def main():
     parser.add_argument("text", help="Text to correct")
     parser.add_argument("--variant", type=str, default=None, help="Specific variant")
     parser.add_argument("--url", type=str, default="http://localhost:8080")
+    parser.add_argument("--token-policy", choices=TOKEN_POLICIES, default="fixed",
+                        help="max_tokens/stop sequences: fixed 512 (default) or adaptive (see token_policy.py)")
     args = parser.parse_args()
 
     from prompts import GRAMMAR_VARIANTS
@@ -81,6 +88,7 @@ def main():
                 variant["system_prompt"],
                 variant["temperature"],
                 args.url,
+                args.token_policy,
             )
             changed = "CHANGED" if output.strip() != args.text.strip() else "unchanged"
             print(f"  {name:25s} → {output}  ({latency:.2f}s, {changed})")
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+repeat_sampling.py — Several completions per input: score variance, expected best-of-k, and how many repetitions rank the variants stably.
+
+The variants run at temperatures of 0.2–0.7, so a single completion per
+input gives a noisy score, and two variants a few hundredths apart may
+swap places on a rerun. This asks for --n completions of every (variant,
+sample) request in one call with the `n` parameter (swama_client.
+complete_n(): one prefill, the generations decoded as a batch); when the
+server ignores or rejects `n` — or with --no-batch — the completions come
+from parallel single requests instead. Per variant it reports:
+
+  - mean score (GLEU for Grammar, the per-sample composite for the style
+    modes), the mean within-sample standard deviation, and the share of
+    the score variance that is sampling noise rather than the inputs
+  - expected best-of-k for k = 1, 2, 4, … n: the mean over samples of the
+    unbiased estimate of the best of k completions drawn from the n
+  - wall time per completion, and how many came from batched calls
+
+and per mode, with two or more variants: for r = 1 … n repetitions, the
+share of --draws bootstrap resamples (r completions per sample, drawn
+with replacement from its n) whose variant ranking matches the ranking
+from all n — exact, and for the top variant only — and the smallest r
+reaching --stable. If even r = n falls short, the n-repetition ranking
+itself isn't stable yet: rerun with a larger --n.
+
+--sequential-samples K times the first K samples of each mode's first
+variant again as n sequential single requests, to show what the batched
+call saves.
+
+Usage:
+    python repeat_sampling.py --n 8 --samples 10
+    python repeat_sampling.py --modes casual --variant casual=casual_v5_few_shot \\
+        --variant casual=casual_v7_friend_preserve --n 16
+    python repeat_sampling.py --stub --stub-speed 0.02 --stub-noise 0.3 --output repeats.json
+"""
+
+import argparse
+import json
+import math
+import random
+import sys
+import time
+
+from eval_prompts import clean_response
+from eval_styles import aggregate_style_metrics
+from load_test import MODE_VARIANTS, find_variant
+from sample_registry import sample_id
+from swama_client import DEFAULT_MODEL, complete, complete_n
+from variant_eval import load_samples, score_sample
+
+
+# ─── Scoring ─────────────────────────────────────────────────────────────────
+
+def score_output(mode, sample, output):
+    """GLEU for Grammar; the composite of this one output for the style modes."""
+    detail = score_sample(mode, sample, output)
+    if mode == "grammar":
+        return detail["gleu"]
+    return aggregate_style_metrics("", mode, 0.0, [detail])["composite"]
+
+
+def expected_best(scores, k):
+    """
+    Unbiased estimate of E[max of k completions] from n ≥ k scores: the
+    i-th smallest score is the best of a random k-subset with probability
+    C(i-1, k-1) / C(n, k).
+    """
+    ordered = sorted(scores)
+    n = len(ordered)
+    total = math.comb(n, k)
+    return sum(math.comb(i, k - 1) * s for i, s in enumerate(ordered) if i >= k - 1) / total
+
+
+def _variance(values, ddof=1):
+    if len(values) <= ddof:
+        return 0.0
+    mean = sum(values) / len(values)
+    return sum((v - mean) ** 2 for v in values) / (len(values) - ddof)
+
+
+def best_of_ks(n):
+    ks = [1]
+    while ks[-1] * 2 <= n:
+        ks.append(ks[-1] * 2)
+    return ks + ([n] if ks[-1] != n else [])
+
+
+# ─── Sampling ────────────────────────────────────────────────────────────────
+
+def run_variant(mode, variant, samples, n, base_url, model=DEFAULT_MODEL, batch=True, workers=None):
+    """Per-sample records: {"sample_id", "outputs", "scores", "seconds", "batched", "errors"}."""
+    print(f"  {mode:13s} {variant['name']} × {n} ...", end=" ", flush=True)
+    records = []
+    for sample in samples:
+        sid = sample.get("id") or sample_id(sample["source"])
+        start = time.perf_counter()
+        try:
+            results = complete_n(sample["source"], variant["system_prompt"], variant["temperature"],
+                                 base_url, n, model=model, batch=batch, workers=workers)
+        except Exception as e:
+            records.append({"sample_id": sid, "outputs": [], "scores": [], "errors": 1, "error": str(e),
+                            "seconds": time.perf_counter() - start, "batched": 0})
+            continue
+        outputs = [clean_response(r["text"]) for r in results]
+        records.append({
+            "sample_id": sid,
+            "outputs": outputs,
+            "scores": [score_output(mode, sample, output) for output in outputs],
+            "seconds": time.perf_counter() - start,
+            "batched": sum(1 for r in results if r["batched"]),
+            "errors": 0,
+        })
+    scored = [r for r in records if r["scores"]]
+    seconds = sum(r["seconds"] for r in records)
+    print(f"{seconds / max(len(records), 1):.2f}s per sample, {len(records) - len(scored)} errors")
+    return records
+
+
+def time_sequential(mode, variant, samples, n, base_url, model=DEFAULT_MODEL):
+    """Seconds per sample for n one-at-a-time requests."""
+    start = time.perf_counter()
+    for sample in samples:
+        for _ in range(n):
+            complete(sample["source"], variant["system_prompt"], variant["temperature"], base_url,
+                     model=model, stream=False)
+    return (time.perf_counter() - start) / len(samples)
+
+
+# ─── Analysis ────────────────────────────────────────────────────────────────
+
+def summarize(mode, variant, records, n):
+    scored = [r for r in records if len(r["scores"]) == n]
+    if not scored:
+        return None
+    means = [sum(r["scores"]) / n for r in scored]
+    within = [_variance(r["scores"]) for r in scored]
+    # Total variance = mean within-sample variance + variance of the sample means
+    noise = sum(_variance(r["scores"], ddof=0) for r in scored) / len(scored)
+    total = noise + _variance(means, ddof=0)
+    completions = sum(len(r["scores"]) for r in scored)
+    return {
+        "mode": mode,
+        "variant": variant["name"],
+        "temperature": variant["temperature"],
+        "samples": len(scored),
+        "errors": len(records) - len(scored),
+        "mean": sum(means) / len(means),
+        "within_std": sum(math.sqrt(v) for v in within) / len(within),
+        "noise_share": noise / total if total else 0.0,
+        "best_of": {k: sum(expected_best(r["scores"], k) for r in scored) / len(scored) for k in best_of_ks(n)},
+        "seconds_per_completion": sum(r["seconds"] for r in scored) / completions,
+        "batched_share": sum(r["batched"] for r in scored) / completions,
+    }
+
+
+def _ranking(means):
+    return tuple(sorted(means, key=lambda name: -means[name]))
+
+
+def ranking_stability(records_by_variant, n, draws=200, seed=0):
+    """
+    [{"reps", "exact", "top1"}] for r = 1 … n: how often r reps per sample,
+    resampled with replacement from the n, reproduce the variant ranking
+    from all n. Only samples every variant scored n times are used.
+    """
+    complete_ids = None
+    for records in records_by_variant.values():
+        ids = {r["sample_id"] for r in records if len(r["scores"]) == n}
+        complete_ids = ids if complete_ids is None else complete_ids & ids
+    if not complete_ids:
+        return []
+    scores = {name: [r["scores"] for r in records if r["sample_id"] in complete_ids]
+              for name, records in records_by_variant.items()}
+    reference = _ranking({name: sum(map(sum, rows)) for name, rows in scores.items()})
+
+    rng = random.Random(seed)
+    rows = []
+    for reps in range(1, n + 1):
+        exact = top1 = 0
+        for _ in range(draws):
+            means = {name: sum(sum(rng.choices(row, k=reps)) for row in sample_rows)
+                     for name, sample_rows in scores.items()}
+            ranking = _ranking(means)
+            exact += ranking == reference
+            top1 += ranking[0] == reference[0]
+        rows.append({"reps": reps, "exact": exact / draws, "top1": top1 / draws})
+    return rows
+
+
+def reps_needed(stability, threshold, key="exact"):
+    return next((row["reps"] for row in stability if row[key] >= threshold), None)
+
+
+# ─── Reporting ───────────────────────────────────────────────────────────────
+
+def print_report(summaries, stability_by_mode, n, threshold, sequential):
+    try:
+        from tabulate import tabulate
+    except ImportError:
+        tabulate = None
+
+    def show(headers, table):
+        if tabulate:
+            print(tabulate(table, headers=headers, tablefmt="grid"))
+        else:
+            for row in [headers] + table:
+                print("  ".join(str(c) for c in row))
+
+    ks = best_of_ks(n)
+    print(f"\n{'='*70}")
+    print(f"  SCORE SPREAD OVER {n} COMPLETIONS PER INPUT")
+    print(f"{'='*70}")
+    show(["Mode", "Variant", "Temp", "Samples", "Mean", "Within-sample σ", "Noise share"]
+         + [f"Best of {k}" for k in ks[1:]] + ["s / completion", "Batched"],
+         [[s["mode"], s["variant"], s["temperature"], s["samples"], f"{s['mean']:.4f}",
+           f"{s['within_std']:.4f}", f"{s['noise_share']:.0%}"]
+          + [f"{s['best_of'][k]:.4f}" for k in ks[1:]]
+          + [f"{s['seconds_per_completion']:.3f}", f"{s['batched_share']:.0%}"] for s in summaries])
+    print("  Noise share: within-sample variance over total score variance.")
+    print("  Best of k: expected score of the best of k completions (unbiased, from the n).")
+
+    for mode, (baseline, batched) in sequential.items():
+        print(f"\n  {mode}: {n} completions per sample take {batched:.2f}s with complete_n() vs "
+              f"{baseline:.2f}s as sequential requests ({baseline / batched:.1f}× faster)")
+
+    for mode, stability in stability_by_mode.items():
+        if not stability:
+            continue
+        print(f"\n  Ranking stability — {mode} (vs the ranking from all {n} repetitions):")
+        show(["Reps", "Exact ranking", "Same top variant"],
+             [[row["reps"], f"{row['exact']:.0%}", f"{row['top1']:.0%}"] for row in stability])
+        exact = reps_needed(stability, threshold)
+        top1 = reps_needed(stability, threshold, "top1")
+        print(f"  Repetitions for {threshold:.0%} agreement: "
+              f"{exact if exact else f'more than {n}'} (exact ranking), "
+              f"{top1 if top1 else f'more than {n}'} (top variant)")
+
+
+# ─── Main ─────────────────────────────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description="Score variance, best-of-k and ranking stability from repeated completions")
+    parser.add_argument("--url", type=str, default="http://localhost:8080", help="Swama server URL")
+    parser.add_argument("--model", type=str, default=DEFAULT_MODEL, help="Model ID to request")
+    parser.add_argument("--modes", nargs="+", choices=list(MODE_VARIANTS), default=list(MODE_VARIANTS),
+                        help="Modes to run (default: all)")
+    parser.add_argument("--variant", type=str, action="append", default=[],
+                        help="Variant to run as mode=name, repeatable; only those modes run "
+                             "(default: every variant of each mode)")
+    parser.add_argument("--samples", type=int, default=None, help="Samples per mode (default: all)")
+    parser.add_argument("--n", type=int, default=8, help="Completions per input (default: 8)")
+    parser.add_argument("--no-batch", action="store_true", help="Parallel single requests instead of `n`")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Parallel requests per input when falling back (default: n)")
+    parser.add_argument("--draws", type=int, default=200, help="Random subsets per repetition count")
+    parser.add_argument("--stable", type=float, default=0.9,
+                        help="Agreement that counts as a stable ranking (default: 0.9)")
+    parser.add_argument("--sequential-samples", type=int, default=2,
+                        help="Samples per mode to re-time as sequential requests (0 = skip)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the subset draws")
+    parser.add_argument("--output", type=str, default=None, help="Save summaries and per-sample scores (JSON)")
+    parser.add_argument("--stub", action="store_true", help="Start an in-process Swama stub on --url's port")
+    parser.add_argument("--stub-speed", type=float, default=1.0, help="Stub delay multiplier (with --stub)")
+    parser.add_argument("--stub-noise", type=float, default=0.2,
+                        help="Stub word-drop rate per unit temperature (with --stub)")
+    args = parser.parse_args()
+
+    if args.n < 2:
+        print("ERROR: --n must be at least 2")
+        sys.exit(1)
+    names = {}
+    for spec in args.variant:
+        mode, _, name = spec.partition("=")
+        if mode not in MODE_VARIANTS or not name:
+            print(f"ERROR: --variant must be mode=name with mode one of {', '.join(MODE_VARIANTS)}")
+            sys.exit(1)
+        names.setdefault(mode, []).append(name)
+    modes = [m for m in args.modes if m in names] if names else args.modes
+    try:
+        variants = {mode: [find_variant(mode, name) for name in names[mode]] if mode in names
+                    else list(MODE_VARIANTS[mode]) for mode in modes}
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+
+    stub = None
+    if args.stub:
+        from urllib.parse import urlparse
+        import swama_stub
+        port = urlparse(args.url).port or 8080
+        stub = swama_stub.serve(port, speed=args.stub_speed, noise=args.stub_noise)
+        print(f"Started Swama stub on port {port} (speed ×{args.stub_speed}, noise {args.stub_noise})")
+
+    summaries = []
+    stability_by_mode = {}
+    sequential = {}
+    records_out = {}
+    for mode, mode_variants in variants.items():
+        samples = load_samples(mode)
+        samples = samples[:args.samples] if args.samples else samples
+        records_by_variant = {}
+        for variant in mode_variants:
+            records = run_variant(mode, variant, samples, args.n, args.url, args.model,
+                                  not args.no_batch, args.workers)
+            records_by_variant[variant["name"]] = records
+            records_out[f"{mode}|{variant['name']}"] = records
+            summary = summarize(mode, variant, records, args.n)
+            if summary:
+                summaries.append(summary)
+        if len(mode_variants) > 1:
+            stability_by_mode[mode] = ranking_stability(records_by_variant, args.n, args.draws, args.seed)
+        if args.sequential_samples:
+            first = records_by_variant[mode_variants[0]["name"]][:args.sequential_samples]
+            if all(r["scores"] for r in first):
+                baseline = time_sequential(mode, mode_variants[0], samples[:len(first)], args.n,
+                                           args.url, args.model)
+                sequential[mode] = (baseline, sum(r["seconds"] for r in first) / len(first))
+
+    if not summaries:
+        print("No variant got all of its completions.")
+        sys.exit(1)
+    print_report(summaries, stability_by_mode, args.n, args.stable, sequential)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "server_url": args.url,
+                "model": args.model,
+                "n": args.n,
+                "summary": summaries,
+                "stability": stability_by_mode,
+                "reps_needed": {mode: reps_needed(rows, args.stable) for mode, rows in stability_by_mode.items()},
+                "samples": records_out,
+            }, f, indent=2)
+        print(f"\nResults saved to: {args.output}")
+
+    if stub:
+        stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
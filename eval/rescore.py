@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+rescore.py — Recompute metrics over saved outputs without re-running inference.
+
+Every results file already stores each sample's cleaned `output`, so a metric
+change (a GLEU fix, new composite weights in eval_styles.COMPOSITE_WEIGHTS,
+a tweak to formality_score, ...) only needs the scoring step re-run. This
+reads a results file (legacy .json or .jsonl), re-scores every sample in
+parallel with a process pool using the harnesses' own scoring functions,
+re-aggregates per-variant metrics and writes a new results file. The
+server is never contacted; latencies are carried over unchanged.
+
+Style samples' `preserve` terms are read from the file's sample records;
+older files don't store them, so they are looked up from the sample
+registry by sample ID.
+
+Usage:
+    # Re-score a grammar run (writes results_jfleg.rescored.jsonl):
+    python rescore.py results_jfleg.json
+
+    # Re-score a style run with different composite weights:
+    python rescore.py style_results_v2.json --weights '{"casual": {"gleu": 0.2, "meaning": 0.4, "informality": 0.3, "stability": 0.1}}'
+
+    # Choose the output path / format and worker count:
+    python rescore.py results_jfleg.json --output results_jfleg_rescored.json --workers 4
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from eval_prompts import aggregate_grammar_metrics, score_grammar_output
+from eval_styles import COMPOSITE_WEIGHTS, aggregate_style_metrics, score_style_output
+from results_io import ResultsWriter, load_results, split_sample
+from sample_registry import build_registry, sample_id
+
+CHUNK_SIZE = 256
+
+
+# ─── Worker ──────────────────────────────────────────────────────────────────
+
+def _rescore_chunk(args):
+    """Re-score a chunk of detail dicts (runs in a worker process)."""
+    mode, details = args
+    rescored = []
+    for d in details:
+        if d.get("error") or d.get("output") is None:
+            rescored.append(d)
+            continue
+        if mode == "grammar":
+            scores = score_grammar_output(d["source"], d["output"], d["references"])
+        else:
+            scores = score_style_output(
+                d["source"], d["output"], d["references"], d.get("preserve", []), mode
+            )
+        rescored.append({**d, **scores})
+    return rescored
+
+
+# ─── Rescoring ───────────────────────────────────────────────────────────────
+
+def rescore_results(data, workers=None, weights=None):
+    """
+    Re-score every variant in a loaded results document (see results_io.load_results).
+
+    Returns a list of {"metrics": ..., "details": ..., "old_metrics": ...}.
+    """
+    registry = None
+    jobs = []
+    for r in data["results"]:
+        mode = r["metrics"].get("mode") or "grammar"
+        if mode != "grammar":
+            for d in r["details"]:
+                if "preserve" in d:
+                    continue
+                # Older files don't store preserve terms; look them up by sample ID
+                registry = registry or build_registry()
+                sid = d.get("sample_id") or sample_id(d["source"])
+                record = registry["samples"].get(sid)
+                d["preserve"] = record["preserve"] if record else []
+        for start in range(0, len(r["details"]), CHUNK_SIZE):
+            jobs.append((mode, r["details"][start:start + CHUNK_SIZE]))
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        chunks = list(pool.map(_rescore_chunk, jobs))
+
+    rescored = []
+    i = 0
+    for r in data["results"]:
+        old = r["metrics"]
+        mode = old.get("mode") or "grammar"
+        details = []
+        while len(details) < len(r["details"]):
+            details.extend(chunks[i])
+            i += 1
+        for d in details:
+            d.pop("variant", None)
+            d.pop("mode", None)
+
+        if mode == "grammar":
+            metrics = aggregate_grammar_metrics(old["variant"], old.get("temperature"), details)
+        else:
+            metrics = aggregate_style_metrics(
+                old["variant"], mode, old.get("temperature"), details,
+                weights=(weights or {}).get(mode),
+            )
+        # Carry over fields recorded at inference time that scoring doesn't produce
+        for key, value in old.items():
+            metrics.setdefault(key, value)
+        rescored.append({"metrics": metrics, "details": details, "old_metrics": old})
+    return rescored
+
+
+def write_rescored(path, run, rescored, source_path):
+    """Write rescored results as JSONL, or as a legacy document for .json paths."""
+    harness = run.get("harness") or "grammar"
+    if path.endswith(".jsonl"):
+        run_info = {k: v for k, v in run.items()
+                    if k not in ("timestamp", "harness", "rescored_from", "original_timestamp")}
+        with ResultsWriter(path, harness, rescored_from=source_path,
+                           original_timestamp=run.get("original_timestamp", run.get("timestamp")),
+                           **run_info) as writer:
+            for r in rescored:
+                mode = r["metrics"].get("mode") or "grammar"
+                for d in r["details"]:
+                    writer.write_detail(r["metrics"]["variant"], mode, d)
+                writer.write_metrics(r["metrics"], mode)
+        return
+
+    # Legacy layout: sample fields once in "samples", slim details per variant
+    samples = {}
+    slim = []
+    for r in rescored:
+        details = []
+        for d in r["details"]:
+            sample, d = split_sample(d)
+            if sample is not None:
+                samples.setdefault(sample["sample_id"], sample)
+            details.append(d)
+        slim.append({"metrics": r["metrics"], "details": details})
+
+    if harness == "style":
+        output_data = {"timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+                       "samples": list(samples.values()), "modes": {}}
+        for r in slim:
+            output_data["modes"].setdefault(r["metrics"]["mode"], []).append(r)
+    else:
+        output_data = {
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "num_samples": run.get("num_samples"),
+            "samples": list(samples.values()),
+            "results": slim,
+        }
+    with open(path, "w") as f:
+        json.dump(output_data, f, indent=2)
+
+
+def print_changes(rescored):
+    """Show old vs new headline metric per variant."""
+    try:
+        from tabulate import tabulate
+    except ImportError:
+        return
+
+    rows = []
+    for r in rescored:
+        new, old = r["metrics"], r["old_metrics"]
+        key = "composite" if "composite" in new else "avg_gleu"
+        rows.append([
+            new["variant"], new.get("mode", "grammar"), key,
+            f"{old.get(key, 0):.4f}", f"{new[key]:.4f}", f"{new[key] - old.get(key, 0):+.4f}",
+        ])
+    print(tabulate(rows, headers=["Variant", "Mode", "Metric", "Old", "New", "Δ"], tablefmt="grid"))
+
+
+# ─── Main ─────────────────────────────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score saved ProseKit results offline")
+    parser.add_argument("input", help="Results file (.json or .jsonl)")
+    parser.add_argument("--output", type=str, default=None,
+                        help="Output path (.jsonl or .json; default: <input>.rescored.jsonl)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes (default: CPU count)")
+    parser.add_argument("--weights", type=str, default=None,
+                        help="JSON object of per-mode composite weights overriding COMPOSITE_WEIGHTS")
+    args = parser.parse_args()
+
+    weights = None
+    if args.weights:
+        weights = json.loads(args.weights)
+        for mode, w in weights.items():
+            if mode not in COMPOSITE_WEIGHTS or set(w) != set(COMPOSITE_WEIGHTS[mode]):
+                print(f"ERROR: weights for '{mode}' must have keys: "
+                      f"{', '.join(COMPOSITE_WEIGHTS.get(mode, {}))}")
+                sys.exit(1)
+
+    output = args.output or os.path.splitext(args.input)[0] + ".rescored.jsonl"
+
+    start = time.time()
+    data = load_results(args.input)
+    rescored = rescore_results(data, workers=args.workers, weights=weights)
+    write_rescored(output, data["run"], rescored, args.input)
+    elapsed = time.time() - start
+
+    n = sum(len(r["details"]) for r in rescored)
+    print(f"Re-scored {n} samples across {len(rescored)} variants in {elapsed:.2f}s")
+    print_changes(rescored)
+    print(f"\nWritten to: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""
+results_io.py — Streaming JSONL results format plus columnar export.
+
+The harnesses used to write a single pretty-printed JSON document at the end
+of a run, which means nothing is on disk until the run finishes and reading it
+back means parsing the whole file. The JSONL format writes one record per line
+as results are produced:
+
+    {"type": "run",     "timestamp": ..., "harness": "grammar", ...}
+    {"type": "sample",  "sample_id": "s_...", "source": ..., "references": [...]}
+    ...
+    {"type": "detail",  "variant": "v2_strict_minimal", "mode": "grammar", "index": 0, "sample_id": "s_...", ...}
+    ...
+    {"type": "metrics", "variant": "v2_strict_minimal", "mode": "grammar", "avg_gleu": ...}
+
+One "sample" record per sample (source, references, preserve — written once,
+not repeated for every variant), one "detail" record per sample-variant and
+one "metrics" record per variant. Readers can stream records without loading
+the file; iter_details() and load_results() attach each sample's fields back
+onto its details (as shared objects, so they are held once in memory too).
+The columnar exports (SQLite always, Parquet when pyarrow is installed) let
+analysis load only the columns it needs.
+
+Older files that repeat source/references on every detail still read the same.
+
+Usage:
+    # Convert a legacy results file to JSONL (writes results_jfleg.jsonl):
+    python results_io.py convert results_jfleg.json
+
+    # Convert and also export columnar copies:
+    python results_io.py convert style_results_v2.json --sqlite style_v2.db --parquet style_v2.parquet
+
+    # Export an existing JSONL file:
+    python results_io.py export results_jfleg.jsonl --sqlite results_jfleg.db
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+
+from sample_registry import sample_id
+
+# Keys that hold lists and are stored as JSON text in columnar exports.
+LIST_COLUMNS = ("references", "preserve")
+
+# Per-sample fields, stored once in "sample" records rather than on every detail.
+SAMPLE_FIELDS = ("source", "references", "preserve")
+
+
+# ─── Samples ─────────────────────────────────────────────────────────────────
+
+def sample_record(sample):
+    """The "sample" record (without "type") for a harness sample or a detail carrying sample fields."""
+    record = {"sample_id": sample.get("sample_id") or sample.get("id") or sample_id(sample["source"])}
+    for key in SAMPLE_FIELDS:
+        if sample.get(key) is not None:
+            record[key] = sample[key]
+    return record
+
+
+def split_sample(detail):
+    """
+    Split a detail that still carries sample fields (older files, rescored
+    details) into (sample_record or None, detail without them).
+    """
+    if not any(key in detail for key in SAMPLE_FIELDS):
+        return None, detail
+    sample = sample_record(detail)
+    stripped = {k: v for k, v in detail.items() if k not in SAMPLE_FIELDS}
+    stripped["sample_id"] = sample["sample_id"]
+    return sample, stripped
+
+
+def attach_sample(detail, samples):
+    """Add a sample's fields back onto a detail (in place) from a sample_id → record table."""
+    sample = samples.get(detail.get("sample_id"))
+    if sample is not None:
+        for key in SAMPLE_FIELDS:
+            if key in sample and key not in detail:
+                detail[key] = sample[key]
+    return detail
+
+
+# ─── Writing ─────────────────────────────────────────────────────────────────
+
+class ResultsWriter:
+    """
+    Append-only JSONL writer. Each record is flushed as soon as it is
+    written, so a crashed or interrupted run still leaves usable results.
+    """
+
+    def __init__(self, path, harness, **run_info):
+        self.path = path
+        self.f = open(path, "w", encoding="utf-8")
+        self.samples_written = set()
+        self._write({
+            "type": "run",
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "harness": harness,
+            **run_info,
+        })
+
+    def _write(self, record):
+        self.f.write(json.dumps(record, ensure_ascii=False))
+        self.f.write("\n")
+        self.f.flush()
+
+    def write_sample(self, sample):
+        """Write a sample's record unless it has already been written."""
+        record = sample_record(sample)
+        if record["sample_id"] not in self.samples_written:
+            self.samples_written.add(record["sample_id"])
+            self._write({"type": "sample", **record})
+
+    def write_samples(self, samples):
+        for sample in samples:
+            self.write_sample(sample)
+
+    def write_detail(self, variant, mode, detail):
+        sample, detail = split_sample(detail)
+        if sample is not None:
+            self.write_sample(sample)
+        self._write({"type": "detail", "variant": variant, "mode": mode, **detail})
+
+    def write_metrics(self, metrics, mode):
+        self._write({"type": "metrics", "mode": mode, **metrics})
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ─── Reading ─────────────────────────────────────────────────────────────────
+
+def _legacy_records(data):
+    """Yield JSONL-style records from a legacy monolithic results document."""
+    for sample in data.get("samples", []):
+        yield {"type": "sample", **sample}
+    if "modes" in data:
+        yield {"type": "run", "timestamp": data.get("timestamp"), "harness": "style"}
+        for mode, results in data["modes"].items():
+            for result in results:
+                variant = result["metrics"]["variant"]
+                for detail in result["details"]:
+                    yield {"type": "detail", "variant": variant, "mode": mode, **detail}
+                yield {"type": "metrics", "mode": mode, **result["metrics"]}
+    else:
+        yield {
+            "type": "run",
+            "timestamp": data.get("timestamp"),
+            "harness": "grammar",
+            "num_samples": data.get("num_samples"),
+        }
+        for result in data["results"]:
+            variant = result["metrics"]["variant"]
+            mode = result["metrics"].get("mode", "grammar")
+            for detail in result["details"]:
+                yield {"type": "detail", "variant": variant, "mode": mode, **detail}
+            yield {"type": "metrics", "mode": mode, **result["metrics"]}
+
+
+def iter_records(path):
+    """
+    Stream records from a results file.
+
+    .jsonl files are read line by line; legacy .json files are parsed once
+    and then yielded in the same record shape, so callers don't care which
+    format they were given.
+    """
+    if path.endswith(".jsonl"):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+    else:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        yield from _legacy_records(data)
+
+
+def iter_details(path, variant=None, mode=None):
+    """
+    Stream only the per-sample detail records, optionally filtered, with
+    their sample's source/references/preserve attached.
+    """
+    samples = {}
+    for record in iter_records(path):
+        if record["type"] == "sample":
+            samples[record["sample_id"]] = record
+            continue
+        if record["type"] != "detail":
+            continue
+        if variant is not None and record["variant"] != variant:
+            continue
+        if mode is not None and record["mode"] != mode:
+            continue
+        yield attach_sample(record, samples)
+
+
+def normalized_records(path):
+    """
+    Like iter_records(), but details in older files that repeat their sample
+    fields are split into one "sample" record per sample plus slim details.
+    """
+    written = set()
+    for record in iter_records(path):
+        if record["type"] == "detail":
+            sample, record = split_sample(record)
+            if sample is not None and sample["sample_id"] not in written:
+                written.add(sample["sample_id"])
+                yield {"type": "sample", **sample}
+        elif record["type"] == "sample":
+            if record["sample_id"] in written:
+                continue
+            written.add(record["sample_id"])
+        yield record
+
+
+def load_results(path):
+    """
+    Load a results file (either format) back into the harness's in-memory
+    shape: {"run": {...}, "results": [{"metrics": ..., "details": [...]}, ...]}.
+
+    Details get their sample's fields attached; the strings and lists are
+    shared with the "samples" table (sample_id → record) that is returned too.
+    """
+    run = {}
+    samples = {}
+    by_variant = {}
+    order = []
+    for record in iter_records(path):
+        kind = record.pop("type")
+        if kind == "run":
+            run = record
+            continue
+        if kind == "sample":
+            samples[record["sample_id"]] = record
+            continue
+        key = (record.get("mode"), record["variant"])
+        if key not in by_variant:
+            by_variant[key] = {"metrics": None, "details": []}
+            order.append(key)
+        if kind == "detail":
+            sample, record = split_sample(record)
+            if sample is not None:
+                # Older files: intern repeated sample fields through the table
+                samples.setdefault(sample["sample_id"], sample)
+            by_variant[key]["details"].append(attach_sample(record, samples))
+        elif kind == "metrics":
+            by_variant[key]["metrics"] = record
+    return {"run": run, "samples": samples, "results": [by_variant[k] for k in order]}
+
+
+# ─── Conversion and Columnar Export ──────────────────────────────────────────
+
+def convert_to_jsonl(src_path, dst_path=None):
+    """Convert a legacy results_*.json file into JSONL. Returns the JSONL path."""
+    if dst_path is None:
+        dst_path = os.path.splitext(src_path)[0] + ".jsonl"
+    count = 0
+    with open(dst_path, "w", encoding="utf-8") as out:
+        for record in normalized_records(src_path):
+            out.write(json.dumps(record, ensure_ascii=False))
+            out.write("\n")
+            count += 1
+    print(f"  {src_path} → {dst_path} ({count} records)")
+    return dst_path
+
+
+def _column_value(key, value):
+    if key in LIST_COLUMNS or isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def _collect_columns(path, kind):
+    """First streaming pass: the ordered union of keys across records of a kind."""
+    columns = {}
+    for record in normalized_records(path):
+        if record["type"] == kind:
+            for key in record:
+                if key != "type":
+                    columns.setdefault(key, None)
+    return list(columns)
+
+
+def export_sqlite(path, db_path):
+    """
+    Export a results file to SQLite with `samples`, `details` and `metrics`
+    tables (join details to samples on sample_id). Two streaming passes
+    (schema, then rows) keep memory flat.
+    """
+    conn = sqlite3.connect(db_path)
+    tables = {"sample": "samples", "detail": "details", "metrics": "metrics"}
+    columns = {kind: _collect_columns(path, kind) for kind in tables}
+    if not columns["sample"]:
+        del tables["sample"]
+    # A run with no details/metrics still gets queryable (empty) tables
+    for kind, minimal in (("detail", ["variant", "mode", "sample_id"]), ("metrics", ["variant", "mode"])):
+        if not columns[kind]:
+            columns[kind] = minimal
+
+    for kind, table in tables.items():
+        cols = ", ".join(f'"{c}"' for c in columns[kind])
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+        conn.execute(f"CREATE TABLE {table} ({cols})")
+    conn.execute("CREATE INDEX idx_details_variant ON details (variant)")
+    if "sample_id" in columns["detail"]:
+        conn.execute("CREATE INDEX idx_details_sample ON details (sample_id)")
+
+    inserts = {
+        kind: (
+            f"INSERT INTO {table} VALUES ({', '.join('?' for _ in columns[kind])})",
+            columns[kind],
+        )
+        for kind, table in tables.items()
+    }
+
+    rows = 0
+    for record in normalized_records(path):
+        if record["type"] not in inserts:
+            continue
+        sql, cols = inserts[record["type"]]
+        conn.execute(sql, [_column_value(c, record.get(c)) for c in cols])
+        rows += 1
+
+    conn.commit()
+    conn.close()
+    print(f"  {path} → {db_path} (SQLite, {rows} rows)")
+
+
+def export_parquet(path, parquet_path):
+    """Export detail records to Parquet (requires pyarrow)."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("ERROR: 'pyarrow' package not installed.")
+        print("Run: pip install pyarrow")
+        sys.exit(1)
+
+    cols = _collect_columns(path, "detail")
+    cols += [c for c in _collect_columns(path, "sample") if c not in cols]
+    data = {c: [] for c in cols}
+    for record in iter_details(path):
+        for c in cols:
+            data[c].append(_column_value(c, record.get(c)))
+
+    pq.write_table(pa.Table.from_pydict(data), parquet_path)
+    print(f"  {path} → {parquet_path} (Parquet, {len(data[cols[0]]) if cols else 0} rows)")
+
+
+def export_columnar(path, columnar_path):
+    """Export by extension: .parquet → Parquet, anything else → SQLite."""
+    if columnar_path.endswith(".parquet"):
+        export_parquet(path, columnar_path)
+    else:
+        export_sqlite(path, columnar_path)
+
+
+# ─── Main ─────────────────────────────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description="ProseKit results format tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_convert = sub.add_parser("convert", help="Convert legacy results_*.json to JSONL")
+    p_convert.add_argument("inputs", nargs="+", help="Legacy results JSON files")
+    p_convert.add_argument("-o", "--output", default=None,
+                           help="Output JSONL path (single input only)")
+    p_convert.add_argument("--sqlite", default=None, help="Also export to this SQLite file")
+    p_convert.add_argument("--parquet", default=None, help="Also export to this Parquet file")
+
+    p_export = sub.add_parser("export", help="Export a results file to a columnar format")
+    p_export.add_argument("input", help="Results file (.jsonl or legacy .json)")
+    p_export.add_argument("--sqlite", default=None, help="SQLite output path")
+    p_export.add_argument("--parquet", default=None, help="Parquet output path")
+
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        if args.output and len(args.inputs) > 1:
+            print("ERROR: --output only works with a single input file")
+            sys.exit(1)
+        if (args.sqlite or args.parquet) and len(args.inputs) > 1:
+            print("ERROR: --sqlite/--parquet only work with a single input file")
+            sys.exit(1)
+        for src in args.inputs:
+            jsonl_path = convert_to_jsonl(src, args.output)
+            if args.sqlite:
+                export_sqlite(jsonl_path, args.sqlite)
+            if args.parquet:
+                export_parquet(jsonl_path, args.parquet)
+
+    elif args.command == "export":
+        if not (args.sqlite or args.parquet):
+            print("ERROR: give --sqlite and/or --parquet")
+            sys.exit(1)
+        if args.sqlite:
+            export_sqlite(args.input, args.sqlite)
+        if args.parquet:
+            export_parquet(args.input, args.parquet)
+
+
+if __name__ == "__main__":
+    main()
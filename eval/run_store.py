@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+run_store.py — Local SQLite history of evaluation runs.
+
+Every run records the model, server URL, a hash of each variant's system
+prompt (with the prompt text stored once), aggregate metrics and every
+per-sample output, indexed by variant, sample ID and timestamp. This links
+results to the prompt text that produced them and replaces hand-comparing
+results_*.json files.
+
+Usage:
+    # Record a run directly from a harness:
+    python eval_prompts.py --builtin --store runs.db
+    python eval_styles.py --store runs.db
+
+    # Import existing results files (prompt text is taken from the current
+    # prompts.py / style_prompts.py, so hashes reflect today's prompts):
+    python run_store.py ingest results_jfleg.json results_v2.json
+
+    # List recorded runs:
+    python run_store.py runs
+
+    # GLEU and p95 latency trend for a variant across runs:
+    python run_store.py trend --variant v2_strict_minimal
+
+    # Every recorded output for one sample:
+    python run_store.py sample s_b9f34adb5458
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+
+from results_io import iter_records, split_sample
+from sample_registry import sample_id
+
+DEFAULT_DB = "runs.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id      INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp   TEXT NOT NULL,
+    harness     TEXT,
+    model       TEXT,
+    server_url  TEXT,
+    source_file TEXT,
+    num_samples INTEGER
+);
+CREATE TABLE IF NOT EXISTS prompts (
+    prompt_hash TEXT PRIMARY KEY,
+    text        TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS variant_runs (
+    run_id      INTEGER NOT NULL REFERENCES runs(run_id),
+    variant     TEXT NOT NULL,
+    mode        TEXT,
+    prompt_hash TEXT REFERENCES prompts(prompt_hash),
+    temperature REAL,
+    avg_gleu    REAL,
+    composite   REAL,
+    avg_latency REAL,
+    p95_latency REAL,
+    errors      INTEGER,
+    metrics     TEXT,
+    PRIMARY KEY (run_id, mode, variant)
+);
+CREATE TABLE IF NOT EXISTS samples (
+    sample_id   TEXT PRIMARY KEY,
+    source      TEXT NOT NULL,
+    refs        TEXT,
+    preserve    TEXT
+);
+CREATE TABLE IF NOT EXISTS sample_outputs (
+    run_id         INTEGER NOT NULL REFERENCES runs(run_id),
+    variant        TEXT NOT NULL,
+    mode           TEXT,
+    sample_id      TEXT,
+    idx            INTEGER,
+    output         TEXT,
+    gleu           REAL,
+    overcorrection REAL,
+    latency        REAL,
+    error          TEXT,
+    detail         TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_runs_timestamp ON runs (timestamp);
+CREATE INDEX IF NOT EXISTS idx_variant_runs_variant ON variant_runs (variant, run_id);
+CREATE INDEX IF NOT EXISTS idx_sample_outputs_sample ON sample_outputs (sample_id);
+CREATE INDEX IF NOT EXISTS idx_sample_outputs_run ON sample_outputs (run_id, variant);
+"""
+
+
+# ─── Helpers ─────────────────────────────────────────────────────────────────
+
+def prompt_hash(text):
+    """Short stable hash of a system prompt."""
+    return "p_" + hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+
+
+def percentile(values, q):
+    """Nearest-rank percentile, matching the harness's p95_latency."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+def known_prompts():
+    """Map variant name → system prompt for every variant defined in the repo."""
+    import prompts
+    import style_prompts
+
+    by_name = {}
+    for module in (prompts, style_prompts):
+        for value in vars(module).values():
+            if isinstance(value, dict) and "name" in value and "system_prompt" in value:
+                by_name[value["name"]] = value["system_prompt"]
+    return by_name
+
+
+def connect(db_path=DEFAULT_DB):
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    return conn
+
+
+# ─── Recording ───────────────────────────────────────────────────────────────
+
+def _begin_run(conn, timestamp, harness, model, server_url, source_file, num_samples):
+    cur = conn.execute(
+        "INSERT INTO runs (timestamp, harness, model, server_url, source_file, num_samples) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (timestamp, harness, model, server_url, source_file, num_samples),
+    )
+    return cur.lastrowid
+
+
+def _store_prompt(conn, text):
+    if text is None:
+        return None
+    h = prompt_hash(text)
+    conn.execute("INSERT OR IGNORE INTO prompts (prompt_hash, text) VALUES (?, ?)", (h, text))
+    return h
+
+
+def _store_sample(conn, sample):
+    """Store a sample's text once (keyed by content-hash ID); details only keep the ID."""
+    conn.execute(
+        "INSERT OR IGNORE INTO samples (sample_id, source, refs, preserve) VALUES (?, ?, ?, ?)",
+        (
+            sample.get("sample_id") or sample.get("id") or sample_id(sample["source"]),
+            sample["source"],
+            json.dumps(sample.get("references") or [], ensure_ascii=False),
+            json.dumps(sample.get("preserve") or [], ensure_ascii=False),
+        ),
+    )
+
+
+def _insert_detail(conn, run_id, variant, mode, detail):
+    sample, detail = split_sample(detail)
+    if sample is not None:
+        _store_sample(conn, sample)
+    sid = detail.get("sample_id")
+    conn.execute(
+        "INSERT INTO sample_outputs (run_id, variant, mode, sample_id, idx, output, gleu, "
+        "overcorrection, latency, error, detail) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            run_id, variant, mode,
+            sid,
+            detail.get("index"),
+            detail.get("output"),
+            detail.get("gleu"),
+            detail.get("overcorrection"),
+            detail.get("latency"),
+            detail.get("error"),
+            json.dumps(detail, ensure_ascii=False),
+        ),
+    )
+
+
+def _insert_variant(conn, run_id, mode, metrics, system_prompt, latencies):
+    p95 = metrics.get("p95_latency")
+    if p95 is None:
+        p95 = percentile(latencies, 0.95)
+    conn.execute(
+        "INSERT OR REPLACE INTO variant_runs (run_id, variant, mode, prompt_hash, temperature, "
+        "avg_gleu, composite, avg_latency, p95_latency, errors, metrics) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            run_id, metrics["variant"], mode,
+            _store_prompt(conn, system_prompt),
+            metrics.get("temperature"),
+            metrics.get("avg_gleu"),
+            metrics.get("composite"),
+            metrics.get("avg_latency"),
+            p95,
+            metrics.get("errors"),
+            json.dumps(metrics),
+        ),
+    )
+
+
+def record_run(db_path, harness, model, server_url, mode_results, prompt_texts,
+               timestamp=None, num_samples=None, source_file=None, samples=None):
+    """
+    Record a finished run.
+
+    Args:
+        mode_results: iterable of (mode, result) where result is the harness's
+                      {"metrics": ..., "details": [...]} dict
+        prompt_texts: variant name → system prompt actually sent
+        samples: the harness samples the details refer to (source/references
+                 are stored once per sample)
+
+    Returns the new run_id.
+    """
+    conn = connect(db_path)
+    with conn:
+        run_id = _begin_run(
+            conn, timestamp or time.strftime("%Y-%m-%d %H:%M:%S"),
+            harness, model, server_url, source_file, num_samples,
+        )
+        for sample in samples or []:
+            _store_sample(conn, sample)
+        for mode, result in mode_results:
+            metrics = result["metrics"]
+            latencies = []
+            for detail in result["details"]:
+                _insert_detail(conn, run_id, metrics["variant"], mode, detail)
+                if detail.get("latency") is not None:
+                    latencies.append(detail["latency"])
+            _insert_variant(conn, run_id, mode, metrics,
+                            prompt_texts.get(metrics["variant"]), latencies)
+    conn.close()
+    print(f"\nRun recorded in {db_path} (run_id={run_id})")
+    return run_id
+
+
+def ingest_file(db_path, path, model=None, server_url=None):
+    """
+    Import a results file (legacy .json or .jsonl), streaming its records.
+
+    Returns the new run_id.
+    """
+    prompts_by_name = known_prompts()
+    conn = connect(db_path)
+    run_id = None
+    latencies = {}
+
+    with conn:
+        for record in iter_records(path):
+            kind = record.pop("type")
+            if kind == "run":
+                run_id = _begin_run(
+                    conn, record.get("timestamp") or "", record.get("harness"),
+                    record.get("model", model), record.get("server_url", server_url),
+                    os.path.basename(path), record.get("num_samples"),
+                )
+            elif kind == "sample":
+                _store_sample(conn, record)
+            elif kind == "detail":
+                variant, mode = record.pop("variant"), record.pop("mode", None)
+                _insert_detail(conn, run_id, variant, mode, record)
+                if record.get("latency") is not None:
+                    latencies.setdefault((mode, variant), []).append(record["latency"])
+            elif kind == "metrics":
+                mode = record.pop("mode", None)
+                _insert_variant(conn, run_id, mode, record,
+                                prompts_by_name.get(record["variant"]),
+                                latencies.pop((mode, record["variant"]), []))
+    conn.close()
+    print(f"  {path} → {db_path} (run_id={run_id})")
+    return run_id
+
+
+# ─── Queries ─────────────────────────────────────────────────────────────────
+
+def list_runs(conn):
+    return conn.execute(
+        "SELECT r.run_id, r.timestamp, r.harness, r.model, r.server_url, r.source_file, "
+        "COUNT(v.variant) AS variants "
+        "FROM runs r LEFT JOIN variant_runs v ON v.run_id = r.run_id "
+        "GROUP BY r.run_id ORDER BY r.timestamp, r.run_id"
+    ).fetchall()
+
+
+def variant_trend(conn, variant=None, mode=None, model=None):
+    """Per-run metrics for a variant (or all variants), oldest first."""
+    sql = (
+        "SELECT r.run_id, r.timestamp, r.model, v.variant, v.mode, v.prompt_hash, "
+        "v.avg_gleu, v.composite, v.avg_latency, v.p95_latency, v.errors "
+        "FROM variant_runs v JOIN runs r ON r.run_id = v.run_id WHERE 1=1"
+    )
+    params = []
+    if variant:
+        sql += " AND v.variant = ?"
+        params.append(variant)
+    if mode:
+        sql += " AND v.mode = ?"
+        params.append(mode)
+    if model:
+        sql += " AND r.model = ?"
+        params.append(model)
+    sql += " ORDER BY v.variant, r.timestamp, r.run_id"
+    return conn.execute(sql, params).fetchall()
+
+
+def get_sample_text(conn, sid):
+    """The stored source/references for a sample ID (None if never recorded)."""
+    return conn.execute("SELECT * FROM samples WHERE sample_id = ?", (sid,)).fetchone()
+
+
+def sample_history(conn, sid):
+    return conn.execute(
+        "SELECT r.run_id, r.timestamp, s.variant, s.output, s.gleu, s.latency, s.error "
+        "FROM sample_outputs s JOIN runs r ON r.run_id = s.run_id "
+        "WHERE s.sample_id = ? ORDER BY s.variant, r.timestamp",
+        (sid,),
+    ).fetchall()
+
+
+def _fmt(value, spec):
+    return format(value, spec) if value is not None else "—"
+
+
+# ─── Main ─────────────────────────────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description="ProseKit run-history database")
+    parser.add_argument("--db", default=DEFAULT_DB, help=f"SQLite file (default: {DEFAULT_DB})")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_ingest = sub.add_parser("ingest", help="Import results files")
+    p_ingest.add_argument("inputs", nargs="+")
+    p_ingest.add_argument("--model", default=None, help="Model ID to record (if not in the file)")
+    p_ingest.add_argument("--url", default=None, help="Server URL to record (if not in the file)")
+
+    sub.add_parser("runs", help="List recorded runs")
+
+    p_trend = sub.add_parser("trend", help="GLEU / p95 latency across runs")
+    p_trend.add_argument("--variant", default=None)
+    p_trend.add_argument("--mode", default=None)
+    p_trend.add_argument("--model", default=None)
+
+    p_sample = sub.add_parser("sample", help="All recorded outputs for a sample ID")
+    p_sample.add_argument("sample_id")
+
+    args = parser.parse_args()
+
+    if args.command == "ingest":
+        for path in args.inputs:
+            ingest_file(args.db, path, model=args.model, server_url=args.url)
+        return
+
+    if not os.path.exists(args.db):
+        print(f"ERROR: no run database at {args.db}")
+        sys.exit(1)
+
+    try:
+        from tabulate import tabulate
+    except ImportError:
+        tabulate = None
+
+    conn = connect(args.db)
+
+    if args.command == "runs":
+        headers = ["Run", "Timestamp", "Harness", "Model", "URL", "Source", "Variants"]
+        rows = [list(r) for r in list_runs(conn)]
+
+    elif args.command == "trend":
+        headers = ["Variant", "Mode", "Run", "Timestamp", "Prompt", "GLEU↑", "ΔGLEU",
+                   "Composite↑", "P95", "ΔP95"]
+        rows = []
+        prev = {}
+        for r in variant_trend(conn, args.variant, args.mode, args.model):
+            key = (r["variant"], r["mode"])
+            last = prev.get(key)
+            d_gleu = d_p95 = None
+            if last is not None:
+                if r["avg_gleu"] is not None and last["avg_gleu"] is not None:
+                    d_gleu = r["avg_gleu"] - last["avg_gleu"]
+                if r["p95_latency"] is not None and last["p95_latency"] is not None:
+                    d_p95 = r["p95_latency"] - last["p95_latency"]
+            prev[key] = r
+            rows.append([
+                r["variant"], r["mode"], r["run_id"], r["timestamp"], r["prompt_hash"],
+                _fmt(r["avg_gleu"], ".4f"), _fmt(d_gleu, "+.4f"),
+                _fmt(r["composite"], ".4f"),
+                _fmt(r["p95_latency"], ".2f") + ("s" if r["p95_latency"] is not None else ""),
+                _fmt(d_p95, "+.2f"),
+            ])
+
+    elif args.command == "sample":
+        sample = get_sample_text(conn, args.sample_id)
+        if sample:
+            print(f"Source: {sample['source']}")
+            for ref in json.loads(sample["refs"] or "[]")[:1]:
+                print(f"Ref[0]: {ref}")
+            print()
+        headers = ["Run", "Timestamp", "Variant", "GLEU", "Latency", "Output"]
+        rows = [
+            [r["run_id"], r["timestamp"], r["variant"], _fmt(r["gleu"], ".3f"),
+             _fmt(r["latency"], ".2f"), (r["output"] or f"ERROR: {r['error']}")[:80]]
+            for r in sample_history(conn, args.sample_id)
+        ]
+
+    conn.close()
+
+    if tabulate:
+        print(tabulate(rows, headers=headers, tablefmt="grid"))
+    else:
+        print("  ".join(headers))
+        for row in rows:
+            print("  ".join(str(c) for c in row))
+
+
+if __name__ == "__main__":
+    main()
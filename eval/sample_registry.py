@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+sample_registry.py — Unified, indexed registry of every ProseKit test sample.
+
+Samples live in several shapes across the repo:
+  - BUILTIN_SAMPLES (builtin_samples.py) — grammar, with references
+  - CONCISE_SAMPLES / CASUAL_SAMPLES / PROFESSIONAL_SAMPLES (style_samples.py)
+  - SAMPLES in iteration-0/test_llm_quality.py — raw text, run in all four modes
+  - JFLEG (loaded at runtime by eval_prompts.py)
+
+The registry normalizes them into one record shape with a stable content-hash
+ID, so caching, resume and result diffing can key on IDs instead of list
+positions. Each record has:
+  - id: "s_" + first 12 hex chars of sha1(normalized source)
+  - source, references, preserve
+  - modes: set of modes the sample is meant for (grammar/concise/casual/professional)
+  - corpora: set of corpora the sample came from (builtin/concise/.../iteration0/jfleg)
+  - category: error type / sample kind (e.g. "homophones", "stability")
+  - length_bucket: short / medium / long / xlong (by word count)
+  - words: word count of the source
+
+Usage:
+    # Summary of everything registered:
+    python sample_registry.py
+
+    # List a subset:
+    python sample_registry.py --mode casual --bucket short --list
+
+    # Look up one sample:
+    python sample_registry.py --id s_3f9a1c0d2b4e
+"""
+
+import argparse
+import hashlib
+import importlib.util
+import os
+import re
+from collections import Counter
+
+MODES = ("grammar", "concise", "casual", "professional")
+
+# Upper word-count bound (inclusive) for each length bucket; anything larger is "xlong".
+LENGTH_BUCKETS = [
+    ("short", 15),
+    ("medium", 40),
+    ("long", 120),
+]
+
+ITERATION0_SCRIPT = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "iteration-0", "test_llm_quality.py"
+)
+
+
+# ─── IDs and Buckets ─────────────────────────────────────────────────────────
+
+def normalize_text(text):
+    """Collapse whitespace so cosmetic differences don't change the ID."""
+    return re.sub(r"\s+", " ", text.strip())
+
+
+def sample_id(source):
+    """Stable content-hash ID for a sample source text."""
+    digest = hashlib.sha1(normalize_text(source).encode("utf-8")).hexdigest()
+    return f"s_{digest[:12]}"
+
+
+def length_bucket(text):
+    """Bucket a text by word count."""
+    words = len(text.split())
+    for name, upper in LENGTH_BUCKETS:
+        if words <= upper:
+            return name
+    return "xlong"
+
+
+def _slug(label):
+    return re.sub(r"[^a-z0-9]+", "_", label.lower()).strip("_")
+
+
+# ─── Registry ────────────────────────────────────────────────────────────────
+
+def new_registry():
+    """Create an empty registry with its indexes."""
+    return {
+        "samples": {},       # id → record (insertion-ordered)
+        "by_mode": {},       # mode → set of ids
+        "by_corpus": {},     # corpus → set of ids
+        "by_bucket": {},     # length bucket → set of ids
+        "by_category": {},   # category → set of ids
+    }
+
+
+def _index(registry, key, value, sid):
+    registry[key].setdefault(value, set()).add(sid)
+
+
+def register_sample(registry, source, references=None, modes=(), corpus="adhoc",
+                    category=None, preserve=None, label=None):
+    """
+    Add one sample to the registry and its indexes.
+
+    A source already registered (same ID) is merged rather than duplicated:
+    its modes and corpora grow, and missing references/preserve are filled in.
+
+    Returns the sample ID.
+    """
+    sid = sample_id(source)
+    record = registry["samples"].get(sid)
+
+    if record is None:
+        record = {
+            "id": sid,
+            "source": source,
+            "references": list(references or []),
+            "preserve": list(preserve or []),
+            "modes": set(),
+            "corpora": set(),
+            "category": category or corpus,
+            "label": label,
+            "length_bucket": length_bucket(source),
+            "words": len(source.split()),
+        }
+        registry["samples"][sid] = record
+        _index(registry, "by_bucket", record["length_bucket"], sid)
+        _index(registry, "by_category", record["category"], sid)
+    else:
+        if not record["references"] and references:
+            record["references"] = list(references)
+        if not record["preserve"] and preserve:
+            record["preserve"] = list(preserve)
+
+    for mode in modes:
+        record["modes"].add(mode)
+        _index(registry, "by_mode", mode, sid)
+    record["corpora"].add(corpus)
+    _index(registry, "by_corpus", corpus, sid)
+
+    return sid
+
+
+def register_samples(registry, samples, corpus, modes, category=None):
+    """
+    Register a list of harness-style sample dicts ({source, references, ...}).
+
+    Returns the list of IDs in the same order as `samples`.
+    """
+    ids = []
+    for sample in samples:
+        ids.append(register_sample(
+            registry,
+            sample["source"],
+            references=sample.get("references"),
+            modes=modes,
+            corpus=corpus,
+            category=sample.get("category", category),
+            preserve=sample.get("preserve"),
+        ))
+    return ids
+
+
+def _style_category(sample, mode):
+    """Style samples whose reference equals the source are stability tests."""
+    source = sample["source"].strip().lower()
+    if any(ref.strip().lower() == source for ref in sample["references"]):
+        return "stability"
+    return mode
+
+
+def load_iteration0_samples(path=ITERATION0_SCRIPT):
+    """Load the SAMPLES list from iteration-0/test_llm_quality.py (no network)."""
+    if not os.path.exists(path):
+        return []
+    spec = importlib.util.spec_from_file_location("iteration0_test_llm_quality", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.SAMPLES
+
+
+def build_registry(include_iteration0=True):
+    """Build the registry from every in-repo corpus (JFLEG is added by the caller)."""
+    from builtin_samples import BUILTIN_SAMPLES
+    from style_samples import CONCISE_SAMPLES, CASUAL_SAMPLES, PROFESSIONAL_SAMPLES
+
+    registry = new_registry()
+    register_samples(registry, BUILTIN_SAMPLES, "builtin", ["grammar"])
+
+    for mode, samples in (("concise", CONCISE_SAMPLES),
+                          ("casual", CASUAL_SAMPLES),
+                          ("professional", PROFESSIONAL_SAMPLES)):
+        for sample in samples:
+            register_sample(
+                registry,
+                sample["source"],
+                references=sample["references"],
+                modes=[mode],
+                corpus=mode,
+                category=_style_category(sample, mode),
+                preserve=sample.get("preserve"),
+            )
+
+    if include_iteration0:
+        for sample in load_iteration0_samples():
+            register_sample(
+                registry,
+                sample["text"],
+                modes=MODES,
+                corpus="iteration0",
+                category=_slug(sample["label"]),
+                label=sample["label"],
+            )
+
+    return registry
+
+
+# ─── Selection ───────────────────────────────────────────────────────────────
+
+def select_ids(registry, mode=None, corpus=None, bucket=None, category=None):
+    """
+    Select sample IDs matching every given filter (set intersection of indexes).
+
+    Returns IDs in registration order.
+    """
+    filters = [
+        ("by_mode", mode),
+        ("by_corpus", corpus),
+        ("by_bucket", bucket),
+        ("by_category", category),
+    ]
+    selected = None
+    for key, value in filters:
+        if value is None:
+            continue
+        ids = registry[key].get(value, set())
+        selected = set(ids) if selected is None else selected & ids
+
+    if selected is None:
+        return list(registry["samples"])
+    return [sid for sid in registry["samples"] if sid in selected]
+
+
+def select(registry, **filters):
+    """Like select_ids(), but returns the records themselves."""
+    return [registry["samples"][sid] for sid in select_ids(registry, **filters)]
+
+
+def get_sample(registry, sid):
+    """Look up a record by ID (None if unknown)."""
+    return registry["samples"].get(sid)
+
+
+def as_harness_samples(records):
+    """Convert registry records back to the {source, references, preserve} shape the harnesses use."""
+    return [
+        {
+            "source": r["source"],
+            "references": r["references"] or [r["source"]],
+            "preserve": r["preserve"],
+            "category": r["category"],
+        }
+        for r in records
+    ]
+
+
+# ─── Main ─────────────────────────────────────────────────────────────────────
+
+def print_summary(registry):
+    samples = registry["samples"]
+    print(f"\n  Registered samples: {len(samples)}")
+    for key, title in (("by_corpus", "Corpus"), ("by_mode", "Mode"),
+                       ("by_bucket", "Length"), ("by_category", "Category")):
+        counts = Counter({value: len(ids) for value, ids in registry[key].items()})
+        print(f"\n  {title}:")
+        for value, count in counts.most_common():
+            print(f"    {value:40s} {count:5d}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ProseKit sample registry")
+    parser.add_argument("--mode", choices=MODES, default=None, help="Filter by mode")
+    parser.add_argument("--corpus", type=str, default=None, help="Filter by corpus")
+    parser.add_argument("--bucket", choices=[b for b, _ in LENGTH_BUCKETS] + ["xlong"],
+                        default=None, help="Filter by length bucket")
+    parser.add_argument("--category", type=str, default=None, help="Filter by category")
+    parser.add_argument("--id", type=str, default=None, help="Show a single sample by ID")
+    parser.add_argument("--list", action="store_true", help="List matching samples")
+    args = parser.parse_args()
+
+    registry = build_registry()
+
+    if args.id:
+        record = get_sample(registry, args.id)
+        if record is None:
+            print(f"Unknown sample ID: {args.id}")
+            return
+        for key, value in record.items():
+            if isinstance(value, set):
+                value = sorted(value)
+            print(f"  {key:14s} {value}")
+        return
+
+    records = select(registry, mode=args.mode, corpus=args.corpus,
+                     bucket=args.bucket, category=args.category)
+
+    if args.list:
+        for r in records:
+            modes = ",".join(sorted(r["modes"]))
+            print(f"  {r['id']}  {r['length_bucket']:6s}  {r['category']:24s}  {modes:30s}  {r['source'][:60]}")
+        print(f"\n  {len(records)} samples")
+    else:
+        print_summary(registry)
+
+
+if __name__ == "__main__":
+    main()
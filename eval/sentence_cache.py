@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+"""
+sentence_cache.py — Sentence-level rewrite cache for edit-and-retry, benchmarked against full reruns.
+
+Users often press the hotkey again after editing one sentence of a
+paragraph, and the whole paragraph goes back to the model. This is a
+reference rewrite path built on the harnesses' prompt variants and
+clean_response() that only sends what changed:
+
+  1. split_sentences() cuts the text after sentence-ending punctuation
+     (skipping common abbreviations) and at line breaks, keeping the
+     whitespace between sentences aside so the text joins back exactly.
+  2. Each sentence is looked up in a SentenceCache under
+     (mode, prompt hash, sentence text, context hash). The prompt hash
+     covers the model, system prompt and temperature; the context hash
+     covers the --context sentences on either side. --context 0 keys on
+     the sentence alone.
+  3. Misses are rewritten concurrently (--workers requests in flight), one
+     sentence per request, and stored; hits are reused as they are. With
+     --context N the N sentences on either side go into the request as
+     read-only context (context_prompt(): the model is told to rewrite
+     only the target sentence), so a sentence is re-sent — and can come
+     back different — when a neighbor it may read differently next to (a
+     pronoun, a repeated opening) changes. A sentence whose request fails
+     keeps its original text and isn't cached.
+
+The benchmark builds paragraphs from the style samples and simulates
+edit-and-retry sessions on them: a first rewrite, then --retries rounds of
+one edit (reword a sentence, delete a word, insert or remove a sentence)
+followed by another rewrite. Every round is run as a full-paragraph rerun
+(one request, as the harnesses send it) and through the cache at each
+--context width. Per mode and width it reports the cache hit rate and
+requests per retry, retry latency for both paths and the speedup, and the
+cold-start cost of the first, all-miss rewrite.
+
+Sentence-by-sentence rewriting can't merge or reorder sentences, which
+Concise mode sometimes does on a full paragraph; compare outputs before
+using it for that mode.
+
+Usage:
+    python sentence_cache.py --modes casual professional --sessions 5
+    python sentence_cache.py --context 0 1 2 --retries 6 --output cache.json
+    python sentence_cache.py --stub --stub-speed 0.05 --stub-slots 4
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from chunked_rewrite import fit_to_line, rewrite_single
+from eval_prompts import clean_response
+from load_test import MODE_VARIANTS, build_workload, find_variant
+from sample_registry import normalize_text
+from swama_client import DEFAULT_MODEL, complete
+
+MAX_TOKENS = 512
+NO_THINK = "/no_think"
+WORKERS = 4
+MAX_ENTRIES = 2048
+STYLE_MODES = ("concise", "casual", "professional")
+
+ABBREVIATIONS = {
+    "mr.", "mrs.", "ms.", "dr.", "prof.", "st.", "vs.", "etc.", "e.g.", "i.e.",
+    "approx.", "inc.", "ltd.", "jr.", "sr.", "no.", "fig.", "cf.",
+}
+
+_END_RE = re.compile(r"[.!?…]+[\"'”’)\]]*[ \t]+|[ \t]*\n\s*")
+_ALPHA_RE = re.compile(r"[^\W\d_]")
+
+
+# ─── Sentence Splitting ──────────────────────────────────────────────────────
+
+def split_sentences(text):
+    """
+    Split text into [(sentence, separator), ...] that joins back to it
+    exactly. Leading whitespace comes back as a ("", whitespace) pair.
+    """
+    body = text.lstrip()
+    pairs = [("", text[:len(text) - len(body)])] if body != text else []
+    start = 0
+    for match in _END_RE.finditer(body):
+        end = match.start() + len(match.group().rstrip())
+        sentence = body[start:end]
+        if "\n" not in match.group() and sentence.split() and sentence.split()[-1].lower() in ABBREVIATIONS:
+            continue
+        pairs.append((sentence, body[end:match.end()]))
+        start = match.end()
+    if start < len(body):
+        rest = body[start:]
+        sentence = rest.rstrip()
+        pairs.append((sentence, rest[len(sentence):]))
+    return pairs
+
+
+def join_sentences(pairs, outputs=None):
+    """Reassemble split_sentences() pairs, substituting outputs (None keeps a sentence)."""
+    outputs = outputs or [None] * len(pairs)
+    return "".join((sentence if output is None else output) + separator
+                   for (sentence, separator), output in zip(pairs, outputs))
+
+
+# ─── Cache ───────────────────────────────────────────────────────────────────
+
+def _digest(*parts):
+    return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def prompt_hash(variant, model=DEFAULT_MODEL):
+    """Hash of everything about the request that isn't the text."""
+    return _digest(model, variant["system_prompt"], repr(variant["temperature"]))
+
+
+def neighbors(sentences, index, width):
+    """The (before, after) lists of up to `width` non-empty sentences around sentences[index]."""
+    if width <= 0:
+        return [], []
+    before = [s for s in sentences[max(0, index - width):index] if s.strip()]
+    after = [s for s in sentences[index + 1:index + 1 + width] if s.strip()]
+    return before, after
+
+
+def context_hash(sentences, index, width):
+    """Hash of the `width` sentences on either side of sentences[index]."""
+    if width <= 0:
+        return ""
+    before, after = neighbors(sentences, index, width)
+    return _digest(*(normalize_text(s) for s in before), "|", *(normalize_text(s) for s in after))
+
+
+def context_prompt(system_prompt, before, after):
+    """
+    The variant's system prompt with the neighboring sentences added as
+    read-only context, ahead of its closing /no_think (the text sent stays
+    the one sentence to rewrite).
+    """
+    if not before and not after:
+        return system_prompt
+    lines = ["The text below is one sentence from a longer passage. The sentences around it are "
+             "given for context only: do not rewrite or repeat them, and return only the "
+             "rewritten sentence."]
+    if before:
+        lines.append("Before: " + " ".join(before))
+    if after:
+        lines.append("After: " + " ".join(after))
+    block = "\n".join(lines)
+    head, marker, tail = system_prompt.rpartition(NO_THINK)
+    if not marker:
+        return f"{system_prompt}\n\n{block}"
+    return f"{head.rstrip()}\n\n{block}\n\n{marker}{tail}"
+
+
+class SentenceCache:
+    """
+    LRU map of (mode, prompt hash, sentence, context hash) → rewrite, with
+    hit/miss counters.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, output):
+        self.entries[key] = output
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else None
+
+
+# ─── Rewriting ───────────────────────────────────────────────────────────────
+
+def rewrite_incremental(text, variant, mode, cache, base_url, model=DEFAULT_MODEL,
+                        context=1, workers=WORKERS, max_tokens=MAX_TOKENS):
+    """
+    Rewrite text sentence by sentence, sending only cache misses. Returns
+    {"text", "latency", "sentences", "hits", "requests", "errors",
+    "completion_tokens"}.
+    """
+    start = time.perf_counter()
+    pairs = split_sentences(text)
+    sentences = [sentence for sentence, _ in pairs]
+    phash = prompt_hash(variant, model)
+
+    outputs = [None] * len(pairs)
+    misses = []
+    hits = 0
+    for i, sentence in enumerate(sentences):
+        if not _ALPHA_RE.search(sentence):
+            continue
+        key = (mode, phash, sentence.strip(), context_hash(sentences, i, context))
+        cached = cache.get(key)
+        if cached is None:
+            misses.append((i, key))
+        else:
+            outputs[i] = cached
+            hits += 1
+
+    def rewrite_sentence(miss):
+        i, key = miss
+        system_prompt = context_prompt(variant["system_prompt"], *neighbors(sentences, i, context))
+        try:
+            result = complete(sentences[i], system_prompt, variant["temperature"], base_url,
+                              model=model, max_tokens=max_tokens, stream=False)
+        except Exception as e:
+            return {"error": str(e)}
+        output = fit_to_line(clean_response(result["text"]), False)
+        if output:
+            cache.put(key, output)
+            outputs[i] = output
+        return {"result": result}
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        rewritten = list(pool.map(rewrite_sentence, misses))
+
+    ok = [r["result"] for r in rewritten if "result" in r]
+    return {
+        "text": join_sentences(pairs, outputs),
+        "latency": time.perf_counter() - start,
+        "sentences": hits + len(misses),
+        "hits": hits,
+        "requests": len(misses),
+        "errors": len(misses) - len(ok),
+        "completion_tokens": sum(r["completion_tokens"] or 0 for r in ok),
+    }
+
+
+# ─── Edit-and-Retry Workload ─────────────────────────────────────────────────
+
+EDIT_WEIGHTS = {"reword": 0.4, "delete_word": 0.3, "insert": 0.15, "remove": 0.15}
+
+
+def apply_edit(text, pool, rng):
+    """One user edit to a paragraph. Returns (edit name, edited text)."""
+    pairs = split_sentences(text)
+    indices = [i for i, (sentence, _) in enumerate(pairs) if _ALPHA_RE.search(sentence)]
+    ops = [op for op in EDIT_WEIGHTS if op != "remove" or len(indices) > 2]
+    op = rng.choices(ops, weights=[EDIT_WEIGHTS[o] for o in ops])[0]
+    i = rng.choice(indices)
+    sentence, separator = pairs[i]
+
+    if op == "reword":
+        pairs[i] = (rng.choice([s for s in pool if s != sentence] or pool), separator)
+    elif op == "delete_word":
+        words = sentence.split(" ")
+        if len(words) > 3:
+            del words[rng.randrange(1, len(words) - 1)]
+        pairs[i] = (" ".join(words), separator)
+    elif op == "insert":
+        pairs.insert(i + 1, (rng.choice(pool), separator or " "))
+        if not separator:
+            pairs[i] = (sentence, " ")
+            pairs[i + 1] = (pairs[i + 1][0], "")
+    else:
+        del pairs[i]
+        if i == len(pairs):
+            last, _ = pairs[-1]
+            pairs[-1] = (last, separator)
+    return op, join_sentences(pairs)
+
+
+def build_paragraph(sources, sentences, rng):
+    """
+    About `sentences` sentences of distinct samples from one mode, joined with
+    spaces. Samples without closing punctuation (chat messages) get a period
+    so they stay separate sentences.
+    """
+    pool = list(sources)
+    rng.shuffle(pool)
+    parts = []
+    count = 0
+    while count < sentences and pool:
+        source = normalize_text(pool.pop())
+        if not re.search(r"[.!?…][\"'”’)\]]*$", source):
+            source += "."
+        parts.append(source)
+        count += max(1, len([s for s, _ in split_sentences(source) if _ALPHA_RE.search(s)]))
+    return " ".join(parts)
+
+
+def run_benchmark(modes, variants, base_url, model=DEFAULT_MODEL, sessions=4, retries=4,
+                  sentences=6, contexts=(0, 1), workers=WORKERS, seed=0):
+    sources = {}
+    for item in build_workload(modes):
+        sources.setdefault(item["mode"], []).append(item["source"])
+
+    records = []
+    for mode in modes:
+        variant = variants[mode]
+        pool = [s for source in sources[mode] for s, _ in split_sentences(normalize_text(source))
+                if _ALPHA_RE.search(s)]
+        caches = {width: SentenceCache() for width in contexts}
+        for session in range(sessions):
+            rng = random.Random(f"{seed}:{mode}:{session}")
+            text = build_paragraph(sources[mode], sentences, rng)
+            for step in range(retries + 1):
+                edit = None
+                if step:
+                    edit, text = apply_edit(text, pool, rng)
+                record = {"mode": mode, "variant": variant["name"], "session": session,
+                          "step": step, "edit": edit, "words": len(text.split())}
+                try:
+                    full = rewrite_single(text, variant, base_url, model)
+                    full.pop("text")
+                    record["full"] = full
+                except Exception as e:
+                    record["full"] = {"error": str(e)}
+                for width in contexts:
+                    try:
+                        result = rewrite_incremental(text, variant, mode, caches[width], base_url,
+                                                     model, width, workers)
+                        result.pop("text")
+                        record[f"context_{width}"] = result
+                    except Exception as e:
+                        record[f"context_{width}"] = {"error": str(e)}
+                records.append(record)
+
+                parts = [f"full {record['full']['latency']:.2f}s" if "latency" in record["full"] else "full ERROR"]
+                for width in contexts:
+                    r = record[f"context_{width}"]
+                    parts.append(f"ctx{width} {r['hits']}/{r['sentences']} hit {r['latency']:.2f}s"
+                                 if "latency" in r else f"ctx{width} ERROR")
+                print(f"  {mode:13s} session {session} step {step} ({edit or 'initial'}): " + " / ".join(parts))
+    return records
+
+
+def _mean(values):
+    values = [v for v in values if v is not None]
+    return sum(values) / len(values) if values else None
+
+
+def summary_rows(records, contexts):
+    groups = {}
+    for r in records:
+        groups.setdefault(r["mode"], []).append(r)
+    rows = []
+    for mode, group in groups.items():
+        cold = [r for r in group if r["step"] == 0]
+        warm = [r for r in group if r["step"] > 0]
+        full_warm = _mean([r["full"].get("latency") for r in warm])
+        full_cold = _mean([r["full"].get("latency") for r in cold])
+        for width in contexts:
+            key = f"context_{width}"
+            inc_warm = [r[key] for r in warm if "latency" in r[key]]
+            inc_cold = [r[key] for r in cold if "latency" in r[key]]
+            sentences = sum(r["sentences"] for r in inc_warm)
+            latency = _mean([r["latency"] for r in inc_warm])
+            cold_latency = _mean([r["latency"] for r in inc_cold])
+            rows.append({
+                "mode": mode,
+                "context": width,
+                "retries": len(warm),
+                "hit_rate": sum(r["hits"] for r in inc_warm) / sentences if sentences else None,
+                "requests": _mean([r["requests"] for r in inc_warm]),
+                "full_latency": full_warm,
+                "incremental_latency": latency,
+                "speedup": full_warm / latency if full_warm and latency else None,
+                "cold_overhead": cold_latency / full_cold if full_cold and cold_latency else None,
+                "full_tokens": _mean([r["full"].get("completion_tokens") for r in warm]),
+                "incremental_tokens": _mean([r["completion_tokens"] for r in inc_warm]),
+                "errors": sum(r["errors"] for r in inc_warm + inc_cold),
+            })
+    return rows
+
+
+def print_report(rows, workers):
+    try:
+        from tabulate import tabulate
+    except ImportError:
+        tabulate = None
+
+    def fmt(value, spec, suffix=""):
+        return f"{value:{spec}}{suffix}" if value is not None else "—"
+
+    headers = ["Mode", "Context", "Retries", "Hit%", "Req/retry", "Full", "Cached",
+               "Speedup", "Decode tok (full/cached)", "Cold cost", "Errors"]
+    table = [[
+        r["mode"], f"±{r['context']}", r["retries"], fmt(r["hit_rate"], ".1%"),
+        fmt(r["requests"], ".1f"), fmt(r["full_latency"], ".2f", "s"),
+        fmt(r["incremental_latency"], ".2f", "s"), fmt(r["speedup"], ".2f", "x"),
+        f"{fmt(r['full_tokens'], '.0f')} / {fmt(r['incremental_tokens'], '.0f')}",
+        fmt(r["cold_overhead"], ".2f", "x"), r["errors"],
+    ] for r in rows]
+
+    print(f"\n{'='*70}")
+    print(f"  FULL RERUN VS SENTENCE CACHE ON RETRIES ({workers} workers)")
+    print(f"{'='*70}")
+    if tabulate:
+        print(tabulate(table, headers=headers, tablefmt="grid"))
+    else:
+        for row in [headers] + table:
+            print("  ".join(str(c) for c in row))
+    print("\n  Cold cost: first (all-miss) rewrite through the cache vs one full request.")
+
+
+# ─── Main ─────────────────────────────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description="Sentence-level rewrite cache on an edit-and-retry workload")
+    parser.add_argument("--url", type=str, default="http://localhost:8080", help="Swama server URL")
+    parser.add_argument("--model", type=str, default=DEFAULT_MODEL, help="Model ID to request")
+    parser.add_argument("--modes", nargs="+", choices=list(MODE_VARIANTS), default=list(STYLE_MODES),
+                        help="Modes to benchmark (default: the style modes)")
+    parser.add_argument("--variant", type=str, action="append", default=[],
+                        help="Variant for a mode as mode=name (default: each mode's lead variant)")
+    parser.add_argument("--sessions", type=int, default=4, help="Edit-and-retry sessions per mode")
+    parser.add_argument("--retries", type=int, default=4, help="Edit-then-rewrite rounds per session")
+    parser.add_argument("--sentences", type=int, default=6, help="Approximate sentences per paragraph")
+    parser.add_argument("--context", type=int, nargs="+", default=[0, 1],
+                        help="Neighbor sentences on each side in the cache key (default: 0 1)")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Sentence requests in flight")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for paragraphs and edits")
+    parser.add_argument("--output", type=str, default=None, help="Save per-step results (JSON)")
+    parser.add_argument("--stub", action="store_true", help="Start an in-process Swama stub on --url's port")
+    parser.add_argument("--stub-speed", type=float, default=1.0, help="Stub delay multiplier (with --stub)")
+    parser.add_argument("--stub-slots", type=int, default=1, help="Stub concurrent slots (with --stub)")
+    args = parser.parse_args()
+
+    names = {}
+    for spec in args.variant:
+        mode, _, name = spec.partition("=")
+        if mode not in MODE_VARIANTS or not name:
+            print(f"ERROR: --variant must be mode=name with mode one of {', '.join(MODE_VARIANTS)}")
+            sys.exit(1)
+        names[mode] = name
+    try:
+        variants = {mode: find_variant(mode, names.get(mode)) for mode in args.modes}
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+
+    stub = None
+    if args.stub:
+        from urllib.parse import urlparse
+        import swama_stub
+        port = urlparse(args.url).port or 8080
+        stub = swama_stub.serve(port, speed=args.stub_speed, slots=args.stub_slots)
+        print(f"Started Swama stub on port {port} (speed ×{args.stub_speed}, {args.stub_slots} slot(s))")
+
+    contexts = sorted(set(args.context))
+    records = run_benchmark(args.modes, variants, args.url, args.model, args.sessions, args.retries,
+                            args.sentences, contexts, args.workers, args.seed)
+    rows = summary_rows(records, contexts)
+    print_report(rows, args.workers)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "server_url": args.url,
+                "model": args.model,
+                "workers": args.workers,
+                "variants": {m: v["name"] for m, v in variants.items()},
+                "summary": rows,
+                "steps": records,
+            }, f, indent=2)
+        print(f"\nResults saved to: {args.output}")
+
+    if stub:
+        stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
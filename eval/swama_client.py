@@ -0,0 +1,432 @@
+"""
+swama_client.py — Shared client for Swama's OpenAI-compatible chat API.
+
+The harnesses' call_swama() functions are thin wrappers around complete(),
+which returns the response text together with the timing and token data the
+analysis tools need:
+
+    {
+        "text": str,                # raw content (not cleaned)
+        "latency": float,           # seconds, request start → last byte
+        "ttft": float | None,       # seconds to first content token (streaming only)
+        "prompt_tokens": int | None,
+        "completion_tokens": int | None,
+        "finish_reason": str | None,
+        "think_tokens": int,        # tokens inside <think>…</think> (0 if none)
+        "think_leak": bool,         # the think block had actual reasoning in it
+        "think_seconds": float,     # time spent generating the think block
+        "attempts": int,            # requests sent (> 1 after a think-budget abort)
+        "wasted_tokens": int,       # think tokens + tokens of aborted attempts
+        "wasted_seconds": float,    # think time + time of aborted attempts
+    }
+
+Requests are streamed (SSE) when asked to, or automatically while a trace is
+being recorded, since TTFT is only observable on a streamed response. When
+the server doesn't report usage on a stream, completion_tokens falls back to
+the number of content chunks (one token per chunk for Swama/MLX).
+
+Think tags: every prompt ends with /no_think, but Qwen3 still sometimes
+reasons inside <think>…</think> — occasionally until max_tokens runs out.
+Streamed responses are watched token by token; with think_budget set, a
+generation still thinking after that many tokens is aborted and re-issued
+(up to think_retries times), and the tokens and seconds spent on it are
+counted as wasted. Non-streamed responses can't be aborted, and their think
+tokens are estimated from the think block's share of the text.
+
+Message layout (build_messages(), the `layout` argument):
+
+    concatenated  one user message "<system prompt>\n\n<text>", as
+                  RewriteEngine.swift sends it (the default)
+    system        a system message with the prompt and a user message with
+                  the text, as iteration-0/test_llm_quality.py used to
+                  send it (its --layout system)
+    text_first    one user message "<text>\n\n<system prompt>" — nothing
+                  static ahead of the input, so no prefix to reuse; the
+                  control for layout_bench.py
+
+complete_n() asks for several completions of one request in a single call
+(the `n` parameter: one prefill, the generations decoded as a batch). A
+server that rejects `n` or returns fewer choices is topped up with parallel
+single requests; each result records whether it came from the batch.
+
+With the first two, every static token (instructions, examples, /no_think)
+precedes the input, so a server-side KV prefix cache can reuse it across
+requests that share the prompt; they differ in the chat-template tokens
+around it. layout_bench.py measures what that reuse is worth.
+"""
+
+import json
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import trace_export
+
+DEFAULT_MODEL = "mlx-community/Qwen3-8B-4bit"
+MESSAGE_LAYOUTS = ("concatenated", "system", "text_first")
+DEFAULT_LAYOUT = "concatenated"
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+_THINK_RE = re.compile(r"<think>(.*?)(?:</think>|$)", re.DOTALL)
+
+
+class ThinkBudgetExceeded(Exception):
+    """A streamed generation was still inside <think> after the token budget."""
+
+    def __init__(self, tokens, seconds, elapsed):
+        super().__init__(f"still thinking after {tokens} tokens")
+        self.tokens = tokens
+        self.seconds = seconds
+        self.elapsed = elapsed
+
+
+def parse_sse_line(line):
+    """
+    Parse one server-sent-events line from a streamed completion.
+
+    Returns the decoded JSON chunk, "[DONE]" at end of stream, or None for
+    blank/comment lines.
+    """
+    if isinstance(line, bytes):
+        line = line.decode("utf-8")
+    line = line.strip()
+    if not line.startswith("data:"):
+        return None
+    data = line[len("data:"):].strip()
+    if data == "[DONE]":
+        return "[DONE]"
+    return json.loads(data)
+
+
+def think_stats(text, completion_tokens=None):
+    """
+    Think-block stats for a finished (non-streamed) response: (tokens, leak).
+
+    Tokens are estimated as the think block's share of completion_tokens, or
+    its whitespace-separated word count when usage isn't known.
+    """
+    match = _THINK_RE.search(text or "")
+    if not match:
+        return 0, False
+    block = match.group(0)
+    if completion_tokens:
+        tokens = round(completion_tokens * len(block) / max(len(text), 1))
+    else:
+        tokens = len(block.split())
+    return tokens, bool(match.group(1).strip())
+
+
+def _read_stream(resp, start, think_budget=None):
+    """
+    Consume a streamed response, watching for a <think> block.
+
+    Returns a dict with text, ttft, usage, finish_reason, chunks, think_tokens,
+    think_seconds and think_leak. Raises ThinkBudgetExceeded (after closing the
+    response) if think_budget is set and the model is still thinking past it.
+    """
+    parts = []
+    ttft = None
+    usage = None
+    finish_reason = None
+    chunks = 0
+
+    tail = ""              # last few characters, to catch tags split across chunks
+    think_started = None   # perf_counter when <think> appeared
+    think_ended = None
+    think_tokens = 0
+    think_chars = []
+
+    for line in resp.iter_lines():
+        chunk = parse_sse_line(line)
+        if chunk is None:
+            continue
+        if chunk == "[DONE]":
+            break
+        if chunk.get("usage"):
+            usage = chunk["usage"]
+        for choice in chunk.get("choices", []):
+            content = (choice.get("delta") or {}).get("content")
+            if content:
+                now = time.perf_counter()
+                if ttft is None:
+                    ttft = now - start
+                parts.append(content)
+                chunks += 1
+
+                tail = (tail + content)[-(len(THINK_CLOSE) + len(content)):]
+                if think_started is None and THINK_OPEN in tail:
+                    think_started = now
+                if think_started is not None and think_ended is None:
+                    think_tokens += 1
+                    think_chars.append(content)
+                    if THINK_CLOSE in tail:
+                        think_ended = now
+                    elif think_budget is not None and think_tokens > think_budget:
+                        resp.close()
+                        raise ThinkBudgetExceeded(think_tokens, now - think_started, now - start)
+            if choice.get("finish_reason"):
+                finish_reason = choice["finish_reason"]
+
+    end = time.perf_counter()
+    inner = "".join(think_chars).replace(THINK_OPEN, "").replace(THINK_CLOSE, "")
+    return {
+        "text": "".join(parts),
+        "ttft": ttft,
+        "usage": usage,
+        "finish_reason": finish_reason,
+        "chunks": chunks,
+        "think_tokens": think_tokens,
+        "think_seconds": ((think_ended or end) - think_started) if think_started else 0.0,
+        "think_leak": bool(inner.strip()),
+    }
+
+
+def _request(url, payload, timeout, stream, start, think_budget):
+    """Send one request and return the result dict (minus retry bookkeeping)."""
+    resp = requests.post(url, json=payload, timeout=timeout, stream=stream)
+    resp.raise_for_status()
+
+    if stream:
+        streamed = _read_stream(resp, start, think_budget)
+        usage = streamed["usage"] or {}
+        text = streamed["text"]
+        ttft = streamed["ttft"]
+        finish_reason = streamed["finish_reason"]
+        completion_tokens = usage.get("completion_tokens", streamed["chunks"])
+        think_tokens = streamed["think_tokens"]
+        think_seconds = streamed["think_seconds"]
+        think_leak = streamed["think_leak"]
+    else:
+        data = resp.json()
+        choice = data["choices"][0]
+        text = choice["message"]["content"]
+        ttft = None
+        usage = data.get("usage") or {}
+        finish_reason = choice.get("finish_reason")
+        completion_tokens = usage.get("completion_tokens")
+        think_tokens, think_leak = think_stats(text, completion_tokens)
+        think_seconds = None
+
+    latency = time.perf_counter() - start
+    if think_seconds is None:
+        # Not streamed: assume the think block took its share of the time
+        share = think_tokens / completion_tokens if completion_tokens else 0.0
+        think_seconds = latency * share
+    return {
+        "text": text.strip(),
+        "latency": latency,
+        "ttft": ttft,
+        "prompt_tokens": usage.get("prompt_tokens"),
+        "completion_tokens": completion_tokens,
+        "finish_reason": finish_reason,
+        "think_tokens": think_tokens,
+        "think_leak": think_leak,
+        "think_seconds": think_seconds,
+    }
+
+
+def build_messages(system_prompt, prompt, layout=DEFAULT_LAYOUT):
+    """Chat messages for one rewrite request in the given layout (see above)."""
+    if layout == "concatenated":
+        return [{"role": "user", "content": f"{system_prompt}\n\n{prompt}"}]
+    if layout == "system":
+        return [{"role": "system", "content": system_prompt}, {"role": "user", "content": prompt}]
+    if layout == "text_first":
+        return [{"role": "user", "content": f"{prompt}\n\n{system_prompt}"}]
+    raise ValueError(f"unknown message layout {layout!r} (expected one of {', '.join(MESSAGE_LAYOUTS)})")
+
+
+def complete(prompt, system_prompt, temperature, base_url, model=DEFAULT_MODEL,
+             max_tokens=512, stream=None, timeout=60, trace=None,
+             think_budget=None, think_retries=1, layout=DEFAULT_LAYOUT, stop=None):
+    """
+    Send one rewrite request and return the result dict described above.
+
+    Args:
+        max_tokens, stop: generation limits (see token_policy.generation_limits())
+        layout: message layout (default: concatenated, matching RewriteEngine.swift)
+        stream: True/False, or None to stream only while tracing is enabled
+                (always streamed when think_budget is set)
+        trace: extra fields for the trace event (variant, sample, ...)
+        think_budget: abort a generation still inside <think> after this many
+                      tokens and re-issue it (None = never abort)
+        think_retries: re-issues allowed after an abort; when exhausted, the
+                       last attempt runs without a budget
+
+    Raises requests.ConnectionError / requests.HTTPError like requests.post().
+    """
+    url = f"{base_url}/v1/chat/completions"
+    if stream is None:
+        stream = trace_export.enabled() or think_budget is not None
+
+    payload = {
+        "model": model,
+        "messages": build_messages(system_prompt, prompt, layout),
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+    }
+    if stop:
+        payload["stop"] = list(stop)
+    if stream:
+        payload["stream"] = True
+
+    wasted_tokens = 0
+    wasted_seconds = 0.0
+    attempts = 0
+    first_start = time.perf_counter()
+    while True:
+        attempts += 1
+        budget = think_budget if stream and attempts <= think_retries else None
+        start = time.perf_counter()
+        result = None
+        error = "request failed"
+        try:
+            result = _request(url, payload, timeout, stream, start, budget)
+        except ThinkBudgetExceeded as e:
+            wasted_tokens += e.tokens
+            wasted_seconds += e.elapsed
+            error = "think budget exceeded"
+        finally:
+            if trace_export.enabled():
+                trace_export.record_request(
+                    start, time.perf_counter() if result is None else start + result["latency"],
+                    ttft=result["ttft"] if result else None,
+                    endpoint=url,
+                    error=None if result else error,
+                    **(trace or {}),
+                )
+        if result is not None:
+            break
+
+    if attempts > 1:
+        # Latency covers every attempt: that's what the user would have waited
+        result["latency"] = time.perf_counter() - first_start
+        if result["ttft"] is not None:
+            result["ttft"] += start - first_start
+    result["attempts"] = attempts
+    result["wasted_tokens"] = wasted_tokens + result["think_tokens"]
+    result["wasted_seconds"] = wasted_seconds + result["think_seconds"]
+    return result
+
+
+def usage_fields(result):
+    """The timing/token fields of a complete() result worth keeping on a detail dict."""
+    fields = {
+        key: result[key]
+        for key in ("ttft", "prompt_tokens", "completion_tokens", "finish_reason")
+        if result.get(key) is not None
+    }
+    if "think_tokens" in result:
+        fields["think_tokens"] = result["think_tokens"]
+        # The rest of the think bookkeeping only when there was something to record
+        if result["think_tokens"] or result["attempts"] > 1:
+            for key in ("think_leak", "think_seconds", "attempts", "wasted_tokens", "wasted_seconds"):
+                fields[key] = result[key]
+    return fields
+
+
+def think_metrics(details):
+    """
+    Think-tag overhead across a variant's details: leak rate, abort rate, and
+    tokens/seconds wasted on reasoning. Empty for runs recorded before the
+    client tracked think tags.
+    """
+    tracked = [d for d in details if not d.get("error") and "think_tokens" in d]
+    if not tracked:
+        return {}
+    n = len(tracked)
+    return {
+        "think_leak_rate": sum(1 for d in tracked if d.get("think_leak")) / n,
+        "think_abort_rate": sum(1 for d in tracked if d.get("attempts", 1) > 1) / n,
+        "avg_think_tokens": sum(d["think_tokens"] for d in tracked) / n,
+        "wasted_tokens": sum(d.get("wasted_tokens", 0) for d in tracked),
+        "wasted_seconds": sum(d.get("wasted_seconds", 0.0) for d in tracked),
+    }
+
+
+def truncation_metrics(details):
+    """
+    Share of a variant's outputs that ran into max_tokens (finish_reason
+    "length"). Those are cut-off answers, not a quality drop, so a run whose
+    budget is too tight shows it here rather than only in its scores. Empty
+    for runs recorded without finish_reason.
+    """
+    tracked = [d for d in details if not d.get("error") and "finish_reason" in d]
+    if not tracked:
+        return {}
+    truncated = sum(1 for d in tracked if d["finish_reason"] == "length")
+    return {"truncated": truncated, "truncated_rate": truncated / len(tracked)}
+
+
+def complete_n(prompt, system_prompt, temperature, base_url, n, model=DEFAULT_MODEL,
+               max_tokens=512, timeout=60, layout=DEFAULT_LAYOUT, stop=None, batch=True, workers=None):
+    """
+    n completions of one request: [result dict, ...] as complete() returns,
+    each with "batched" (it came from a single n-choice response).
+
+    Batched results share the call's latency, and the response's
+    completion_tokens are split between them by text length. Choices the
+    server didn't return (or all n, if it rejects `n` or batch=False) are
+    fetched with parallel complete() calls, `workers` at a time (default n).
+    Not streamed, so ttft is None and think tokens are estimated.
+    """
+    results = []
+    if batch and n > 1:
+        payload = {
+            "model": model,
+            "messages": build_messages(system_prompt, prompt, layout),
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "n": n,
+        }
+        if stop:
+            payload["stop"] = list(stop)
+        start = time.perf_counter()
+        try:
+            resp = requests.post(f"{base_url}/v1/chat/completions", json=payload, timeout=timeout)
+            resp.raise_for_status()
+        except requests.HTTPError:
+            resp = None   # server doesn't take n: fall back below
+        if resp is not None:
+            data = resp.json()
+            latency = time.perf_counter() - start
+            usage = data.get("usage") or {}
+            choices = data.get("choices", [])[:n]
+            total_chars = sum(len(c["message"]["content"]) for c in choices)
+            for choice in choices:
+                text = choice["message"]["content"]
+                completion_tokens = None
+                if usage.get("completion_tokens") is not None:
+                    completion_tokens = round(usage["completion_tokens"] * len(text) / max(total_chars, 1))
+                think_tokens, think_leak = think_stats(text, completion_tokens)
+                share = think_tokens / completion_tokens if completion_tokens else 0.0
+                results.append({
+                    "text": text.strip(),
+                    "latency": latency,
+                    "ttft": None,
+                    "prompt_tokens": usage.get("prompt_tokens"),
+                    "completion_tokens": completion_tokens,
+                    "finish_reason": choice.get("finish_reason"),
+                    "think_tokens": think_tokens,
+                    "think_leak": think_leak,
+                    "think_seconds": latency * share,
+                    "attempts": 1,
+                    "wasted_tokens": think_tokens,
+                    "wasted_seconds": latency * share,
+                    "batched": True,
+                })
+
+    missing = n - len(results)
+    if missing > 0:
+        def one(_):
+            result = complete(prompt, system_prompt, temperature, base_url, model=model,
+                              max_tokens=max_tokens, stream=False, timeout=timeout, layout=layout, stop=stop)
+            result["batched"] = False
+            return result
+
+        with ThreadPoolExecutor(max_workers=workers or missing) as pool:
+            results.extend(pool.map(one, range(missing)))
+    return results
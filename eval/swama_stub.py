@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+swama_stub.py — Local stand-in for Swama's OpenAI-compatible API.
+
+For running the harnesses, load tests and benchmarks offline (CI, a machine
+without the model, or to sanity-check the tooling itself). The stub echoes
+the text to rewrite back as the "rewrite", but takes a realistic amount of
+time to do it:
+
+    service time = overhead + prefill_ms × prompt tokens + decode_ms × output tokens
+
+and only serves --slots requests at a time (Swama/MLX runs one generation at
+a time by default), so concurrent requests queue exactly like they do on the
+real server. The defaults are the rates fitted by latency_breakdown.py on
+results_jfleg.json (Qwen3-8B-4bit on an M-series Mac); --speed scales every
+delay, e.g. --speed 0.1 for quick smoke tests.
+
+Supports /v1/chat/completions (streamed and non-streamed, with usage and
+stop sequences) and /v1/models. Prompts may use either message layout: a
+system message plus the text, or everything in one user message as
+"<system prompt>\\n\\n<text>" (RewriteEngine.swift's layout), in which
+case everything after the prompt's closing /no_think is echoed (or just
+the last paragraph, for prompts without one; or the first, when the
+message ends with /no_think — the text_first layout).
+
+--prefix-cache models a server-side KV prefix cache: prefill is only
+charged for the prompt tokens after the prefix shared with the previous
+request (role boundaries included), as MLX does when it keeps the last
+prompt's cache. Used by layout_bench.py to exercise its cold/warm
+comparison offline.
+
+Non-streamed requests may ask for `n` completions: the prompt is prefilled
+once and the n generations decode as a batch (the request takes as long as
+the longest one). --noise makes repeated completions differ: each output
+word is dropped with probability noise × temperature, so scores vary from
+sample to sample as they do at the harnesses' temperatures.
+
+--think-rate makes that fraction of responses start with a <think> block of
+--think-tokens filler tokens, like Qwen3 ignoring /no_think, for exercising
+the client's think-budget abort offline.
+
+Usage:
+    python swama_stub.py                       # http://localhost:8080
+    python swama_stub.py --port 28100 --speed 0.1
+    python swama_stub.py --slots 4 --error-rate 0.01
+    python swama_stub.py --think-rate 0.2 --think-tokens 300
+    python swama_stub.py --prefix-cache
+    python swama_stub.py --noise 0.2
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_OVERHEAD_MS = 430.0
+DEFAULT_PREFILL_MS = 4.0
+DEFAULT_DECODE_MS = 21.5
+DEFAULT_THINK_TOKENS = 200
+NO_THINK = "/no_think"
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]|\s+")
+
+
+def count_tokens(text):
+    """Word/punctuation count — close enough to BPE for timing purposes."""
+    return sum(1 for piece in _TOKEN_RE.findall(text) if not piece.isspace())
+
+
+def split_tokens(text):
+    """Split text into stream chunks (words with their following whitespace) that join back exactly."""
+    return re.findall(r"\S+\s*|\s+", text)
+
+
+def extract_text(messages):
+    """The text the client asked to rewrite, for either message layout."""
+    user = [m["content"] for m in messages if m.get("role") == "user"]
+    if not user:
+        return ""
+    if any(m.get("role") == "system" for m in messages):
+        return user[-1]
+    _, marker, text = user[-1].rpartition(NO_THINK + "\n\n")
+    if marker:
+        return text
+    if user[-1].rstrip().endswith(NO_THINK):
+        return user[-1].split("\n\n")[0]
+    return user[-1].split("\n\n")[-1]
+
+
+def prompt_pieces(messages):
+    """The prompt as token-ish pieces, with role boundaries, for prefix matching."""
+    pieces = []
+    for m in messages:
+        pieces.append(f"<|{m.get('role')}|>")
+        pieces.extend(p for p in _TOKEN_RE.findall(m.get("content", "")) if not p.isspace())
+    return pieces
+
+
+class StubModel:
+    """Timing model shared by all request threads."""
+
+    def __init__(self, overhead_ms=DEFAULT_OVERHEAD_MS, prefill_ms=DEFAULT_PREFILL_MS,
+                 decode_ms=DEFAULT_DECODE_MS, speed=1.0, slots=1, error_rate=0.0, seed=None,
+                 think_rate=0.0, think_tokens=DEFAULT_THINK_TOKENS, prefix_cache=False, noise=0.0):
+        self.overhead = overhead_ms / 1000 * speed
+        self.prefill = prefill_ms / 1000 * speed
+        self.decode = decode_ms / 1000 * speed
+        self.slots = threading.Semaphore(slots)
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.think_rate = think_rate
+        self.think_tokens = think_tokens
+        self.prefix_cache = prefix_cache
+        self.cached = []
+        self.noise = noise
+
+    def _think_chunks(self):
+        if not self.think_rate or self.random.random() >= self.think_rate:
+            return []
+        filler = ["Okay, ", "the ", "user ", "wants ", "me ", "to ", "fix ", "this. ", "Let ", "me ", "check. "]
+        body = [filler[i % len(filler)] for i in range(self.think_tokens)]
+        return ["<think>\n"] + body + ["\n</think>\n\n"]
+
+    def _chunks(self, messages, temperature):
+        chunks = split_tokens(extract_text(messages))
+        drop = self.noise * temperature
+        if drop and len(chunks) > 1:
+            chunks = [c for c in chunks if self.random.random() >= drop] or chunks[:1]
+        return self._think_chunks() + chunks
+
+    def _prefill_seconds(self, messages):
+        """Prefill time for the prompt; call while holding a slot."""
+        prefill_tokens = count_tokens("".join(m.get("content", "") for m in messages))
+        if self.prefix_cache:
+            pieces = prompt_pieces(messages)
+            reused = 0
+            for a, b in zip(pieces, self.cached):
+                if a != b:
+                    break
+                reused += 1
+            self.cached = pieces
+            prefill_tokens = max(0, len(pieces) - reused)
+        return self.overhead + self.prefill * prefill_tokens
+
+    @staticmethod
+    def _limit(chunks, max_tokens, stop):
+        """Yield (chunk, finish_reason) pairs for chunks cut at max_tokens and the stop sequences."""
+        emitted = 0
+        text = ""
+        for chunk in chunks:
+            if emitted >= max_tokens:
+                yield None, "length"
+                return
+            emitted += 1
+            start = len(text)
+            text += chunk
+            cut = min((i for i in (text.find(s) for s in stop or []) if i >= 0), default=-1)
+            if cut >= 0:
+                if cut > start:
+                    yield chunk[:cut - start], None
+                yield None, "stop"
+                return
+            yield chunk, None
+        yield None, "stop"
+
+    def generate(self, messages, max_tokens, stop=None, temperature=0.0):
+        """Yield (chunk, finish_reason) pairs, sleeping like a real model would."""
+        chunks = self._chunks(messages, temperature)
+        with self.slots:
+            time.sleep(self._prefill_seconds(messages))
+            for chunk, finish in self._limit(chunks, max_tokens, stop):
+                if chunk is not None:
+                    time.sleep(self.decode)
+                yield chunk, finish
+
+    def generate_batch(self, messages, max_tokens, stop=None, temperature=0.0, n=1):
+        """
+        n completions of one prompt as [(text, finish_reason, tokens), ...]:
+        one prefill, then the n generations decoded side by side.
+        """
+        results = []
+        for _ in range(n):
+            parts = []
+            finish_reason = "stop"
+            for chunk, finish in self._limit(self._chunks(messages, temperature), max_tokens, stop):
+                if chunk is not None:
+                    parts.append(chunk)
+                if finish:
+                    finish_reason = finish
+            results.append(("".join(parts), finish_reason, len(parts)))
+        with self.slots:
+            time.sleep(self._prefill_seconds(messages) + self.decode * max(r[2] for r in results))
+        return results
+
+
+def make_handler(model, model_id):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip("/") == "/v1/models":
+                self._send_json(200, {"object": "list", "data": [{"id": model_id, "object": "model"}]})
+            else:
+                self._send_json(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            if self.path.rstrip("/") != "/v1/chat/completions":
+                self._send_json(404, {"error": {"message": "not found"}})
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            messages = body.get("messages", [])
+            max_tokens = body.get("max_tokens") or 512
+            stop = body.get("stop") or []
+            if isinstance(stop, str):
+                stop = [stop]
+            temperature = body.get("temperature") or 0.0
+            n = body.get("n") or 1
+
+            if model.error_rate and model.random.random() < model.error_rate:
+                self._send_json(503, {"error": {"message": "stub: injected failure"}})
+                return
+
+            prompt_tokens = count_tokens("".join(m.get("content", "") for m in messages))
+            if body.get("stream"):
+                if n != 1:
+                    self._send_json(400, {"error": {"message": "stub: n > 1 is not supported when streaming"}})
+                    return
+                self._stream(model.generate(messages, max_tokens, stop, temperature), prompt_tokens)
+                return
+
+            results = model.generate_batch(messages, max_tokens, stop, temperature, n)
+            completion_tokens = sum(tokens for _, _, tokens in results)
+            self._send_json(200, {
+                "object": "chat.completion",
+                "model": model_id,
+                "choices": [{"index": i, "finish_reason": finish_reason,
+                             "message": {"role": "assistant", "content": text}}
+                            for i, (text, finish_reason, _) in enumerate(results)],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens},
+            })
+
+        def _stream(self, chunks, prompt_tokens):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+
+            def event(payload):
+                self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+            completion_tokens = 0
+            for chunk, finish in chunks:
+                if chunk is not None:
+                    completion_tokens += 1
+                    event({"model": model_id, "choices": [{"index": 0, "delta": {"content": chunk}}]})
+                if finish:
+                    event({"model": model_id,
+                           "choices": [{"index": 0, "delta": {}, "finish_reason": finish}],
+                           "usage": {"prompt_tokens": prompt_tokens,
+                                     "completion_tokens": completion_tokens,
+                                     "total_tokens": prompt_tokens + completion_tokens}})
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def serve(port=8080, host="127.0.0.1", model_id="stub", **model_args):
+    """Start the stub in a background thread. Returns the server (call .shutdown() to stop)."""
+    server = ThreadingHTTPServer((host, port), make_handler(StubModel(**model_args), model_id))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ─── Main ─────────────────────────────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stub of Swama's OpenAI-compatible API")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--model", type=str, default="stub", help="Model ID to report")
+    parser.add_argument("--overhead-ms", type=float, default=DEFAULT_OVERHEAD_MS,
+                        help="Fixed per-request time")
+    parser.add_argument("--prefill-ms", type=float, default=DEFAULT_PREFILL_MS,
+                        help="Time per prompt token")
+    parser.add_argument("--decode-ms", type=float, default=DEFAULT_DECODE_MS,
+                        help="Time per output token")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Multiply every delay by this (0 = instant)")
+    parser.add_argument("--slots", type=int, default=1,
+                        help="Requests served at once; the rest queue")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Fraction of requests answered with HTTP 503")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--think-rate", type=float, default=0.0,
+                        help="Fraction of responses that open with a <think> block")
+    parser.add_argument("--think-tokens", type=int, default=DEFAULT_THINK_TOKENS,
+                        help="Tokens of reasoning in each <think> block")
+    parser.add_argument("--prefix-cache", action="store_true",
+                        help="Only charge prefill for tokens past the prefix shared with the previous prompt")
+    parser.add_argument("--noise", type=float, default=0.0,
+                        help="Drop each output word with probability noise × temperature")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(
+        (args.host, args.port),
+        make_handler(StubModel(args.overhead_ms, args.prefill_ms, args.decode_ms,
+                               args.speed, args.slots, args.error_rate, args.seed,
+                               args.think_rate, args.think_tokens, args.prefix_cache, args.noise), args.model),
+    )
+    server.daemon_threads = True
+    print(f"Swama stub on http://{args.host}:{args.port} "
+          f"(speed ×{args.speed}, {args.slots} slot{'s' if args.slots != 1 else ''})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+think_report.py — How much generation goes to <think> blocks, per variant.
+
+Every prompt ends with /no_think, but Qwen3 still sometimes reasons inside
+<think>…</think> before answering; clean_response() strips the block, so it
+never shows up in the scores — only in the latency. swama_client records
+per sample how many tokens and seconds went to the think block and, when a
+run used --think-budget, how many attempts were aborted and re-issued. This
+report summarizes that per variant:
+
+  - leak rate: samples whose think block had actual reasoning in it
+  - think tokens per leak (mean, p50, p95) — pick --think-budget above the
+    p95 of think blocks that finished on their own
+  - abort rate: samples re-issued after hitting --think-budget
+  - wasted tokens and seconds (think blocks + aborted attempts), and the
+    share of the variant's total latency they account for
+  - truncated: leaks that ran into max_tokens (finish_reason "length")
+
+Results files from before think tracking carry no think data; their variants
+are listed as untracked.
+
+Usage:
+    python think_report.py run.jsonl
+    python think_report.py grammar.jsonl styles.jsonl --mode casual
+    python eval_prompts.py --builtin --think-budget 128 --output budget.jsonl
+    python think_report.py budget.jsonl
+"""
+
+import argparse
+import os
+
+from results_io import load_results
+from run_store import percentile
+
+
+# ─── Summarizing ─────────────────────────────────────────────────────────────
+
+def summarize_variant(details):
+    """Think-overhead summary for one variant's details (None if untracked)."""
+    scored = [d for d in details if not d.get("error")]
+    tracked = [d for d in scored if "think_tokens" in d]
+    if not tracked:
+        return None
+    leaks = [d for d in tracked if d.get("think_leak")]
+    leak_tokens = [d["think_tokens"] for d in leaks]
+    total_latency = sum(d.get("latency") or 0.0 for d in tracked)
+    wasted_seconds = sum(d.get("wasted_seconds", 0.0) for d in tracked)
+    return {
+        "samples": len(tracked),
+        "leaks": len(leaks),
+        "leak_rate": len(leaks) / len(tracked),
+        "mean_think_tokens": sum(leak_tokens) / len(leak_tokens) if leak_tokens else None,
+        "p50_think_tokens": percentile(leak_tokens, 0.5),
+        "p95_think_tokens": percentile(leak_tokens, 0.95),
+        "aborted": sum(1 for d in tracked if d.get("attempts", 1) > 1),
+        "truncated": sum(1 for d in leaks if d.get("finish_reason") == "length"),
+        "wasted_tokens": sum(d.get("wasted_tokens", 0) for d in tracked),
+        "wasted_seconds": wasted_seconds,
+        "wasted_share": wasted_seconds / total_latency if total_latency else 0.0,
+    }
+
+
+def summarize(paths, mode=None, variant=None):
+    """Rows of (path, mode, variant, summary-or-None) for every variant in the files."""
+    rows = []
+    for path in paths:
+        data = load_results(path)
+        for result in data["results"]:
+            details = result["details"]
+            metrics = result["metrics"] or {}
+            first = details[0] if details else {}
+            row_mode = metrics.get("mode") or first.get("mode") or data["run"].get("mode")
+            name = metrics.get("variant") or first.get("variant")
+            if mode and row_mode != mode:
+                continue
+            if variant and name != variant:
+                continue
+            rows.append((path, row_mode, name, summarize_variant(details)))
+    return rows
+
+
+# ─── Reporting ───────────────────────────────────────────────────────────────
+
+def print_report(rows):
+    try:
+        from tabulate import tabulate
+    except ImportError:
+        tabulate = None
+
+    def tokens(value):
+        return f"{value:.0f}" if value is not None else "—"
+
+    headers = ["Variant", "Mode", "Samples", "Leak%", "Think tok (mean/p50/p95)",
+               "Aborted", "Truncated", "Wasted tok", "Wasted s", "% of latency"]
+    table = []
+    untracked = []
+    several_files = len({path for path, _, _, _ in rows}) > 1
+    for path, mode, name, s in rows:
+        if s is None:
+            untracked.append(f"{name} ({path})")
+            continue
+        label = f"{name} [{os.path.basename(path)}]" if several_files else name
+        table.append([
+            label, mode or "—", s["samples"], f"{s['leak_rate']:.1%}",
+            f"{tokens(s['mean_think_tokens'])} / {tokens(s['p50_think_tokens'])} / "
+            f"{tokens(s['p95_think_tokens'])}",
+            s["aborted"], s["truncated"], s["wasted_tokens"],
+            f"{s['wasted_seconds']:.1f}", f"{s['wasted_share']:.1%}",
+        ])
+
+    print(f"\n{'='*70}")
+    print("  THINK-TAG OVERHEAD")
+    print(f"{'='*70}")
+    if table:
+        if tabulate:
+            print(tabulate(table, headers=headers, tablefmt="grid"))
+        else:
+            for row in [headers] + table:
+                print("  ".join(str(c) for c in row))
+    else:
+        print("  No variants with think tracking.")
+
+    if untracked:
+        print("\n  No think data (recorded before think tracking):")
+        for label in untracked:
+            print(f"    {label}")
+
+    tracked = [s for _, _, _, s in rows if s]
+    if tracked:
+        total_tokens = sum(s["wasted_tokens"] for s in tracked)
+        total_seconds = sum(s["wasted_seconds"] for s in tracked)
+        leaks = sum(s["leaks"] for s in tracked)
+        samples = sum(s["samples"] for s in tracked)
+        print(f"\n  Overall: {leaks}/{samples} samples leaked ({leaks / samples:.1%}), "
+              f"{total_tokens:,} tokens and {total_seconds:.1f}s wasted.")
+
+
+# ─── Main ─────────────────────────────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-variant <think> leak rate and wasted generation")
+    parser.add_argument("inputs", nargs="+", help="Results files (.json or .jsonl)")
+    parser.add_argument("--mode", type=str, default=None, help="Only this mode")
+    parser.add_argument("--variant", type=str, default=None, help="Only this variant")
+    args = parser.parse_args()
+
+    print_report(summarize(args.inputs, args.mode, args.variant))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+token_policy.py — max_tokens and stop sequences per mode and input length.
+
+Every request used to go out with max_tokens=512, whatever its length or
+mode, so a generation that runs away (a <think> block despite /no_think,
+the model continuing with another "Input: …" example, an explanation after
+the rewrite) burns the whole budget before it stops. The adaptive policy
+sizes the budget from the input instead:
+
+    max_tokens = ratio × input tokens + slack, within [MIN_TOKENS, MAX_TOKENS]
+
+with ratios from how long the references are relative to their sources
+(Concise never needs more than the input, Grammar ~1.3×, Professional
+expands chat shorthand the most); the slack covers an empty think block
+and tokenizer differences (input tokens are estimated with
+latency_breakdown.estimate_tokens()). Stop sequences cut the continuations
+the prompts invite — another few-shot "Input:", a trailing "Note:" or
+"Explanation:" — except any that occur in the input itself.
+
+The harnesses (eval_prompts.py, eval_styles.py, load_test.py,
+quick_test.py, iteration-0/test_llm_quality.py) take --token-policy
+adaptive (default: fixed, 512 as before, so runs stay comparable with
+saved results; test_llm_quality.py used to allow 2048);
+generation_limits() is the one place the policy lives. A <think> leak
+longer than the slack now ends in a truncated answer instead of a slow
+one: clean_response() drops the unclosed think block and the harnesses
+report the share of outputs that hit max_tokens, so a tight budget shows
+as truncation rather than a quality drop. Add a --think-budget below the
+budget to re-issue those instead.
+
+The report below runs over saved results: per variant, how many outputs
+the adaptive budget would have cut short (their tokens exceed it), how
+many already hit the run's own limit (finish_reason "length"), and the
+decode time saved on runaway outputs (tokens past the budget × the decode
+rate fitted from the run, via latency_breakdown.fit_rates()). Runs made
+with --token-policy adaptive record each sample's budget; run the same
+variants both ways and compare with diff_results.py for measured latency.
+
+Usage:
+    python token_policy.py results_jfleg_v2.json style_results_v2.json
+    python eval_prompts.py --builtin --token-policy adaptive --output adaptive.jsonl
+    python token_policy.py adaptive.jsonl --mode grammar
+"""
+
+import argparse
+import math
+
+from latency_breakdown import collect_points, estimate_tokens, fit_rates
+from results_io import load_results
+
+FIXED_MAX_TOKENS = 512
+MIN_TOKENS = 32
+MAX_TOKENS = 4096
+DEFAULT_DECODE_S = 0.0215
+TOKEN_POLICIES = ("fixed", "adaptive")
+
+COMMON_STOPS = ("\nInput:", "\n\nNote:", "\n\nExplanation:")
+
+POLICY = {
+    "grammar": {"ratio": 1.3, "slack": 16, "stop": COMMON_STOPS + ("\n\nCorrections:", "\n\nChanges:")},
+    "concise": {"ratio": 1.0, "slack": 16, "stop": COMMON_STOPS},
+    "casual": {"ratio": 1.5, "slack": 16, "stop": COMMON_STOPS},
+    "professional": {"ratio": 2.0, "slack": 24, "stop": COMMON_STOPS},
+}
+
+
+# ─── Policy ──────────────────────────────────────────────────────────────────
+
+def generation_limits(mode, text, policy="fixed"):
+    """
+    {"max_tokens", "stop"} for one request. "fixed" is the old behavior
+    (512, no stop sequences).
+    """
+    if policy == "fixed":
+        return {"max_tokens": FIXED_MAX_TOKENS, "stop": None}
+    if policy != "adaptive":
+        raise ValueError(f"unknown token policy {policy!r} (expected one of {', '.join(TOKEN_POLICIES)})")
+    rule = POLICY[mode]
+    budget = math.ceil(rule["ratio"] * estimate_tokens(text)) + rule["slack"]
+    return {
+        "max_tokens": min(MAX_TOKENS, max(MIN_TOKENS, budget)),
+        "stop": [s for s in rule["stop"] if s not in text] or None,
+    }
+
+
+# ─── Report ──────────────────────────────────────────────────────────────────
+
+def _decode_rate(data):
+    points = [p for group in collect_points(data)[0].values() for p in group]
+    rates = fit_rates(points) if points else None
+    if rates and rates["decode_per_token"] and rates["decode_per_token"] > 0:
+        return rates["decode_per_token"]
+    return DEFAULT_DECODE_S
+
+
+def summarize(paths, mode=None):
+    rows = []
+    for path in paths:
+        data = load_results(path)
+        decode = _decode_rate(data)
+        for result in data["results"]:
+            metrics = result["metrics"] or {}
+            variant_mode = metrics.get("mode") or "grammar"
+            if mode and variant_mode != mode:
+                continue
+            scored = [d for d in result["details"]
+                      if not d.get("error") and d.get("output") is not None and d.get("source")]
+            if not scored:
+                continue
+            cut = 0
+            cut_tokens = 0
+            hit_limit = 0
+            budgets = []
+            for d in scored:
+                tokens = d.get("completion_tokens")
+                if tokens is None:
+                    tokens = estimate_tokens(d["output"])
+                budget = d.get("max_tokens") or generation_limits(variant_mode, d["source"], "adaptive")["max_tokens"]
+                budgets.append(budget)
+                if tokens > budget:
+                    cut += 1
+                    cut_tokens += tokens - budget
+                if d.get("finish_reason") == "length":
+                    hit_limit += 1
+            rows.append({
+                "file": path,
+                "mode": variant_mode,
+                "variant": metrics.get("variant"),
+                "samples": len(scored),
+                "avg_budget": sum(budgets) / len(budgets),
+                "cut_rate": cut / len(scored),
+                "length_rate": hit_limit / len(scored),
+                "saved_seconds": cut_tokens * decode,
+                "avg_latency": metrics.get("avg_latency"),
+            })
+    return rows
+
+
+def print_report(rows):
+    try:
+        from tabulate import tabulate
+    except ImportError:
+        tabulate = None
+
+    headers = ["Variant", "Mode", "Samples", "Adaptive budget", "Would cut", "Hit limit",
+               "Decode saved", "Avg latency"]
+    table = [[
+        r["variant"], r["mode"], r["samples"], f"{r['avg_budget']:.0f}", f"{r['cut_rate']:.1%}",
+        f"{r['length_rate']:.1%}", f"{r['saved_seconds']:.1f}s",
+        f"{r['avg_latency']:.2f}s" if r["avg_latency"] is not None else "—",
+    ] for r in rows]
+
+    print(f"\n{'='*70}")
+    print("  ADAPTIVE MAX_TOKENS ON SAVED OUTPUTS")
+    print(f"{'='*70}")
+    if tabulate:
+        print(tabulate(table, headers=headers, tablefmt="grid"))
+    else:
+        for row in [headers] + table:
+            print("  ".join(str(c) for c in row))
+    print("\n  Would cut: outputs longer than the adaptive budget (truncated under the policy).")
+    print("  Hit limit: outputs that already stopped at the run's own max_tokens.")
+
+
+# ─── Main ─────────────────────────────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description="Truncation and decode time under the adaptive max_tokens policy")
+    parser.add_argument("inputs", nargs="+", help="Results files (.json or .jsonl)")
+    parser.add_argument("--mode", type=str, default=None, help="Only this mode")
+    args = parser.parse_args()
+
+    rows = summarize(args.inputs, args.mode)
+    if not rows:
+        print("No scored outputs found.")
+        return
+    print_report(rows)
+
+
+if __name__ == "__main__":
+    main()
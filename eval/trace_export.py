@@ -0,0 +1,134 @@
+"""
+trace_export.py — Chrome trace / Perfetto export of request timelines.
+
+Every model request is recorded as a trace event with its start, time to
+first token (TTFT) and end, plus the endpoint, variant and sample. The
+output is Chrome trace JSON: open it at https://ui.perfetto.dev (or
+chrome://tracing) to see concurrency, gaps between requests and stragglers.
+
+Each request becomes:
+  - a complete ("X") slice named after the variant, on the lane (thread) that issued it
+  - nested "prefill" (start → first token) and "decode" (first token → end) slices
+    when TTFT is known (streaming requests)
+  - an update of the "in_flight" counter track, which shows queueing and
+    head-of-line blocking once requests overlap
+
+Recording is off until start() is called (the harnesses' --trace flag), and
+record_request() is then safe to call from multiple threads.
+
+This module has no dependencies so iteration-0/test_llm_quality.py can use it.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+_recorder = None
+
+
+class TraceRecorder:
+    def __init__(self, process_name="prosekit-eval"):
+        self.process_name = process_name
+        self.origin = time.perf_counter()
+        self.events = []
+        self.lanes = {}
+        self.in_flight = []  # (timestamp_us, +1/-1) deltas, resolved on save
+        self.lock = threading.Lock()
+
+    def _us(self, t):
+        return round((t - self.origin) * 1_000_000, 1)
+
+    def _lane(self):
+        ident = threading.get_ident()
+        if ident not in self.lanes:
+            self.lanes[ident] = len(self.lanes)
+        return self.lanes[ident]
+
+    def record_request(self, start, end, ttft=None, endpoint=None, variant=None,
+                       sample=None, error=None, **args):
+        """
+        Record one request. start/end are time.perf_counter() values; ttft is
+        seconds from start to the first token (None if not streamed).
+        """
+        ts, te = self._us(start), self._us(end)
+        event_args = {"endpoint": endpoint, "variant": variant, "sample": sample}
+        if ttft is not None:
+            event_args["ttft_ms"] = round(ttft * 1000, 2)
+        if error:
+            event_args["error"] = error
+        event_args.update(args)
+
+        with self.lock:
+            tid = self._lane()
+            self.events.append({
+                "name": variant or "request",
+                "cat": "error" if error else "request",
+                "ph": "X", "ts": ts, "dur": round(max(te - ts, 0.0), 1),
+                "pid": 1, "tid": tid, "args": event_args,
+            })
+            if ttft is not None:
+                tf = self._us(start + ttft)
+                self.events.append({
+                    "name": "prefill", "cat": "phase", "ph": "X",
+                    "ts": ts, "dur": round(max(tf - ts, 0.0), 1), "pid": 1, "tid": tid,
+                })
+                self.events.append({
+                    "name": "decode", "cat": "phase", "ph": "X",
+                    "ts": tf, "dur": round(max(te - tf, 0.0), 1), "pid": 1, "tid": tid,
+                })
+            self.in_flight.append((ts, 1))
+            self.in_flight.append((te, -1))
+
+    def to_json(self):
+        metadata = [{"name": "process_name", "ph": "M", "pid": 1,
+                     "args": {"name": self.process_name}}]
+        for lane in self.lanes.values():
+            metadata.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": lane,
+                             "args": {"name": f"lane {lane}"}})
+
+        counter = []
+        level = 0
+        # Ends sort before starts at the same timestamp so back-to-back
+        # sequential requests don't show a spurious in_flight=2
+        for ts, delta in sorted(self.in_flight, key=lambda e: (e[0], e[1])):
+            level += delta
+            counter.append({"name": "in_flight", "ph": "C", "ts": ts, "pid": 1,
+                            "args": {"requests": level}})
+
+        return {
+            "traceEvents": metadata + self.events + counter,
+            "displayTimeUnit": "ms",
+        }
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_json(), f)
+        requests = sum(1 for e in self.events if e["cat"] in ("request", "error"))
+        print(f"\nTrace with {requests} requests saved to: {path}")
+        print("  Open in https://ui.perfetto.dev or chrome://tracing")
+
+
+# ─── Module-level Recorder ───────────────────────────────────────────────────
+
+def start(process_name=None):
+    """Start recording (replaces any previous recorder)."""
+    global _recorder
+    _recorder = TraceRecorder(process_name or os.path.basename(sys.argv[0]) or "prosekit-eval")
+    return _recorder
+
+
+def enabled():
+    return _recorder is not None
+
+
+def record_request(start, end, **kwargs):
+    """Record a request on the active recorder (no-op when tracing is off)."""
+    if _recorder is not None:
+        _recorder.record_request(start, end, **kwargs)
+
+
+def save(path):
+    if _recorder is not None:
+        _recorder.save(path)
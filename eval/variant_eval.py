@@ -0,0 +1,88 @@
+"""
+variant_eval.py — Scored, streamed runs of one prompt over a mode's samples.
+
+The experiment scripts (dynamic_fewshot.py, model_matrix.py,
+repeat_sampling.py) all need the same loop the harnesses run — send each
+sample, clean and score the output, aggregate like eval_prompts.py /
+eval_styles.py — for any mode and with the prompt chosen per sample. It
+lives here so they don't import each other:
+
+    load_samples(mode)    builtin samples for Grammar, style_samples otherwise
+    score_sample(...)     the harness's per-sample metrics for one output
+    evaluate(...)         a variant (or per-sample prompt) over the samples,
+                          returning {"metrics", "details"} like the harnesses
+
+evaluate() streams every request (for TTFT) and takes the same layout and
+token_policy settings as the harnesses (see swama_client.build_messages()
+and token_policy.generation_limits()); under the adaptive policy each
+detail records its max_tokens, as in eval_prompts.py.
+"""
+
+from eval_prompts import aggregate_grammar_metrics, clean_response, score_grammar_output
+from eval_styles import aggregate_style_metrics, score_style_output
+from latency_breakdown import estimate_tokens
+from run_store import percentile
+from sample_registry import sample_id
+from swama_client import DEFAULT_LAYOUT, DEFAULT_MODEL, complete, usage_fields
+from token_policy import generation_limits
+
+
+def load_samples(mode):
+    """The mode's scoring samples: builtin for Grammar, style_samples otherwise."""
+    if mode == "grammar":
+        from builtin_samples import BUILTIN_SAMPLES
+        return BUILTIN_SAMPLES
+    import style_samples
+    return getattr(style_samples, f"{mode.upper()}_SAMPLES")
+
+
+def score_sample(mode, sample, output):
+    """Per-sample metrics for one cleaned output, as the mode's harness computes them."""
+    if mode == "grammar":
+        return score_grammar_output(sample["source"], output, sample["references"])
+    return score_style_output(sample["source"], output, sample["references"],
+                              sample.get("preserve", []), mode)
+
+
+def evaluate(mode, name, temperature, samples, prompt_for, base_url, model=DEFAULT_MODEL, on_result=None,
+             layout=DEFAULT_LAYOUT, token_policy="fixed"):
+    """
+    Run samples with prompt_for(index, sample) → (system_prompt, extra detail
+    fields). Returns {"metrics", "details"} like the harnesses, with
+    avg_prompt_tokens, avg_ttft and p95_ttft added to the metrics.
+    """
+    print(f"  {mode:13s} {name} ...", end=" ", flush=True)
+    details = []
+    for i, sample in enumerate(samples):
+        sid = sample.get("id") or sample_id(sample["source"])
+        system_prompt, extra = prompt_for(i, sample)
+        limits = generation_limits(mode, sample["source"], token_policy)
+        try:
+            response = complete(sample["source"], system_prompt, temperature, base_url,
+                                model=model, stream=True, trace={"variant": name, "sample": sid},
+                                layout=layout, **limits)
+        except Exception as e:
+            detail = {"index": i, "sample_id": sid, "output": None, "error": str(e)}
+        else:
+            output = clean_response(response["text"])
+            detail = {"index": i, "sample_id": sid, "output": output, "latency": response["latency"],
+                      **usage_fields(response), **score_sample(mode, sample, output), **extra}
+            detail.setdefault("prompt_tokens", estimate_tokens(system_prompt + "\n\n" + sample["source"]))
+            if token_policy != "fixed":
+                detail["max_tokens"] = limits["max_tokens"]
+        details.append(detail)
+        if on_result:
+            on_result(detail)
+
+    if mode == "grammar":
+        metrics = aggregate_grammar_metrics(name, temperature, details)
+    else:
+        metrics = aggregate_style_metrics(name, mode, temperature, details)
+    scored = [d for d in details if not d.get("error")]
+    ttfts = [d["ttft"] for d in scored if d.get("ttft") is not None]
+    metrics["avg_prompt_tokens"] = sum(d["prompt_tokens"] for d in scored) / max(len(scored), 1)
+    metrics["avg_ttft"] = sum(ttfts) / len(ttfts) if ttfts else None
+    metrics["p95_ttft"] = percentile(ttfts, 0.95)
+    truncated = f", {metrics['truncated']} hit max_tokens" if metrics.get("truncated") else ""
+    print(f"{metrics['avg_latency']:.2f}s avg, {metrics['errors']} errors{truncated}")
+    return {"metrics": metrics, "details": details}
@@ -1,11 +1,20 @@
 #!/usr/bin/env python3
 """ProseKit LLM Quality Test Suite — Tests four rewrite modes against sample texts via Swama API."""
 
+import argparse
 import json
 import urllib.request
 import time
 import os
 import re
+import sys
+
+# Shared eval tooling (message layouts, trace export) lives in ../eval
+EVAL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "eval")
+sys.path.insert(0, EVAL_DIR)
+
+from swama_client import DEFAULT_LAYOUT, MESSAGE_LAYOUTS, build_messages
+from token_policy import FIXED_MAX_TOKENS, TOKEN_POLICIES, generation_limits
 
 API_URL = "http://localhost:28100/v1/chat/completions"
 MODEL = "mlx-community/Qwen3-8B-4bit"  # Swama's default qwen3 alias
@@ -92,45 +101,94 @@ SAMPLES = [
 # ─── Helpers ───────────────────────────────────────────────
 
 def strip_thinking(text):
-    """Remove <think>...</think> blocks from model output."""
-    cleaned = re.sub(r'<think>.*?</think>', '', text, flags=re.DOTALL).strip()
+    """
+    Remove <think>...</think> blocks from model output. A <think> with no
+    </think> ran into max_tokens and is removed to the end of the text.
+    """
+    cleaned = re.sub(r'<think>.*?(?:</think>|$)', '', text, flags=re.DOTALL).strip()
     return cleaned if cleaned else None  # None means thinking consumed entire output
 
 
 # ─── API Call ───────────────────────────────────────────────
 
-def _single_request(system_prompt, text):
-    """Make a single API request and return (raw_content, elapsed)."""
-    payload = json.dumps({
+def _read_stream(resp, start):
+    """Read a streamed (SSE) response. Returns (content, ttft_seconds)."""
+    parts = []
+    ttft = None
+    for line in resp:
+        line = line.decode("utf-8").strip()
+        if not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            break
+        for choice in json.loads(data).get("choices", []):
+            content = (choice.get("delta") or {}).get("content")
+            if content:
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                parts.append(content)
+    return "".join(parts), ttft
+
+
+def _single_request(system_prompt, text, trace=None, layout=DEFAULT_LAYOUT,
+                    max_tokens=FIXED_MAX_TOKENS, stop=None):
+    """
+    Make a single API request and return (raw_content, elapsed).
+
+    With --trace, the request is streamed so TTFT can be recorded, and
+    `trace` (mode, sample) is attached to its trace event. layout is the
+    message layout (swama_client.build_messages()): the default sends one
+    user message as RewriteEngine.swift does; "system" is this script's
+    original separate system message. max_tokens and stop come from
+    token_policy.generation_limits().
+    """
+    tracing = trace is not None
+    body = {
         "model": MODEL,
-        "messages": [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": text}
-        ],
+        "messages": build_messages(system_prompt, text, layout),
         "temperature": 0.7,
         "top_p": 0.8,
-        "max_tokens": 2048
-    }).encode("utf-8")
+        "max_tokens": max_tokens
+    }
+    if stop:
+        body["stop"] = list(stop)
+    if tracing:
+        body["stream"] = True
+    payload = json.dumps(body).encode("utf-8")
 
     req = urllib.request.Request(API_URL, data=payload, headers={"Content-Type": "application/json"})
 
-    start = time.time()
-    with urllib.request.urlopen(req, timeout=60) as resp:
-        result = json.loads(resp.read().decode())
-        elapsed = time.time() - start
-        content = result["choices"][0]["message"]["content"].strip()
-        return content, round(elapsed, 2)
-
-
-def rewrite(text, mode_name):
+    start = time.perf_counter()
+    ttft = None
+    error = "request failed"
+    try:
+        with urllib.request.urlopen(req, timeout=60) as resp:
+            if tracing:
+                content, ttft = _read_stream(resp, start)
+            else:
+                result = json.loads(resp.read().decode())
+                content = result["choices"][0]["message"]["content"]
+            elapsed = time.perf_counter() - start
+            error = None
+            return content.strip(), round(elapsed, 2)
+    finally:
+        if tracing:
+            import trace_export
+            trace_export.record_request(start, time.perf_counter(), ttft=ttft,
+                                        endpoint=API_URL, error=error, **trace)
+
+
+def rewrite(text, mode_name, trace=None, layout=DEFAULT_LAYOUT, token_policy="fixed"):
     system_prompt = SYSTEM_TEMPLATE.format(mode_instruction=MODES[mode_name])
+    limits = generation_limits(mode_name, text, token_policy)
     max_retries = 2
     total_elapsed = 0
     had_thinking = False
 
     for attempt in range(1 + max_retries):
         try:
-            raw, elapsed = _single_request(system_prompt, text)
+            raw, elapsed = _single_request(system_prompt, text, trace, layout, **limits)
             total_elapsed += elapsed
 
             # Check for <think> tags and strip them
@@ -138,7 +196,7 @@ def rewrite(text, mode_name):
                 had_thinking = True
                 cleaned = strip_thinking(raw)
                 if cleaned is None:
-                    # Thinking consumed entire output — retry
+                    # Thinking consumed entire output (or ran into max_tokens) — retry
                     if attempt < max_retries:
                         print(f"[retry {attempt+1}]", end=" ", flush=True)
                         continue
@@ -156,15 +214,34 @@ def rewrite(text, mode_name):
 # ─── Main ───────────────────────────────────────────────────
 
 def main():
+    parser = argparse.ArgumentParser(description="ProseKit LLM quality test suite")
+    parser.add_argument("--trace", type=str, default=None,
+                        help="Stream requests and save a Chrome trace (open in Perfetto) to this path")
+    parser.add_argument("--layout", choices=MESSAGE_LAYOUTS, default=DEFAULT_LAYOUT,
+                        help="Message layout: one user message as the app sends it (default), "
+                             "or 'system' for a separate system message")
+    parser.add_argument("--token-policy", choices=TOKEN_POLICIES, default="fixed",
+                        help="max_tokens/stop sequences: fixed 512 as the eval harnesses (default), "
+                             "or adaptive to the mode and input length (see eval/token_policy.py)")
+    args = parser.parse_args()
+
+    if args.trace:
+        import trace_export
+        trace_export.start("test_llm_quality")
+
     print("ProseKit LLM Quality Test Suite")
     print("=" * 50)
     print(f"Model: {MODEL}")
     print(f"API: {API_URL}")
+    print(f"Layout: {args.layout}")
+    print(f"Token policy: {args.token_policy}")
     print()
 
     results = []
     results.append("# ProseKit LLM Quality Test Results\n")
     results.append(f"**Model:** {MODEL}\n")
+    results.append(f"**Layout:** {args.layout}\n")
+    results.append(f"**Token policy:** {args.token_policy}\n")
     results.append(f"**Date:** {time.strftime('%Y-%m-%d %H:%M')}\n")
     results.append("")
 
@@ -175,7 +252,8 @@ def main():
 
         for mode_name in MODES:
             print(f"  Testing mode: {mode_name}...", end=" ", flush=True)
-            output, elapsed = rewrite(sample['text'], mode_name)
+            trace = {"variant": mode_name, "sample": sample['id']} if args.trace else None
+            output, elapsed = rewrite(sample['text'], mode_name, trace, args.layout, args.token_policy)
             print(f"({elapsed}s)")
 
             results.append(f"### {mode_name.capitalize()} ({elapsed}s)\n")
@@ -188,6 +266,10 @@ def main():
         f.write("\n".join(results))
 
     print(f"\nResults saved to: {OUTPUT_FILE}")
+
+    if args.trace:
+        trace_export.save(args.trace)
+
     print("Done.")
 
 if __name__ == "__main__":